@@ -1,21 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 import asyncio
-from typing import Optional
-from ...core.database import get_db
+import json
+import random
+from typing import Optional, AsyncIterator
+from ...core.config import settings
+from ...core.database import get_async_db, AsyncSessionLocal
 from ...schemas.chat import ChatRequest, ChatResponse
 from ...models.user import User
 from ...models.widget import Widget, TrainingDocument
 from ...services.vector_store import vector_store_service
+from ...services.chunk_store import chunk_store
+from ...services.context_builder import context_builder
+from ...services.keyword_index import keyword_index_service
+from ...services.vector_backends import IndexOptions
 from ...services.llm_service import llm_service
+from ...services.llm_scheduler import llm_scheduler
 from ...services.usage_service import usage_service
 from ...services.cache_service import cache_service
-from ...core.exceptions import ValidationError, RateLimitError
+from ...services.chat_service import chat_service
+from ...services.health_monitor import health_monitor
+from ...services.tenant_cache import tenant_cache
+from ...services.single_flight import single_flight
+from ...core.exceptions import ValidationError, RateLimitError, LLMOverloadedError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Keeps fire-and-forget tasks (semantic cache audits) from being collected
+_background_tasks: set = set()
+
 # Global embedding model (managed by vector store service)
 embedding_model = None
 
@@ -33,85 +50,332 @@ def get_embedding_model():
 
 
 async def check_ollama_health() -> bool:
-    """Quick health check for Ollama"""
-    return await llm_service.health_check()
+    """Quick health check for Ollama (cached snapshot, no network I/O)"""
+    return health_monitor.is_available("ollama")
+
 
+async def resolve_user_and_widget(api_key: str, db: AsyncSession) -> tuple:
+    """Validate API key and return user and widget snapshots
+
+    Served from the in-process tenant cache when warm; otherwise the user and
+    widget are loaded from the database and cached.
+    """
+    tenant = tenant_cache.get(api_key)
+    if tenant:
+        return tenant.user, tenant.widget
 
-async def validate_user_and_widget(api_key: str, db: Session) -> tuple:
-    """Validate API key and return user and widget"""
     # Get user by API key
-    user = (
-        db.query(User)
-        .filter(
+    user = await db.scalar(
+        select(User).where(
             User.api_key == api_key,
             User.is_active == True,
             User.is_subscription_active == True,
         )
-        .first()
     )
 
     if not user:
         raise ValidationError("Invalid API key or inactive subscription")
 
-    # Check usage limits
-    try:
-        usage_info = await usage_service.check_and_increment_usage(user.id, db)
-    except RateLimitError as e:
-        raise HTTPException(status_code=429, detail=str(e))
-
     # Get user's first active widget
-    widget = (
-        db.query(Widget)
-        .filter(Widget.user_id == user.id, Widget.is_active == True)
-        .first()
+    widget = await db.scalar(
+        select(Widget)
+        .where(Widget.user_id == user.id, Widget.is_active == True)
+        .limit(1)
     )
 
     if not widget:
         raise ValidationError("No active widget found for this API key")
 
-    return user, widget, usage_info
+    tenant = tenant_cache.put(api_key, user, widget)
+    return tenant.user, tenant.widget
+
 
+async def _cancel_tasks(*tasks: Optional[asyncio.Task]):
+    """Cancel pipeline branches that are no longer needed and reap them"""
+    tasks = [task for task in tasks if task is not None]
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
 
-async def get_relevant_documents(widget_id: str, query: str, db: Session) -> list:
-    """Get relevant training documents using vector search"""
+
+def _source_ids(context_docs: list) -> list:
+    """Stable ids of the chunks an answer was grounded on"""
+    ids = []
+    for _, _, metadata in context_docs:
+        source_id = str(metadata.get("document_id", ""))
+        if "chunk_index" in metadata:
+            source_id = f"{source_id}:{metadata['chunk_index']}"
+        ids.append(source_id)
+    return ids
+
+
+async def _audit_semantic_hit(widget_id: str, semantic_hit: dict, retrieval_task):
+    """Count a semantic hit as false if its answer shares no sources with
+    what the new question retrieves"""
     try:
-        # Get training documents for this widget
-        training_docs = (
-            db.query(TrainingDocument)
-            .filter(
-                TrainingDocument.widget_id == widget_id,
-                TrainingDocument.is_processed == True,
+        context_docs, _ = await retrieval_task
+        retrieved = set(_source_ids(context_docs))
+        cached = set(semantic_hit.get("source_ids") or [])
+        false_hit = (retrieved or cached) and not (retrieved & cached)
+        await cache_service.record_semantic_audit(widget_id, bool(false_hit))
+    except Exception as e:
+        logger.warning(f"Semantic cache audit failed: {e}")
+
+
+async def run_chat_pipeline(api_key: str, message: str, db: AsyncSession) -> dict:
+    """
+    Run the pre-generation stages of the chat pipeline as a dependency graph.
+
+    Tenant resolution comes first; usage accounting, cache lookup and
+    retrieval (query embedding + vector search) only depend on it, so they
+    run concurrently. An exact cache miss falls through to the semantic
+    cache, which reuses the retrieval branch's query embedding. A cache hit
+    cancels the retrieval branch. An AsyncSession cannot be shared between
+    concurrent tasks, so only the usage branch uses the request session.
+
+    The returned ``usage_charge`` is still to be committed, or refunded if
+    the request is shed, by the caller.
+    """
+    user, widget = await resolve_user_and_widget(api_key, db)
+
+    usage_task = asyncio.create_task(usage_service.charge_usage(user.id, db, user=user))
+    cache_task = asyncio.create_task(cache_service.get_cached_entry(widget.id, message))
+
+    # Retrieval is speculative: it is wasted on a cache hit, but starting it
+    # now hides embedding + vector search latency behind the other stages
+    embedding_task = None
+    retrieval_task = None
+    if widget.training_status == "completed":
+        embedding_task = asyncio.create_task(
+            vector_store_service.embed_query_async(message)
+        )
+
+        async def retrieve() -> list:
+            query_embedding = await asyncio.shield(embedding_task)
+            return await get_relevant_documents(
+                widget.id,
+                widget.user_id,
+                message,
+                query_embedding=query_embedding,
+                index_options=IndexOptions.from_widget(widget),
+            )
+
+        # Identical in-flight questions share one embedding + vector search
+        retrieval_task = asyncio.create_task(
+            single_flight.run(
+                f"{cache_service._generate_cache_key(widget.id, message)}:retrieval",
+                retrieve,
+                distributed=False,
             )
-            .all()
         )
 
-        if not training_docs:
-            return []
+    semantic_hit = None
+    try:
+        usage_info, usage_charge = await usage_task
+        cached_response, cache_generation = await cache_task
 
-        # Try vector search first
-        try:
-            # Get user_id for namespace
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
-            if not widget:
-                return []
+        # Exact miss: look for a cached answer to a similar question
+        if not cached_response and embedding_task and settings.SEMANTIC_CACHE_ENABLED:
+            query_embedding = await asyncio.shield(embedding_task)
+            semantic_hit = await cache_service.get_semantic_response(
+                widget.id,
+                query_embedding,
+                widget.semantic_cache_threshold,
+                generation=cache_generation,
+            )
+            if semantic_hit:
+                cached_response = semantic_hit["response"]
+    except RateLimitError as e:
+        await _cancel_tasks(cache_task, retrieval_task, embedding_task)
+        raise HTTPException(status_code=429, detail=str(e))
+    except BaseException:
+        await _cancel_tasks(usage_task, cache_task, retrieval_task, embedding_task)
+        raise
 
-            namespace = vector_store_service.get_namespace(widget.user_id, widget_id)
+    if semantic_hit and isinstance(usage_info, dict):
+        usage_info.update(
+            {
+                "cache_match": "semantic",
+                "cache_similarity": semantic_hit["similarity"],
+            }
+        )
 
-            # Search using vector store
-            vector_results = await vector_store_service.search_similar_async(
-                namespace=namespace, query=query, k=4, score_threshold=0.7
+    if cached_response:
+        context_docs = []
+        if (
+            semantic_hit
+            and retrieval_task
+            and random.random() < settings.SEMANTIC_CACHE_AUDIT_RATE
+        ):
+            # Let sampled retrievals finish in the background to measure
+            # false hits
+            audit = asyncio.create_task(
+                _audit_semantic_hit(widget.id, semantic_hit, retrieval_task)
             )
+            _background_tasks.add(audit)
+            audit.add_done_callback(_background_tasks.discard)
+        else:
+            await _cancel_tasks(retrieval_task, embedding_task)
+    else:
+        context_docs = (await retrieval_task)[0] if retrieval_task else []
+
+    query_embedding = None
+    if embedding_task and embedding_task.done() and not embedding_task.cancelled():
+        query_embedding = embedding_task.result()
+
+    return {
+        "user": user,
+        "widget": widget,
+        "usage_info": usage_info,
+        "usage_charge": usage_charge,
+        "cached_response": cached_response,
+        "cache_generation": cache_generation,
+        "semantic_hit": semantic_hit,
+        "context_docs": context_docs,
+        "query_embedding": query_embedding,
+    }
+
+
+def reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    """Merge ranked (content, score, metadata) lists; each chunk scores
+    sum(1 / (RRF_K + rank)) over the lists it appears in"""
+    fused = {}
+    for results in rankings:
+        for rank, doc in enumerate(results, start=1):
+            key = _source_ids([doc])[0]
+            score, first = fused.get(key, (0.0, doc))
+            fused[key] = (score + 1 / (settings.RRF_K + rank), first)
+
+    ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:k]
+    return [(content, score, metadata) for score, (content, _, metadata) in ranked]
+
+
+async def _vector_search(
+    widget_id: str,
+    user_id: str,
+    query: str,
+    k: int,
+    query_embedding: list = None,
+    index_options: IndexOptions = None,
+) -> list:
+    try:
+        namespace = vector_store_service.get_namespace(user_id, widget_id)
+        if query_embedding is None:
+            query_embedding = await vector_store_service.embed_query_async(query)
+
+        return await vector_store_service.search_similar_async(
+            namespace=namespace,
+            query=query,
+            k=k,
+            score_threshold=0.7,
+            query_embedding=query_embedding,
+            index_options=index_options,
+        )
 
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Vector search failed: {e}")
+        return []
+
+
+async def _bm25_search(widget_id: str, query: str, k: int) -> list:
+    try:
+        hits = await keyword_index_service.search(widget_id, query, k)
+        chunks = await chunk_store.get_chunks([chunk_id for chunk_id, _ in hits])
+        return [
+            (chunks[chunk_id][0], score, chunks[chunk_id][1])
+            for chunk_id, score in hits
+            if chunk_id in chunks
+        ]
+
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Keyword index search failed: {e}")
+        return []
+
+
+async def get_relevant_documents(
+    widget_id: str,
+    user_id: str,
+    query: str,
+    query_embedding: list = None,
+    index_options: IndexOptions = None,
+) -> list:
+    """Get relevant training documents
+
+    Vector search and the widget's BM25 index run concurrently and their
+    rankings are merged by reciprocal rank fusion, so exact terms (error
+    codes, product names) the embedding misses still surface. MMR then
+    picks ``VECTOR_SEARCH_TOP_K`` of the ``CONTEXT_CANDIDATES`` best,
+    skipping chunks that mostly repeat one already picked.
+    """
+    namespace = vector_store_service.get_namespace(user_id, widget_id)
+    try:
+        if settings.HYBRID_SEARCH_ENABLED:
+            vector_results, keyword_results = await asyncio.gather(
+                _vector_search(
+                    widget_id,
+                    user_id,
+                    query,
+                    settings.HYBRID_CANDIDATES,
+                    query_embedding,
+                    index_options,
+                ),
+                _bm25_search(widget_id, query, settings.HYBRID_CANDIDATES),
+            )
+            if vector_results or keyword_results:
+                logger.info(
+                    f"Hybrid search found {len(vector_results)} vector and "
+                    f"{len(keyword_results)} keyword results"
+                )
+                candidates = reciprocal_rank_fusion(
+                    [vector_results, keyword_results], settings.CONTEXT_CANDIDATES
+                )
+                return await context_builder.select_async(
+                    candidates, namespace=namespace
+                )
+
+            # Widgets trained before chunks were recorded have no BM25 index
+            if len(await keyword_index_service.get(widget_id)):
+                return []
+        else:
+            vector_results = await _vector_search(
+                widget_id,
+                user_id,
+                query,
+                settings.CONTEXT_CANDIDATES,
+                query_embedding,
+                index_options,
+            )
             if vector_results:
                 logger.info(f"Vector search found {len(vector_results)} results")
-                return vector_results
+                return await context_builder.select_async(
+                    vector_results, namespace=namespace
+                )
 
-        except Exception as e:
-            logger.warning(f"Vector search failed, falling back to keyword search: {e}")
+        # Training documents are only needed for the keyword fallback; use a
+        # dedicated session since this runs concurrently with other stages
+        async with AsyncSessionLocal() as db:
+            training_docs = (
+                await db.scalars(
+                    select(TrainingDocument).where(
+                        TrainingDocument.widget_id == widget_id,
+                        TrainingDocument.is_processed == True,
+                    )
+                )
+            ).all()
+
+        if not training_docs:
+            return []
 
         # Fallback to simple keyword search
         return await keyword_search(query, training_docs)
 
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.error(f"Document retrieval failed: {e}")
         return []
@@ -192,21 +456,24 @@ def generate_template_response(query: str, context_docs: list) -> str:
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Main chat endpoint with full RAG pipeline
     """
     start_time = asyncio.get_event_loop().time()
+    usage_charge = None
 
     try:
-        # 1. Validate user and widget
-        user, widget, usage_info = await validate_user_and_widget(request.api_key, db)
-
-        # 2. Check cache first
-        cached_response = await cache_service.get_cached_response(
-            widget.id, request.message
-        )
-
+        # 1. Validate user and widget, then fan out usage accounting, cache
+        # lookup and retrieval concurrently
+        pipeline = await run_chat_pipeline(request.api_key, request.message, db)
+        usage_charge = pipeline["usage_charge"]
+        user = pipeline["user"]
+        widget = pipeline["widget"]
+        usage_info = pipeline["usage_info"]
+        cached_response = pipeline["cached_response"]
+
+        # 2. Serve cache hits (retrieval has already been cancelled)
         if cached_response:
             response_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
             logger.info(f"Cache hit for widget {widget.id}")
@@ -234,53 +501,104 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
                 context_sources=0,
             )
 
-        # 4. Get relevant documents
-        context_docs = await get_relevant_documents(widget.id, request.message, db)
-
-        # 5. Generate response
-        response_text = ""
-        response_method = "template"
-        model_used = None
-
-        # Try LLM first if available and context exists
-        ollama_available = await check_ollama_health()
-
-        if ollama_available and context_docs:
-            try:
-                llm_result = await llm_service.get_response_async(
-                    system_prompt=widget.system_prompt,
-                    context_docs=context_docs,
-                    user_question=request.message,
-                    temperature=widget.temperature,
-                    max_tokens=widget.max_tokens,
-                )
-
-                if not llm_result.get("fallback", False):
-                    response_text = llm_result["response"]
-                    response_method = "llm"
-                    model_used = llm_result.get("model_used")
-                else:
-                    response_text = llm_result["response"]
-                    response_method = "template_fallback"
-
-            except Exception as e:
-                logger.warning(f"LLM generation failed: {e}")
+        # 4. Relevant documents were retrieved alongside the cache lookup
+        context_docs = pipeline["context_docs"]
+
+        # 5. Generate response. Concurrent identical questions (in this
+        # worker or others) wait for a single generation instead of each
+        # running the LLM; the leader also writes the cache entry.
+        async def generate() -> dict:
+            llm_result = None
+            response_method = "template"
+            model_used = None
+            queue_wait_ms = None
+
+            # Try LLM first if available and context exists
+            ollama_available = await check_ollama_health()
+
+            if (
+                ollama_available
+                and context_docs
+                and health_monitor.is_available("ollama")
+            ):
+                try:
+                    # Waits its tenant's fair turn; raises when overloaded.
+                    # A half-open circuit's trial is only claimed once a
+                    # slot is held, so shed requests never strand it.
+                    async with llm_scheduler.slot(
+                        user.id, user.subscription_plan
+                    ) as queue_wait_ms:
+                        with health_monitor.attempt("ollama") as allowed:
+                            if allowed:
+                                llm_result = await llm_service.get_response_async(
+                                    system_prompt=widget.system_prompt,
+                                    context_docs=context_docs,
+                                    user_question=request.message,
+                                    temperature=widget.temperature,
+                                    max_tokens=widget.max_tokens,
+                                )
+                                health_monitor.record_result(
+                                    "ollama", not llm_result.get("fallback", False)
+                                )
+
+                    if llm_result is None:
+                        # The circuit opened, or another request took its
+                        # trial, while this one waited
+                        response_text = generate_template_response(
+                            request.message, context_docs
+                        )
+                    elif not llm_result.get("fallback", False):
+                        response_text = llm_result["response"]
+                        response_method = "llm"
+                        model_used = llm_result.get("model_used")
+                    else:
+                        response_text = llm_result["response"]
+                        response_method = "template_fallback"
+
+                except LLMOverloadedError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"LLM generation failed: {e}")
+                    response_text = generate_template_response(
+                        request.message, context_docs
+                    )
+                    response_method = "template_error"
+            else:
+                # Use template response
                 response_text = generate_template_response(
                     request.message, context_docs
                 )
-                response_method = "template_error"
-        else:
-            # Use template response
-            response_text = generate_template_response(request.message, context_docs)
-            response_method = "template" if context_docs else "no_context"
+                response_method = "template" if context_docs else "no_context"
+
+            # 6. Cache the response
+            if (
+                response_text and len(response_text) > 20
+            ):  # Only cache substantial responses
+                await cache_service.cache_response(
+                    widget.id,
+                    request.message,
+                    response_text,
+                    metadata={"source_ids": _source_ids(context_docs)},
+                    query_embedding=pipeline["query_embedding"],
+                    generation=pipeline["cache_generation"],
+                )
 
-        # 6. Cache the response
-        if (
-            response_text and len(response_text) > 20
-        ):  # Only cache substantial responses
-            await cache_service.cache_response(
-                widget.id, request.message, response_text
-            )
+            return {
+                "response": response_text,
+                "response_method": response_method,
+                "ollama_available": ollama_available,
+                "model_used": model_used,
+                "llm_result": llm_result,
+                "queue_wait_ms": queue_wait_ms,
+            }
+
+        generation, coalesced = await single_flight.run(
+            cache_service._generate_cache_key(widget.id, request.message), generate
+        )
+        response_text = generation["response"]
+        ollama_available = generation["ollama_available"]
+        model_used = generation["model_used"]
+        response_method = generation["response_method"]
 
         # 7. Log usage
         try:
@@ -289,7 +607,6 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
                 widget.id,
                 request.message,
                 int((asyncio.get_event_loop().time() - start_time) * 1000),
-                db,
             )
         except Exception as e:
             logger.warning(f"Usage logging failed: {e}")
@@ -302,6 +619,8 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
             "ollama_available": ollama_available,
             "context_found": len(context_docs) > 0,
             "model_used": model_used,
+            "coalesced": coalesced,
+            "queue_wait_ms": generation.get("queue_wait_ms"),
         }
 
         if isinstance(usage_info, dict):
@@ -318,6 +637,15 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
 
     except HTTPException:
         raise
+    except LLMOverloadedError as e:
+        # Shedding is our overload, not the tenant's usage
+        await usage_service.refund_usage(usage_charge)
+        usage_charge = None
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         logger.error(f"Chat endpoint error: {e}")
         response_time = int((asyncio.get_event_loop().time() - start_time) * 1000)
@@ -330,23 +658,301 @@ async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
             context_sources=0,
             cached=False,
         )
+    finally:
+        if usage_charge:
+            await usage_service.commit_usage(usage_charge)
+
+
+def _ndjson_frame(frame: dict) -> str:
+    """Serialize a single stream frame as newline-delimited JSON"""
+    return json.dumps(frame, default=str) + "\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streaming chat endpoint (NDJSON)
+
+    Emits ``{"type": "token", "content": ...}`` frames as the model generates
+    them, then a final ``{"type": "done", ...}`` frame with usage info,
+    context sources and timing.
+    """
+    start_time = asyncio.get_event_loop().time()
+
+    # Validation errors are raised before the stream starts so clients still
+    # get proper HTTP status codes
+    try:
+        pipeline = await run_chat_pipeline(request.api_key, request.message, db)
+    except ValidationError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    user = pipeline["user"]
+    widget = pipeline["widget"]
+    usage_info = pipeline["usage_info"]
+    cached_response = pipeline["cached_response"]
+    context_docs = pipeline["context_docs"]
+
+    # Shed load before the stream starts, while a 503 can still be sent
+    if not cached_response and widget.training_status == "completed" and context_docs:
+        try:
+            llm_scheduler.check_admission(user.id, user.subscription_plan)
+        except LLMOverloadedError as e:
+            await usage_service.refund_usage(pipeline["usage_charge"])
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
+    def elapsed_ms() -> int:
+        return int((asyncio.get_event_loop().time() - start_time) * 1000)
+
+    async def event_stream() -> AsyncIterator[str]:
+        refunded = False
+        try:
+            # 1. Serve cached answers as a single frame
+            if cached_response:
+                logger.info(f"Cache hit for widget {widget.id}")
+                yield _ndjson_frame({"type": "token", "content": cached_response})
+                yield _ndjson_frame(
+                    {
+                        "type": "done",
+                        "session_id": request.session_id,
+                        "usage_info": usage_info,
+                        "context_sources": 0,
+                        "response_time_ms": elapsed_ms(),
+                        "time_to_first_token_ms": elapsed_ms(),
+                        "cached": True,
+                    }
+                )
+                return
+
+            # 2. Untrained widgets get the standard holding message
+            if widget.training_status != "completed":
+                response = "I'm still learning about this product. Please check back soon or contact support if this persists."
+                yield _ndjson_frame({"type": "token", "content": response})
+                yield _ndjson_frame(
+                    {
+                        "type": "done",
+                        "session_id": request.session_id,
+                        "usage_info": usage_info,
+                        "context_sources": 0,
+                        "response_time_ms": elapsed_ms(),
+                        "time_to_first_token_ms": elapsed_ms(),
+                        "cached": False,
+                    }
+                )
+                return
+
+            # 3. Relay tokens as they arrive. Identical in-flight questions
+            # share one generation: the leader streams its tokens, followers
+            # receive the finished answer as a single frame.
+            tokens: asyncio.Queue = asyncio.Queue()
+
+            async def generate() -> dict:
+                llm_result = None
+                response_method = "template" if context_docs else "no_context"
+                queue_wait_ms = None
+                streamed = []
+                ollama_available = await check_ollama_health()
+
+                if (
+                    ollama_available
+                    and context_docs
+                    and health_monitor.is_available("ollama")
+                ):
+                    try:
+                        # As in /chat, the circuit's trial is claimed in the slot
+                        async with llm_scheduler.slot(
+                            user.id, user.subscription_plan
+                        ) as queue_wait_ms:
+                            with health_monitor.attempt("ollama") as allowed:
+                                if allowed:
+                                    async for event in llm_service.stream_response_async(
+                                        system_prompt=widget.system_prompt,
+                                        context_docs=context_docs,
+                                        user_question=request.message,
+                                        temperature=widget.temperature,
+                                        max_tokens=widget.max_tokens,
+                                    ):
+                                        if event["type"] == "token":
+                                            streamed.append(event["content"])
+                                            tokens.put_nowait(event)
+                                        else:
+                                            llm_result = event
+                                    health_monitor.record_result(
+                                        "ollama", not llm_result.get("fallback")
+                                    )
+                    except LLMOverloadedError:
+                        raise
+                    except Exception as e:
+                        # attempt() has recorded the failure
+                        logger.warning(f"LLM streaming failed: {e}")
+                        llm_result = None
+                        response_method = "template_error"
+
+                if llm_result is not None:
+                    response_text = llm_result["response"]
+                    response_method = (
+                        "template_fallback" if llm_result.get("fallback") else "llm"
+                    )
+                elif streamed:
+                    # Tokens already reached the client, so keep the partial
+                    # answer rather than appending a template to it
+                    response_text = "".join(streamed).strip()
+                    response_method = "llm_interrupted"
+                else:
+                    response_text = generate_template_response(
+                        request.message, context_docs
+                    )
+                    tokens.put_nowait({"type": "token", "content": response_text})
+
+                # 4. Cache the full text once the stream has completed
+                if (
+                    response_text
+                    and len(response_text) > 20
+                    and response_method != "llm_interrupted"
+                ):
+                    await cache_service.cache_response(
+                        widget.id,
+                        request.message,
+                        response_text,
+                        metadata={"source_ids": _source_ids(context_docs)},
+                        query_embedding=pipeline["query_embedding"],
+                        generation=pipeline["cache_generation"],
+                    )
+
+                return {
+                    "response": response_text,
+                    "response_method": response_method,
+                    "ollama_available": ollama_available,
+                    "model_used": llm_result.get("model_used") if llm_result else None,
+                    "llm_result": llm_result,
+                    "queue_wait_ms": queue_wait_ms,
+                }
+
+            async def fly():
+                try:
+                    return await single_flight.run(
+                        cache_service._generate_cache_key(widget.id, request.message),
+                        generate,
+                    )
+                finally:
+                    tokens.put_nowait(None)
+
+            flight = asyncio.create_task(fly())
+            while True:
+                event = await tokens.get()
+                if event is None:
+                    break
+                yield _ndjson_frame(event)
+
+            generation, coalesced = await flight
+            if coalesced:
+                yield _ndjson_frame(
+                    {"type": "token", "content": generation["response"]}
+                )
+
+            response_text = generation["response"]
+            response_method = generation["response_method"]
+            ollama_available = generation["ollama_available"]
+            llm_result = generation["llm_result"]
+            response_time = elapsed_ms()
+
+            await chat_service._log_conversation(
+                user.id,
+                widget.id,
+                request.session_id,
+                request.message,
+                response_text,
+                response_time,
+                llm_result,
+            )
+            try:
+                await usage_service.log_usage(
+                    user.id, widget.id, request.message, response_time
+                )
+            except Exception as e:
+                logger.warning(f"Usage logging failed: {e}")
+
+            if isinstance(usage_info, dict):
+                usage_info.update(
+                    {
+                        "response_method": response_method,
+                        "ollama_available": ollama_available,
+                        "context_found": len(context_docs) > 0,
+                        "model_used": generation["model_used"],
+                        "coalesced": coalesced,
+                        "queue_wait_ms": generation.get("queue_wait_ms"),
+                    }
+                )
+
+            yield _ndjson_frame(
+                {
+                    "type": "done",
+                    "session_id": request.session_id,
+                    "usage_info": usage_info,
+                    "context_sources": len(context_docs),
+                    "response_time_ms": response_time,
+                    "time_to_first_token_ms": (
+                        llm_result.get("time_to_first_token_ms", response_time)
+                        if llm_result and not coalesced
+                        else response_time
+                    ),
+                    "cached": False,
+                }
+            )
+
+        except LLMOverloadedError as e:
+            await usage_service.refund_usage(pipeline["usage_charge"])
+            refunded = True
+            yield _ndjson_frame(
+                {
+                    "type": "error",
+                    "session_id": request.session_id,
+                    "error": str(e),
+                    "retry_after": e.retry_after,
+                    "response_time_ms": elapsed_ms(),
+                }
+            )
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            yield _ndjson_frame(
+                {
+                    "type": "error",
+                    "session_id": request.session_id,
+                    "error": str(e) if settings.DEBUG else "Internal error",
+                    "response_time_ms": elapsed_ms(),
+                }
+            )
+        finally:
+            if not refunded:
+                await usage_service.commit_usage(pipeline["usage_charge"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/health")
 async def chat_health_check():
     """Health check endpoint for chat service"""
-    ollama_healthy = await check_ollama_health()
-    vector_healthy = await vector_store_service.health_check()
+    snapshot = health_monitor.get_snapshot()
     embedding_loaded = get_embedding_model() is not None
 
     return {
         "status": "healthy",
         "service": "chat",
         "components": {
-            "ollama": ollama_healthy,
-            "vector_store": vector_healthy,
+            "ollama": snapshot["ollama"]["available"],
+            "vector_store": snapshot["vector_store"]["available"],
             "embedding_model": embedding_loaded,
         },
+        "circuit_breakers": snapshot,
     }
 
 
@@ -363,3 +969,19 @@ async def list_models():
     except Exception as e:
         logger.error(f"Failed to list models: {e}")
         return {"error": str(e)}
+
+
+@router.get("/models/routing")
+async def model_routing_stats():
+    """Per-model latency, error rate and health, plus recent routing decisions
+
+    Stats come from live traffic and are per worker process.
+    """
+    return llm_service.get_routing_stats()
+
+
+@router.get("/scheduler")
+async def scheduler_stats():
+    """LLM admission queue: depth, in-flight, wait-time percentiles and
+    admitted / rejected counts per plan (per worker process)"""
+    return llm_scheduler.get_stats()
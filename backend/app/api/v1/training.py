@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 from ...core.config import settings
-from ...core.database import get_db
+from ...core.database import get_async_db
 from ...services.training_service import training_service
 from ...services.usage_service import usage_service
 from ...schemas.training import (
@@ -25,7 +26,7 @@ router = APIRouter()
 async def start_training(
     request: TrainingRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Start training process for a widget
@@ -36,24 +37,22 @@ async def start_training(
     """
     try:
         # Validate API key and get user
-        user = (
-            db.query(User)
-            .filter(
+        user = await db.scalar(
+            select(User).where(
                 User.api_key == request.api_key,
                 User.is_active == True,
                 User.is_subscription_active == True,
             )
-            .first()
         )
 
         if not user:
             raise ValidationError("Invalid API key or inactive subscription")
 
         # Validate widget ownership
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == request.widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(
+                Widget.id == request.widget_id, Widget.user_id == user.id
+            )
         )
 
         if not widget:
@@ -82,19 +81,17 @@ async def start_training(
 
 @router.get("/status/{widget_id}", response_model=TrainingStatus)
 async def get_training_status(
-    widget_id: str, api_key: str, db: Session = Depends(get_db)
+    widget_id: str, api_key: str, db: AsyncSession = Depends(get_async_db)
 ):
     """Get training status for a widget"""
     try:
         # Validate API key and widget ownership
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -118,7 +115,7 @@ async def upload_document(
     file: UploadFile = File(...),
     widget_id: str = None,
     api_key: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Upload and process a document for training"""
     try:
@@ -136,14 +133,12 @@ async def upload_document(
             )
 
         # Validate API key and widget
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -189,19 +184,20 @@ async def upload_document(
 
 @router.delete("/document/{document_id}")
 async def delete_training_document(
-    document_id: str, widget_id: str, api_key: str, db: Session = Depends(get_db)
+    document_id: str,
+    widget_id: str,
+    api_key: str,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a training document"""
     try:
         # Validate API key and widget ownership
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import logging
 import uuid
 from ...core.config import settings
-from ...core.database import get_db
+from ...core.database import get_async_db
 from ...services.vector_store import vector_store_service
 from ...services.cache_service import cache_service
+from ...services.keyword_index import keyword_index_service
+from ...services.tenant_cache import tenant_cache
 from ...schemas.widget import (
     CreateWidgetRequest,
     WidgetResponse,
@@ -23,18 +26,18 @@ router = APIRouter()
 
 
 @router.post("/create", response_model=WidgetResponse)
-async def create_widget(request: CreateWidgetRequest, db: Session = Depends(get_db)):
+async def create_widget(
+    request: CreateWidgetRequest, db: AsyncSession = Depends(get_async_db)
+):
     """Create a new widget for user"""
     try:
         # Validate API key
-        user = (
-            db.query(User)
-            .filter(
+        user = await db.scalar(
+            select(User).where(
                 User.api_key == request.api_key,
                 User.is_active == True,
                 User.is_subscription_active == True,
             )
-            .first()
         )
 
         if not user:
@@ -44,10 +47,10 @@ async def create_widget(request: CreateWidgetRequest, db: Session = Depends(get_
         plan_limits = settings.SUBSCRIPTION_LIMITS.get(user.subscription_plan, {})
         max_widgets = plan_limits.get("max_widgets", 1)
 
-        current_widgets = (
-            db.query(Widget)
-            .filter(Widget.user_id == user.id, Widget.is_active == True)
-            .count()
+        current_widgets = await db.scalar(
+            select(func.count(Widget.id)).where(
+                Widget.user_id == user.id, Widget.is_active == True
+            )
         )
 
         if current_widgets >= max_widgets:
@@ -74,8 +77,8 @@ async def create_widget(request: CreateWidgetRequest, db: Session = Depends(get_
         )
 
         db.add(widget)
-        db.commit()
-        db.refresh(widget)
+        await db.commit()
+        await db.refresh(widget)
 
         return WidgetResponse(
             id=widget.id,
@@ -93,16 +96,18 @@ async def create_widget(request: CreateWidgetRequest, db: Session = Depends(get_
 
 
 @router.get("/list", response_model=WidgetListResponse)
-async def list_widgets(api_key: str, db: Session = Depends(get_db)):
+async def list_widgets(api_key: str, db: AsyncSession = Depends(get_async_db)):
     """List all widgets for user"""
     try:
         # Validate API key
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
         # Get user's widgets
-        widgets = db.query(Widget).filter(Widget.user_id == user.id).all()
+        widgets = (
+            await db.scalars(select(Widget).where(Widget.user_id == user.id))
+        ).all()
 
         widget_list = []
         for widget in widgets:
@@ -128,19 +133,19 @@ async def list_widgets(api_key: str, db: Session = Depends(get_db)):
 
 @router.put("/{widget_id}", response_model=WidgetResponse)
 async def update_widget(
-    widget_id: str, request: UpdateWidgetRequest, db: Session = Depends(get_db)
+    widget_id: str,
+    request: UpdateWidgetRequest,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update widget configuration"""
     try:
         # Validate API key and widget ownership
-        user = db.query(User).filter(User.api_key == request.api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == request.api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -163,12 +168,21 @@ async def update_widget(
             widget.temperature = request.temperature
         if request.max_tokens:
             widget.max_tokens = request.max_tokens
-
-        db.commit()
-        db.refresh(widget)
+        if request.semantic_cache_threshold is not None:
+            widget.semantic_cache_threshold = request.semantic_cache_threshold
+        if request.ann_m is not None:
+            widget.ann_m = request.ann_m
+        if request.ann_ef_search is not None:
+            widget.ann_ef_search = request.ann_ef_search
+        if request.vector_quantization is not None:
+            widget.vector_quantization = request.vector_quantization
+
+        await db.commit()
+        await db.refresh(widget)
 
         # Invalidate cache when widget is updated
         await cache_service.invalidate_widget_cache(widget_id)
+        await tenant_cache.invalidate_user(user.id)
 
         return WidgetResponse(
             id=widget.id,
@@ -185,18 +199,18 @@ async def update_widget(
 
 
 @router.get("/{widget_id}/stats", response_model=WidgetStatsResponse)
-async def get_widget_stats(widget_id: str, api_key: str, db: Session = Depends(get_db)):
+async def get_widget_stats(
+    widget_id: str, api_key: str, db: AsyncSession = Depends(get_async_db)
+):
     """Get widget statistics"""
     try:
         # Validate API key and widget ownership
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -228,18 +242,18 @@ async def get_widget_stats(widget_id: str, api_key: str, db: Session = Depends(g
 
 
 @router.delete("/{widget_id}")
-async def delete_widget(widget_id: str, api_key: str, db: Session = Depends(get_db)):
+async def delete_widget(
+    widget_id: str, api_key: str, db: AsyncSession = Depends(get_async_db)
+):
     """Delete a widget and all its data"""
     try:
         # Validate API key and widget ownership
-        user = db.query(User).filter(User.api_key == api_key).first()
+        user = await db.scalar(select(User).where(User.api_key == api_key))
         if not user:
             raise ValidationError("Invalid API key")
 
-        widget = (
-            db.query(Widget)
-            .filter(Widget.id == widget_id, Widget.user_id == user.id)
-            .first()
+        widget = await db.scalar(
+            select(Widget).where(Widget.id == widget_id, Widget.user_id == user.id)
         )
 
         if not widget:
@@ -253,8 +267,11 @@ async def delete_widget(widget_id: str, api_key: str, db: Session = Depends(get_
         await cache_service.invalidate_widget_cache(widget_id)
 
         # Delete from database (cascade will handle related records)
-        db.delete(widget)
-        db.commit()
+        await db.delete(widget)
+        await db.commit()
+
+        await keyword_index_service.delete(widget_id)
+        await tenant_cache.invalidate_user(user.id)
 
         return {"message": "Widget deleted successfully"}
 
@@ -3,7 +3,7 @@ Database configuration and session management
 """
 
 from sqlalchemy import create_engine
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
@@ -26,11 +26,13 @@ async_engine = create_async_engine(
 
 # Session makers
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-AsyncSessionLocal = sessionmaker(
+# expire_on_commit=False: attribute access after commit must not trigger
+# implicit (blocking) refresh I/O in async code
+AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
-    autocommit=False,
     autoflush=False,
+    expire_on_commit=False,
 )
 
 
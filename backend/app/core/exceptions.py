@@ -46,6 +46,14 @@ class LLMError(BaseAppException):
     pass
 
 
+class LLMOverloadedError(LLMError):
+    """Raised when the LLM queue is full; retry after ``retry_after`` seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class TrainingError(BaseAppException):
     """Raised when training operations fail"""
 
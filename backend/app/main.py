@@ -1,14 +1,15 @@
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 import time
 import logging
 import uuid
 
 # Import only essential components
 from .core.config import settings
-from .core.database import get_db
+from .core.database import get_db, get_async_db
 
 # Configure logging first
 logging.basicConfig(
@@ -43,12 +44,24 @@ except ImportError as e:
 try:
     from .services.usage_service import usage_service
     from .services.cache_service import cache_service
+    from .services.tenant_cache import tenant_cache
+    from .services.write_behind import write_behind_queue
+    from .services.single_flight import single_flight
 
     services_available = True
 except ImportError as e:
     logger.warning(f"Services not available: {e}")
     services_available = False
 
+# Try to import health monitor
+try:
+    from .services.health_monitor import health_monitor
+
+    health_monitor_available = True
+except ImportError as e:
+    logger.warning(f"Health monitor not available: {e}")
+    health_monitor_available = False
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Chat Widget RAG Backend",
@@ -82,32 +95,28 @@ async def add_process_time_header(request: Request, call_next):
         raise
 
 
-# Health check - FIXED
+# Health check - reads the background health monitor's cached snapshot
 @app.get("/health")
 async def health_check():
-    # Check database connection
-    db_healthy = True
-    try:
-        from sqlalchemy import text  # Import text for raw SQL
-
-        db = next(get_db())
-        db.execute(text("SELECT 1"))  # FIXED: Added text() wrapper
-        db.close()
-    except Exception as e:
-        logger.error(f"Database health check failed: {e}")
-        db_healthy = False
-
-    # Check external services
-    ollama_healthy = False
-    if chat_available:
+    components = {}
+
+    if health_monitor_available:
+        components = health_monitor.get_snapshot()
+        db_healthy = components["database"]["available"]
+        ollama_healthy = components["ollama"]["available"]
+    else:
+        # Check database connection directly
+        db_healthy = True
         try:
-            from .api.v1.chat import check_ollama_health
+            from sqlalchemy import text  # Import text for raw SQL
 
-            # FIXED: Await the async function
-            ollama_healthy = await check_ollama_health()
+            db = next(get_db())
+            db.execute(text("SELECT 1"))  # FIXED: Added text() wrapper
+            db.close()
         except Exception as e:
-            logger.error(f"Ollama health check failed: {e}")
-            ollama_healthy = False
+            logger.error(f"Database health check failed: {e}")
+            db_healthy = False
+        ollama_healthy = False
 
     return {
         "status": "healthy" if db_healthy else "degraded",
@@ -122,6 +131,7 @@ async def health_check():
             "database_configured": bool(settings.DATABASE_URL),
             "pinecone_configured": bool(settings.PINECONE_API_KEY),
         },
+        "components": components,
     }
 
 
@@ -161,12 +171,12 @@ if models_available:
 
     @app.post("/api/v1/training/add")
     async def add_training_data(
-        api_key: str, title: str, content: str, db: Session = Depends(get_db)
+        api_key: str, title: str, content: str, db: AsyncSession = Depends(get_async_db)
     ):
         """Add new training data to your widget"""
         try:
             # Get user
-            user = db.query(User).filter(User.api_key == api_key).first()
+            user = await db.scalar(select(User).where(User.api_key == api_key))
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid API key")
 
@@ -178,10 +188,10 @@ if models_available:
                     logger.warning(f"Usage check failed: {e}")
 
             # Get widget
-            widget = (
-                db.query(Widget)
-                .filter(Widget.user_id == user.id, Widget.is_active == True)
-                .first()
+            widget = await db.scalar(
+                select(Widget)
+                .where(Widget.user_id == user.id, Widget.is_active == True)
+                .limit(1)
             )
 
             if not widget:
@@ -199,7 +209,7 @@ if models_available:
             )
 
             db.add(new_doc)
-            db.commit()
+            await db.commit()
 
             return {
                 "status": "success",
@@ -214,19 +224,21 @@ if models_available:
             raise HTTPException(status_code=500, detail=str(e))
 
     @app.get("/api/v1/training/list")
-    async def list_training_data(api_key: str, db: Session = Depends(get_db)):
+    async def list_training_data(
+        api_key: str, db: AsyncSession = Depends(get_async_db)
+    ):
         """List all training documents for user's widget"""
         try:
             # Get user
-            user = db.query(User).filter(User.api_key == api_key).first()
+            user = await db.scalar(select(User).where(User.api_key == api_key))
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid API key")
 
             # Get widget
-            widget = (
-                db.query(Widget)
-                .filter(Widget.user_id == user.id, Widget.is_active == True)
-                .first()
+            widget = await db.scalar(
+                select(Widget)
+                .where(Widget.user_id == user.id, Widget.is_active == True)
+                .limit(1)
             )
 
             if not widget:
@@ -234,10 +246,12 @@ if models_available:
 
             # Get training documents
             docs = (
-                db.query(TrainingDocument)
-                .filter(TrainingDocument.widget_id == widget.id)
-                .all()
-            )
+                await db.scalars(
+                    select(TrainingDocument).where(
+                        TrainingDocument.widget_id == widget.id
+                    )
+                )
+            ).all()
 
             return {
                 "documents": [
@@ -271,38 +285,30 @@ if models_available:
 if models_available:
 
     @app.get("/api/v1/analytics")
-    async def get_analytics(api_key: str, db: Session = Depends(get_db)):
+    async def get_analytics(api_key: str, db: AsyncSession = Depends(get_async_db)):
         """Get usage analytics for user"""
         try:
             # Get user
-            user = db.query(User).filter(User.api_key == api_key).first()
+            user = await db.scalar(select(User).where(User.api_key == api_key))
             if not user:
                 raise HTTPException(status_code=401, detail="Invalid API key")
 
             # Get widget count
-            widget_count = (
-                db.query(Widget)
-                .filter(Widget.user_id == user.id, Widget.is_active == True)
-                .count()
+            widget_count = await db.scalar(
+                select(func.count(Widget.id)).where(
+                    Widget.user_id == user.id, Widget.is_active == True
+                )
             )
 
-            # Get total training documents
+            # Get total training documents across active widgets in one query
             total_docs = 0
             if widget_count > 0:
-                widgets = (
-                    db.query(Widget)
-                    .filter(Widget.user_id == user.id, Widget.is_active == True)
-                    .all()
+                total_docs = await db.scalar(
+                    select(func.count(TrainingDocument.id))
+                    .join(Widget, TrainingDocument.widget_id == Widget.id)
+                    .where(Widget.user_id == user.id, Widget.is_active == True)
                 )
 
-                for widget in widgets:
-                    doc_count = (
-                        db.query(TrainingDocument)
-                        .filter(TrainingDocument.widget_id == widget.id)
-                        .count()
-                    )
-                    total_docs += doc_count
-
             # Get usage stats if service available
             usage_stats = {}
             if services_available:
@@ -341,11 +347,13 @@ async def model_status():
     try:
         if chat_available:
             from .api.v1.chat import embedding_model
+            from .services.embedding_cache import embedding_cache
 
             return {
                 "embedding_model_loaded": embedding_model is not None,
                 "model_name": "all-MiniLM-L6-v2" if embedding_model else None,
                 "status": "ready" if embedding_model else "not_loaded",
+                "embedding_cache": embedding_cache.get_stats(),
             }
         else:
             return {"embedding_model_loaded": False, "status": "chat_unavailable"}
@@ -385,17 +393,50 @@ async def startup_event():
             except Exception as e:
                 logger.warning(f"Failed to preload embedding model: {e}")
 
+            # LLM tokenizers for prompt packing; counts are estimated until then
+            try:
+                from .services.context_builder import context_builder
+
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, context_builder.tokens.preload)
+            except Exception as e:
+                logger.warning(f"Failed to preload tokenizers: {e}")
+
         # Start preloading as background task
         import asyncio
 
         asyncio.create_task(preload_model())
 
+    # Start background dependency health polling
+    if health_monitor_available:
+        health_monitor.start()
+
+    # Listen for tenant and response cache invalidations from other workers
+    if services_available:
+        tenant_cache.start()
+        cache_service.start()
+
+    # Batch conversation/usage writes off the request path
+    if services_available:
+        write_behind_queue.start()
+
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Chat Widget RAG Backend")
 
+    # Stop health polling
+    if health_monitor_available:
+        await health_monitor.stop()
+
+    # Flush queued conversation/usage writes before anything else closes
+    if services_available:
+        try:
+            await write_behind_queue.stop()
+        except Exception as e:
+            logger.error(f"Write-behind drain error: {e}")
+
     # Cleanup resources
     if services_available:
         try:
@@ -404,6 +445,21 @@ async def shutdown_event():
 
             if hasattr(cache_service, "redis_client"):
                 await cache_service.close()
+
+            from .services.embedding_cache import embedding_cache
+
+            await embedding_cache.close()
+
+            from .services.keyword_index import keyword_index_service
+
+            await keyword_index_service.close()
+
+            await tenant_cache.stop()
+            await single_flight.stop()
+
+            from .services.vector_store import vector_store_service
+
+            await vector_store_service.close_async()
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
 
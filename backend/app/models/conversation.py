@@ -34,9 +34,9 @@ class Conversation(BaseModel):
     avg_response_time = Column(Float, default=0.0)
     user_satisfaction = Column(Integer)  # 1-5 rating if provided
 
-    # Relationships
-    user = relationship("User", back_populates="conversations")
-    widget = relationship("Widget", back_populates="conversations")
+    # Relationships (one-directional: User/Widget don't map conversations)
+    user = relationship("User")
+    widget = relationship("Widget")
     messages = relationship(
         "Message", back_populates="conversation", cascade="all, delete-orphan"
     )
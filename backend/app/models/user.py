@@ -63,3 +63,10 @@ class UsageLog(BaseModel):
 
     # Relationships
     user = relationship("User")
+
+
+class WriteBehindBatch(BaseModel):
+    """A write-behind batch that has been committed, so a retry after an
+    ambiguous commit failure doesn't apply it twice"""
+
+    __tablename__ = "write_behind_batches"
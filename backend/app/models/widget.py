@@ -7,6 +7,7 @@ from sqlalchemy import (
     JSON,
     Float,
     ForeignKey,
+    UniqueConstraint,
     func,
     Enum,
     DateTime,
@@ -50,6 +51,10 @@ class Widget(BaseModel):
     temperature = Column(Float, default=0.7)
     max_tokens = Column(Integer, default=500)
     search_threshold = Column(Float, default=0.7)
+    semantic_cache_threshold = Column(Float)  # None -> SEMANTIC_CACHE_THRESHOLD
+    ann_m = Column(Integer)  # None -> ANN_M
+    ann_ef_search = Column(Integer)  # None -> ANN_EF_SEARCH
+    vector_quantization = Column(String(16))  # None -> VECTOR_QUANTIZATION
 
     # Widget Customization
     theme_color = Column(String(7), default="#007bff")
@@ -75,6 +80,7 @@ class Widget(BaseModel):
     training_documents = relationship(
         "TrainingDocument", back_populates="widget", cascade="all, delete-orphan"
     )
+    training_chunks = relationship("TrainingChunk", cascade="all, delete-orphan")
     # conversations = relationship("Conversation", back_populates="widget", cascade="all, delete-orphan")
 
 
@@ -98,3 +104,45 @@ class TrainingDocument(BaseModel):
 
     # Relationships
     widget = relationship("Widget", back_populates="training_documents")
+
+
+class TrainingChunk(BaseModel):
+    """A widget's embedded chunks, one row per vector, holding the full text
+
+    The vector index only carries ``document_id``/``chunk_index``; search
+    results are joined back to their text here by vector ID.
+    """
+
+    __tablename__ = "training_chunks"
+
+    # Content-addressed vector ID: hash of widget + normalized chunk text
+    id = Column(String(64), primary_key=True)
+    widget_id = Column(String(36), ForeignKey("widgets.id"), nullable=False, index=True)
+    document_id = Column(String(36), index=True)  # one of its source documents
+    chunk_index = Column(Integer, default=0)
+    content = Column(Text, nullable=False)
+
+    sources = relationship(
+        "TrainingChunkSource", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+class TrainingChunkSource(BaseModel):
+    """A document that produces a chunk, one row per (chunk, document) pair
+
+    Identical text from several documents shares one vector, which is
+    deleted only when the last document producing it is.
+    """
+
+    __tablename__ = "training_chunk_sources"
+    __table_args__ = (UniqueConstraint("chunk_id", "document_id"),)
+
+    chunk_id = Column(
+        String(64),
+        ForeignKey("training_chunks.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    document_id = Column(String(36), nullable=False, index=True)
+    widget_id = Column(String(36), ForeignKey("widgets.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, default=0)
@@ -38,6 +38,20 @@ class UpdateWidgetRequest(BaseModel):
     widget_title: Optional[str] = Field(None)
     temperature: Optional[float] = Field(None, ge=0.0, le=2.0)
     max_tokens: Optional[int] = Field(None, ge=1, le=4000)
+    semantic_cache_threshold: Optional[float] = Field(
+        None, ge=0.0, le=1.0, description="Cosine similarity for semantic cache hits"
+    )
+    ann_m: Optional[int] = Field(
+        None, ge=4, le=64, description="HNSW links per node (local vector backend)"
+    )
+    ann_ef_search: Optional[int] = Field(
+        None, ge=1, le=1000, description="HNSW search beam width (local vector backend)"
+    )
+    vector_quantization: Optional[str] = Field(
+        None,
+        pattern="^(none|int8|binary)$",
+        description="Quantized first-pass scan with float rescoring (local vector backend)",
+    )
 
 
 class WidgetResponse(BaseModel):
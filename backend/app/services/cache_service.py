@@ -3,18 +3,101 @@ import json
 import hashlib
 import logging
 import asyncio
-from typing import Optional, Dict, List
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime, timedelta
 from ..core.config import settings
+from ..services.semantic_cache import semantic_cache
 
 logger = logging.getLogger(__name__)
 
+UNLINK_BATCH_SIZE = 500
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class LocalResponseCache:
+    """
+    Size- and TTL-bounded in-process LRU of deserialized responses (L1).
+
+    Entries are keyed by (widget_id, query hash) and remember the Redis
+    generation they were read at; ``evict_widget`` drops a widget's entries
+    when an invalidation is received.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None):
+        self.max_size = max_size or settings.RESPONSE_CACHE_L1_MAX_SIZE
+        self.ttl = ttl or settings.RESPONSE_CACHE_L1_TTL
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._keys_by_widget: Dict[str, set] = {}
+
+    def get(self, widget_id: str, query_hash: str) -> Optional[Tuple[str, int]]:
+        key = (widget_id, query_hash)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, response, generation = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return response, generation
+
+    def put(self, widget_id: str, query_hash: str, response: str, generation: int):
+        key = (widget_id, query_hash)
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, response, generation)
+        self._keys_by_widget.setdefault(widget_id, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: tuple):
+        if self._entries.pop(key, None) is None:
+            return
+        keys = self._keys_by_widget.get(key[0])
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_widget[key[0]]
+
+    def evict_widget(self, widget_id: str, generation: int = None) -> int:
+        """Drop a widget's entries older than ``generation`` (all if None)"""
+        keys = [
+            key
+            for key in self._keys_by_widget.get(widget_id, ())
+            if generation is None or self._entries[key][2] < generation
+        ]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_widget.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class CacheService:
     def __init__(self):
         self.redis_client = None
         self._redis_lock = asyncio.Lock()
         self.default_ttl = settings.CACHE_TTL
+        self._purge_tasks: set = set()
+        self.l1 = LocalResponseCache()
+        self._listener_task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        # Per-widget [l1_hits, l2_hits, misses] for this worker
+        self._tier_stats: Dict[str, List[int]] = {}
+        # L1 hits not yet added to the shared Redis hit counter
+        self._pending_hits: Dict[str, int] = {}
+        # Newest generation seen per widget; older results are not kept in L1
+        self._latest_generation: Dict[str, int] = {}
 
     async def _get_redis_client(self):
         """Get Redis client with connection pooling"""
@@ -38,8 +121,8 @@ class CacheService:
                         self.redis_client = None
         return self.redis_client
 
-    def _generate_cache_key(self, widget_id: str, query: str) -> str:
-        """Generate cache key for query"""
+    def _query_hash(self, query: str) -> str:
+        """Hash of the normalized query"""
         # Normalize query for better cache hits
         normalized_query = query.lower().strip()
         # Remove extra whitespace and common punctuation
@@ -48,22 +131,79 @@ class CacheService:
             normalized_query.replace("?", "").replace("!", "").replace(".", "")
         )
 
-        query_hash = hashlib.md5(normalized_query.encode()).hexdigest()
-        return f"cache:widget:{widget_id}:query:{query_hash}"
+        return hashlib.md5(normalized_query.encode()).hexdigest()
 
-    def _generate_widget_pattern(self, widget_id: str) -> str:
-        """Generate pattern to match all cache keys for a widget"""
-        return f"cache:widget:{widget_id}:*"
+    def _generate_cache_key(self, widget_id: str, query: str) -> str:
+        """Generation-independent key identifying a widget query
+
+        Used to coalesce identical in-flight queries; stored entries live
+        under ``_storage_key``.
+        """
+        return f"cache:widget:{widget_id}:query:{self._query_hash(query)}"
+
+    def _generation_key(self, widget_id: str) -> str:
+        return f"cache:generation:widget:{widget_id}"
+
+    def _storage_key(self, widget_id: str, generation: int, query_hash: str) -> str:
+        return f"cache:widget:{widget_id}:gen:{generation}:query:{query_hash}"
+
+    def _generate_widget_pattern(self, widget_id: str, generation: int = None) -> str:
+        """Generate pattern to match cache keys for a widget (one generation
+        if given)"""
+        if generation is None:
+            return f"cache:widget:{widget_id}:*"
+        return f"cache:widget:{widget_id}:gen:{generation}:query:*"
+
+    async def get_generation(self, widget_id: str) -> int:
+        """Current cache generation for a widget (bumped on invalidation)"""
+        redis_client = await self._get_redis_client()
+        if not redis_client:
+            return 0
+        generation = await redis_client.get(self._generation_key(widget_id))
+        return int(generation) if generation else 0
 
     async def get_cached_response(self, widget_id: str, query: str) -> Optional[str]:
         """Get cached response for query"""
+        response, _ = await self.get_cached_entry(widget_id, query)
+        return response
+
+    async def get_cached_entry(
+        self, widget_id: str, query: str
+    ) -> Tuple[Optional[str], int]:
+        """Get cached response for query with the generation it was read at
+
+        Pass the generation to ``cache_response`` so an answer computed
+        across an invalidation is stored under the old, dead generation.
+        """
+        query_hash = self._query_hash(query)
+        tier_stats = self._tier_stats.setdefault(widget_id, [0, 0, 0])
+
+        # L1: no network I/O; L1 hits are added to Redis stats in batches
+        local = self.l1.get(widget_id, query_hash)
+        if local is not None:
+            tier_stats[0] += 1
+            self._pending_hits[widget_id] = self._pending_hits.get(widget_id, 0) + 1
+            return local
+
         try:
             redis_client = await self._get_redis_client()
             if not redis_client:
-                return None
-
-            cache_key = self._generate_cache_key(widget_id, query)
-            cached_data = await redis_client.get(cache_key)
+                tier_stats[2] += 1
+                return None, 0
+
+            # Read the generation and, in the same round trip, the entry
+            # under the newest generation this worker has seen
+            expected = self._latest_generation.get(widget_id, 0)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self._generation_key(widget_id))
+            pipe.get(self._storage_key(widget_id, expected, query_hash))
+            generation, cached_data = await pipe.execute()
+            generation = int(generation) if generation else 0
+            cache_key = self._storage_key(widget_id, generation, query_hash)
+            if generation != expected:
+                # Invalidated (or reset) since; read the current generation
+                self._adopt_generation(widget_id, generation)
+                cached_data = await redis_client.get(cache_key)
 
             if cached_data:
                 try:
@@ -76,26 +216,118 @@ class CacheService:
                     if datetime.utcnow() - cached_time > timedelta(
                         seconds=self.default_ttl
                     ):
-                        await redis_client.delete(cache_key)
-                        return None
+                        await redis_client.unlink(cache_key)
+                        tier_stats[2] += 1
+                        return None, generation
 
                     # Update cache hit counter
                     hit_key = f"cache:stats:widget:{widget_id}:hits"
-                    await redis_client.incr(hit_key)
-                    await redis_client.expire(hit_key, 86400)  # Daily stats
-
-                    return data.get("response")
+                    pipe = redis_client.pipeline()
+                    pipe.incr(hit_key)
+                    pipe.expire(hit_key, 86400)  # Daily stats
+                    await pipe.execute()
+
+                    response = data.get("response")
+                    self.l1.put(widget_id, query_hash, response, generation)
+                    tier_stats[1] += 1
+                    return response, generation
                 except json.JSONDecodeError:
                     # Invalid JSON, delete the key
-                    await redis_client.delete(cache_key)
-                    return None
+                    await redis_client.unlink(cache_key)
+                    tier_stats[2] += 1
+                    return None, generation
 
-            return None
+            tier_stats[2] += 1
+            return None, generation
 
         except Exception as e:
             logger.error(f"Cache retrieval failed: {e}")
+            tier_stats[2] += 1
+            return None, 0
+
+    async def get_semantic_response(
+        self,
+        widget_id: str,
+        query_embedding: List[float],
+        threshold: float = None,
+        generation: int = None,
+    ) -> Optional[Dict]:
+        """Serve a cached answer to a differently worded but similar question
+
+        Returns the cached response with the matched query, its similarity
+        and the source ids it was grounded on, or None.
+        """
+        try:
+            redis_client = await self._get_redis_client()
+            if not redis_client or not query_embedding:
+                return None
+
+            if threshold is None:
+                threshold = settings.SEMANTIC_CACHE_THRESHOLD
+            if generation is None:
+                generation = await self.get_generation(widget_id)
+            lookups_key = f"cache:stats:widget:{widget_id}:semantic_lookups"
+
+            match = await semantic_cache.lookup(
+                redis_client, widget_id, query_embedding, threshold
+            )
+
+            pipe = redis_client.pipeline()
+            pipe.incr(lookups_key)
+            pipe.expire(lookups_key, 86400)  # Daily stats
+            if match:
+                pipe.get(self._storage_key(widget_id, generation, match[0]))
+            results = await pipe.execute()
+
+            if not match:
+                return None
+
+            cached_data = results[-1]
+            if not cached_data:
+                # Response expired; drop its embedding too
+                await semantic_cache.remove(redis_client, widget_id, match[0])
+                return None
+
+            data = json.loads(cached_data)
+
+            hit_key = f"cache:stats:widget:{widget_id}:semantic_hits"
+            pipe = redis_client.pipeline()
+            pipe.incr(hit_key)
+            pipe.expire(hit_key, 86400)  # Daily stats
+            await pipe.execute()
+
+            return {
+                "response": data.get("response"),
+                "matched_query": data.get("query"),
+                "similarity": round(match[1], 4),
+                "source_ids": data.get("metadata", {}).get("source_ids", []),
+            }
+
+        except Exception as e:
+            logger.error(f"Semantic cache retrieval failed: {e}")
             return None
 
+    async def record_semantic_audit(self, widget_id: str, false_hit: bool):
+        """Record the outcome of re-checking a semantic hit against retrieval"""
+        try:
+            redis_client = await self._get_redis_client()
+            if not redis_client:
+                return
+
+            stats = ["semantic_audits"]
+            if false_hit:
+                stats.append("semantic_false_hits")
+
+            pipe = redis_client.pipeline()
+            for stat in stats:
+                stat_key = f"cache:stats:widget:{widget_id}:{stat}"
+                pipe.incr(stat_key)
+                pipe.expire(stat_key, 86400)  # Daily stats
+            await pipe.execute()
+
+        except Exception as e:
+            logger.error(f"Failed to record semantic cache audit: {e}")
+
     async def cache_response(
         self,
         widget_id: str,
@@ -103,8 +335,15 @@ class CacheService:
         response: str,
         ttl: int = None,
         metadata: Dict = None,
+        query_embedding: List[float] = None,
+        generation: int = None,
     ) -> bool:
-        """Cache response for query"""
+        """Cache response for query
+
+        With ``query_embedding`` the entry is also added to the widget's
+        semantic index (see ``get_semantic_response``). ``generation`` is
+        the one the cache miss was read at (see ``get_cached_entry``).
+        """
         try:
             redis_client = await self._get_redis_client()
             if not redis_client:
@@ -114,7 +353,10 @@ class CacheService:
             if len(response.strip()) < 10 or "error" in response.lower():
                 return False
 
-            cache_key = self._generate_cache_key(widget_id, query)
+            if generation is None:
+                generation = await self.get_generation(widget_id)
+            query_hash = self._query_hash(query)
+            cache_key = self._storage_key(widget_id, generation, query_hash)
             cache_data = {
                 "response": response,
                 "widget_id": widget_id,
@@ -136,6 +378,15 @@ class CacheService:
 
             await pipe.execute()
 
+            # Only write through if no newer generation has been seen here
+            if self._l1_generation_is_current(widget_id, generation):
+                self.l1.put(widget_id, query_hash, response, generation)
+
+            if query_embedding and settings.SEMANTIC_CACHE_ENABLED:
+                await semantic_cache.add(
+                    redis_client, widget_id, query_hash, query_embedding
+                )
+
             logger.debug(f"Cached response for widget {widget_id}")
             return True
 
@@ -144,52 +395,193 @@ class CacheService:
             return False
 
     async def invalidate_widget_cache(self, widget_id: str) -> int:
-        """Invalidate all cached responses for a widget"""
+        """Invalidate all cached responses for a widget
+
+        Bumps the widget's generation so every existing entry becomes
+        unreachable in O(1); old entries are unlinked in the background (or
+        simply age out through their TTL). Returns the new generation.
+        """
         try:
             redis_client = await self._get_redis_client()
             if not redis_client:
                 return 0
 
-            pattern = self._generate_widget_pattern(widget_id)
+            pipe = redis_client.pipeline()
+            pipe.incr(self._generation_key(widget_id))
+            pipe.unlink(*semantic_cache.widget_keys(widget_id))
+            generation = (await pipe.execute())[0]
+            self._evict_local(widget_id, generation)
+
+            # Evict L1 entries in every other worker
+            await redis_client.publish(
+                INVALIDATION_CHANNEL,
+                json.dumps({"widget_id": widget_id, "generation": generation}),
+            )
 
-            # Use scan for better performance with large key sets
-            deleted_count = 0
-            async for key in redis_client.scan_iter(match=pattern, count=100):
-                await redis_client.delete(key)
-                deleted_count += 1
+            logger.info(
+                f"Invalidated cache for widget {widget_id} (generation {generation})"
+            )
 
-            if deleted_count > 0:
-                logger.info(
-                    f"Invalidated {deleted_count} cache entries for widget {widget_id}"
+            # Reclaim memory from older generations off the request path
+            task = asyncio.create_task(
+                self._unlink_matching(
+                    self._generate_widget_pattern(widget_id),
+                    keep_prefix=f"cache:widget:{widget_id}:gen:{generation}:",
                 )
+            )
+            self._purge_tasks.add(task)
+            task.add_done_callback(self._purge_tasks.discard)
 
-            return deleted_count
+            return generation
 
         except Exception as e:
             logger.error(f"Cache invalidation failed: {e}")
+            self.l1.evict_widget(widget_id)
             return 0
 
-    async def invalidate_cache_by_pattern(self, pattern: str) -> int:
-        """Invalidate cache entries matching a pattern"""
+    def _evict_local(self, widget_id: str, generation: int = None):
+        """Drop a widget's in-process L1 and semantic index entries"""
+        if generation is not None:
+            self._latest_generation[widget_id] = max(
+                generation, self._latest_generation.get(widget_id, 0)
+            )
+        self.l1.evict_widget(widget_id, generation)
+        semantic_cache.clear_widget(widget_id)
+
+    def _adopt_generation(self, widget_id: str, generation: int):
+        """Follow the generation read from Redis. A lower one than seen
+        here means Redis lost the key (restart or eviction) and numbering
+        restarted, so nothing this worker cached for the widget is kept."""
+        if generation < self._latest_generation.get(widget_id, 0):
+            self._latest_generation[widget_id] = generation
+            self._evict_local(widget_id)
+        else:
+            self._evict_local(widget_id, generation)
+
+    def _l1_generation_is_current(self, widget_id: str, generation: int) -> bool:
+        return generation >= self._latest_generation.get(widget_id, 0)
+
+    async def _listen(self):
+        """Apply invalidations published by other workers"""
+        while True:
+            pubsub = None
+            try:
+                redis_client = await self._get_redis_client()
+                if not redis_client:
+                    await asyncio.sleep(5)
+                    continue
+
+                pubsub = redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                        self._evict_local(data["widget_id"], data.get("generation"))
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Ignoring malformed invalidation: {message}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error, resubscribing: {e}")
+                # Missed messages mean stale entries, so start cold
+                self.l1.clear()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    async def _flush_hit_counts(self):
+        """Add batched L1 hits to the shared per-widget Redis hit counters"""
+        pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+
+        try:
+            redis_client = await self._get_redis_client()
+            if not redis_client:
+                return
+            pipe = redis_client.pipeline()
+            for widget_id, count in pending.items():
+                hit_key = f"cache:stats:widget:{widget_id}:hits"
+                pipe.incrby(hit_key, count)
+                pipe.expire(hit_key, 86400)  # Daily stats
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to flush L1 hit counts: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.RESPONSE_CACHE_STATS_FLUSH_INTERVAL)
+            await self._flush_hit_counts()
+
+    def start(self):
+        """Start the L1 invalidation listener and hit-count flusher"""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def get_tier_stats(self, widget_id: str = None) -> Dict:
+        """L1/L2 hit ratios for this worker (one widget, or all)"""
+        if widget_id is not None:
+            l1_hits, l2_hits, misses = self._tier_stats.get(widget_id, [0, 0, 0])
+        else:
+            l1_hits = sum(stats[0] for stats in self._tier_stats.values())
+            l2_hits = sum(stats[1] for stats in self._tier_stats.values())
+            misses = sum(stats[2] for stats in self._tier_stats.values())
+
+        lookups = l1_hits + l2_hits + misses
+        return {
+            "l1_size": len(self.l1),
+            "l1_hits": l1_hits,
+            "l2_hits": l2_hits,
+            "misses": misses,
+            "l1_hit_ratio": round(l1_hits / lookups * 100, 2) if lookups else 0,
+            "l2_hit_ratio": round(l2_hits / lookups * 100, 2) if lookups else 0,
+        }
+
+    async def _unlink_matching(self, pattern: str, keep_prefix: str = None) -> int:
+        """UNLINK keys matching a pattern in pipelined batches"""
         try:
             redis_client = await self._get_redis_client()
             if not redis_client:
                 return 0
 
             deleted_count = 0
-            async for key in redis_client.scan_iter(match=pattern, count=100):
-                await redis_client.delete(key)
-                deleted_count += 1
+            batch = []
+            async for key in redis_client.scan_iter(match=pattern, count=1000):
+                if keep_prefix and key.startswith(keep_prefix):
+                    continue
+                batch.append(key)
+                if len(batch) >= UNLINK_BATCH_SIZE:
+                    deleted_count += await redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted_count += await redis_client.unlink(*batch)
 
-            logger.info(
-                f"Invalidated {deleted_count} cache entries matching pattern: {pattern}"
-            )
+            if deleted_count > 0:
+                logger.debug(f"Unlinked {deleted_count} cache keys matching {pattern}")
             return deleted_count
 
         except Exception as e:
-            logger.error(f"Pattern cache invalidation failed: {e}")
+            logger.error(f"Cache purge failed for {pattern}: {e}")
             return 0
 
+    async def invalidate_cache_by_pattern(self, pattern: str) -> int:
+        """Invalidate cache entries matching a pattern"""
+        deleted_count = await self._unlink_matching(pattern)
+        logger.info(
+            f"Invalidated {deleted_count} cache entries matching pattern: {pattern}"
+        )
+        return deleted_count
+
     async def get_cache_stats(self, widget_id: str) -> Dict:
         """Get cache statistics for widget"""
         try:
@@ -197,23 +589,37 @@ class CacheService:
             if not redis_client:
                 return {"cached_queries": 0, "widget_id": widget_id, "hit_rate": 0}
 
-            # Get cache stats
-            hits_key = f"cache:stats:widget:{widget_id}:hits"
-            total_key = f"cache:stats:widget:{widget_id}:total"
-
-            hits = await redis_client.get(hits_key)
-            total = await redis_client.get(total_key)
-
-            hits = int(hits) if hits else 0
-            total = int(total) if total else 0
+            # Get cache stats in one round trip
+            stats_prefix = f"cache:stats:widget:{widget_id}"
+            stat_names = [
+                "hits",
+                "total",
+                "semantic_lookups",
+                "semantic_hits",
+                "semantic_audits",
+                "semantic_false_hits",
+            ]
+            values = await redis_client.mget(
+                [f"{stats_prefix}:{name}" for name in stat_names]
+            )
+            stats = {
+                name: int(value) if value else 0
+                for name, value in zip(stat_names, values)
+            }
+            hits = stats["hits"]
+            total = stats["total"]
 
             # Count current cached entries
-            pattern = self._generate_widget_pattern(widget_id)
+            pattern = self._generate_widget_pattern(
+                widget_id, await self.get_generation(widget_id)
+            )
             cached_count = 0
             async for _ in redis_client.scan_iter(match=pattern, count=100):
                 cached_count += 1
 
             hit_rate = (hits / total * 100) if total > 0 else 0
+            semantic_lookups = stats["semantic_lookups"]
+            semantic_audits = stats["semantic_audits"]
 
             return {
                 "cached_queries": cached_count,
@@ -221,6 +627,27 @@ class CacheService:
                 "cache_hits": hits,
                 "total_requests": total,
                 "hit_rate": round(hit_rate, 2),
+                # This worker's L1 (in-process) vs L2 (Redis) split
+                "tiers": self.get_tier_stats(widget_id),
+                "semantic_entries": await redis_client.zcard(
+                    semantic_cache.widget_keys(widget_id)[1]
+                ),
+                "semantic_lookups": semantic_lookups,
+                "semantic_hits": stats["semantic_hits"],
+                "semantic_hit_rate": (
+                    round(stats["semantic_hits"] / semantic_lookups * 100, 2)
+                    if semantic_lookups
+                    else 0
+                ),
+                # Sampled: a semantic hit whose answer was grounded on none of
+                # the documents the new question retrieves counts as false
+                "semantic_audits": semantic_audits,
+                "semantic_false_hits": stats["semantic_false_hits"],
+                "semantic_false_hit_rate": (
+                    round(stats["semantic_false_hits"] / semantic_audits * 100, 2)
+                    if semantic_audits
+                    else 0
+                ),
             }
 
         except Exception as e:
@@ -255,7 +682,9 @@ class CacheService:
             if not redis_client:
                 return False
 
-            cache_key = self._generate_cache_key(widget_id, query)
+            cache_key = self._storage_key(
+                widget_id, await self.get_generation(widget_id), self._query_hash(query)
+            )
 
             if await redis_client.exists(cache_key):
                 await redis_client.expire(cache_key, new_ttl)
@@ -274,7 +703,9 @@ class CacheService:
             if not redis_client:
                 return []
 
-            pattern = self._generate_widget_pattern(widget_id)
+            pattern = self._generate_widget_pattern(
+                widget_id, await self.get_generation(widget_id)
+            )
             queries = []
 
             async for key in redis_client.scan_iter(match=pattern, count=100):
@@ -317,6 +748,18 @@ class CacheService:
 
     async def close(self):
         """Close Redis connections"""
+        for task in (self._listener_task, self._flush_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = self._flush_task = None
+        await self._flush_hit_counts()
+
+        if self._purge_tasks:
+            await asyncio.gather(*self._purge_tasks, return_exceptions=True)
         if self.redis_client:
             await self.redis_client.close()
             logger.info("Cache service connections closed")
@@ -2,14 +2,16 @@ import asyncio
 import time
 import logging
 from typing import Dict, List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.widget import Widget
-from ..models.conversation import Conversation, Message, MessageRole
 from ..models.user import User
 from ..services.vector_store import vector_store_service
+from ..services.vector_backends import IndexOptions
 from ..services.llm_service import llm_service
 from ..services.usage_service import usage_service
 from ..services.cache_service import cache_service
+from ..services.write_behind import write_behind_queue, ConversationEvent
 from ..core.exceptions import ChatError, ValidationError
 
 logger = logging.getLogger(__name__)
@@ -20,7 +22,7 @@ class ChatService:
         pass
 
     async def process_chat_message(
-        self, api_key: str, message: str, session_id: str, db: Session
+        self, api_key: str, message: str, session_id: str, db: AsyncSession
     ) -> Dict:
         """Process chat message and return response"""
         start_time = time.time()
@@ -57,7 +59,6 @@ class ChatService:
                     message,
                     cached_response,
                     response_time,
-                    db,
                 )
 
                 return {
@@ -70,7 +71,10 @@ class ChatService:
             # 5. Search for relevant context
             namespace = vector_store_service.get_namespace(user.id, widget.id)
             context_docs = await vector_store_service.search_similar_async(
-                namespace=namespace, query=message, k=4
+                namespace=namespace,
+                query=message,
+                k=4,
+                index_options=IndexOptions.from_widget(widget),
             )
 
             # 6. Generate response using LLM
@@ -96,14 +100,11 @@ class ChatService:
                 message,
                 response,
                 response_time,
-                db,
                 llm_result,
             )
 
             # 9. Log usage for analytics
-            await usage_service.log_usage(
-                user.id, widget.id, message, response_time, db
-            )
+            await usage_service.log_usage(user.id, widget.id, message, response_time)
 
             return {
                 "response": response,
@@ -124,26 +125,24 @@ class ChatService:
                 "response_time_ms": response_time,
             }
 
-    async def _validate_api_key(self, api_key: str, db: Session) -> tuple:
+    async def _validate_api_key(self, api_key: str, db: AsyncSession) -> tuple:
         """Validate API key and return user and widget"""
-        user = (
-            db.query(User)
-            .filter(
+        user = await db.scalar(
+            select(User).where(
                 User.api_key == api_key,
                 User.is_active == True,
                 User.is_subscription_active == True,
             )
-            .first()
         )
 
         if not user:
             raise ValidationError("Invalid API key or inactive subscription")
 
         # For now, get the first active widget (extend for multiple widgets)
-        widget = (
-            db.query(Widget)
-            .filter(Widget.user_id == user.id, Widget.is_active == True)
-            .first()
+        widget = await db.scalar(
+            select(Widget)
+            .where(Widget.user_id == user.id, Widget.is_active == True)
+            .limit(1)
         )
 
         if not widget:
@@ -159,64 +158,27 @@ class ChatService:
         user_message: str,
         assistant_response: str,
         response_time_ms: int,
-        db: Session,
         llm_result: Dict = None,
     ):
-        """Log conversation to database"""
+        """Queue the exchange for batched persistence (see ``write_behind``)"""
         try:
-            # Get or create conversation
-            conversation = (
-                db.query(Conversation)
-                .filter(
-                    Conversation.session_id == session_id,
-                    Conversation.widget_id == widget_id,
-                )
-                .first()
-            )
-
-            if not conversation:
-                conversation = Conversation(
+            await write_behind_queue.enqueue(
+                ConversationEvent(
                     user_id=user_id,
                     widget_id=widget_id,
                     session_id=session_id,
-                    message_count=0,
-                    avg_response_time=0.0,
+                    user_message=user_message,
+                    assistant_response=assistant_response,
+                    response_time_ms=response_time_ms,
+                    tokens_used=(llm_result.get("tokens_used", 0) if llm_result else 0),
+                    context_documents=(
+                        llm_result.get("context_docs_used", 0) if llm_result else 0
+                    ),
                 )
-                db.add(conversation)
-                db.flush()  # Get ID
-
-            # Add user message
-            user_msg = Message(
-                conversation_id=conversation.id,
-                role=MessageRole.USER,
-                content=user_message,
             )
-            db.add(user_msg)
-
-            # Add assistant response
-            assistant_msg = Message(
-                conversation_id=conversation.id,
-                role=MessageRole.ASSISTANT,
-                content=assistant_response,
-                response_time_ms=response_time_ms,
-                tokens_used=llm_result.get("tokens_used", 0) if llm_result else 0,
-                context_documents=(
-                    llm_result.get("context_docs_used", 0) if llm_result else 0
-                ),
-            )
-            db.add(assistant_msg)
-
-            # Update conversation stats
-            conversation.message_count += 2  # User + Assistant
-            conversation.avg_response_time = (
-                conversation.avg_response_time + response_time_ms
-            ) / 2
-
-            db.commit()
 
         except Exception as e:
             logger.error(f"Failed to log conversation: {e}")
-            db.rollback()
 
 
 # Global instance
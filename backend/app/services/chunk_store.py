@@ -0,0 +1,75 @@
+import logging
+from typing import Dict, List, Tuple
+from sqlalchemy import select
+from ..core.database import AsyncSessionLocal
+from ..models.widget import TrainingChunk, TrainingDocument
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """
+    Full chunk text keyed by vector ID (the ``training_chunks`` table).
+
+    The vector index keeps only small filterable metadata; retrieval gets
+    IDs and scores back and fetches the bodies here in one query.
+    """
+
+    async def get_many(self, ids: List[str]) -> Dict[str, str]:
+        """Chunk text for each known ID (unknown IDs are omitted)"""
+        if not ids:
+            return {}
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(TrainingChunk.id, TrainingChunk.content).where(
+                    TrainingChunk.id.in_(ids)
+                )
+            )
+            return dict(rows.all())
+
+    async def get_chunks(self, ids: List[str]) -> Dict[str, Tuple[str, Dict]]:
+        """Text and search-result metadata for each known ID"""
+        if not ids:
+            return {}
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(
+                    TrainingChunk.id,
+                    TrainingChunk.content,
+                    TrainingChunk.document_id,
+                    TrainingChunk.chunk_index,
+                    TrainingDocument.title,
+                    TrainingDocument.content_type,
+                )
+                .outerjoin(
+                    TrainingDocument, TrainingDocument.id == TrainingChunk.document_id
+                )
+                .where(TrainingChunk.id.in_(ids))
+            )
+            return {
+                chunk_id: (
+                    content,
+                    {
+                        "vector_id": chunk_id,
+                        "document_id": document_id,
+                        "chunk_index": chunk_index,
+                        "title": title,
+                        "content_type": content_type,
+                    },
+                )
+                for chunk_id, content, document_id, chunk_index, title, content_type in rows
+            }
+
+    async def get_widget_chunks(self, widget_id: str) -> Dict[str, str]:
+        """ID -> text of every chunk indexed for a widget"""
+        async with AsyncSessionLocal() as db:
+            rows = await db.execute(
+                select(TrainingChunk.id, TrainingChunk.content).where(
+                    TrainingChunk.widget_id == widget_id
+                )
+            )
+            return dict(rows.all())
+
+
+# Global instance
+chunk_store = ChunkStore()
@@ -0,0 +1,178 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+import numpy as np
+from ..core.config import settings
+from .vector_store import vector_store_service
+
+logger = logging.getLogger(__name__)
+
+# Token counts remembered per (model, text); retrieved chunks recur a lot
+TOKEN_COUNT_CACHE_SIZE = 8192
+
+
+def mmr_select(
+    relevance: np.ndarray, docs: np.ndarray, k: int, diversity_lambda: float
+) -> List[int]:
+    """
+    Maximal marginal relevance over unit-length chunk embeddings.
+
+    Greedily picks the row maximizing ``lambda * relevance -
+    (1 - lambda) * max sim(doc, picked)``, so a chunk that mostly repeats
+    one already picked (e.g. its overlapping neighbour) loses to a less
+    relevant but new one. Returns row indexes in pick order.
+    """
+    if not len(docs):
+        return []
+    similarity = docs @ docs.T
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    while len(picked) < min(k, len(docs)):
+        scores = diversity_lambda * relevance - (1 - diversity_lambda) * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+class TokenCounter:
+    """
+    Counts tokens with each Ollama model's own tokenizer.
+
+    Tokenizers come from ``LLM_TOKENIZERS`` (model -> Hugging Face repo)
+    and are loaded once per process by ``preload``, off the event loop;
+    counts are memoized per text. Until a model's tokenizer is loaded, or
+    without one (no repo, ``transformers`` or download), counts fall back
+    to ~4 characters per token.
+    """
+
+    def __init__(self):
+        self._tokenizers = {}  # model -> tokenizer, or None if unavailable
+        self._counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def preload(self, models: List[str] = None):
+        """Load the tokenizers of ``models`` (default: all configured).
+        Blocking; run it in an executor."""
+        for model in models or list(settings.LLM_TOKENIZERS):
+            if model not in self._tokenizers:
+                self._tokenizers[model] = self._load(model)
+
+    @staticmethod
+    def _load(model: str):
+        repo = settings.LLM_TOKENIZERS.get(model)
+        if not repo:
+            return None
+        try:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(repo)
+            logger.info(f"Loaded tokenizer {repo} for {model}")
+            return tokenizer
+        except Exception as e:
+            logger.warning(f"Tokenizer for {model} unavailable, estimating: {e}")
+            return None
+
+    def count(self, text: str, model: str, remember: bool = True) -> int:
+        """Tokens in ``text`` for ``model``; pass ``remember=False`` for
+        one-off texts (whole prompts) so they don't evict chunk counts"""
+        key = (model, text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                return count
+
+        # Never loads on the request path: estimate until preloaded
+        tokenizer = self._tokenizers.get(model)
+        if tokenizer is None:
+            count = len(text) // 4
+        else:
+            count = len(tokenizer.encode(text, add_special_tokens=False))
+
+        # Estimates stay out of the memo while a real count may follow
+        if not remember or model not in self._tokenizers:
+            return count
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > TOKEN_COUNT_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        return count
+
+
+class ContextBuilder:
+    """Picks and packs the retrieved chunks that go into a prompt"""
+
+    def __init__(self):
+        self.tokens = TokenCounter()
+
+    async def select_async(
+        self, docs: List[tuple], k: int = None, namespace: str = None
+    ) -> List[tuple]:
+        """Up to ``k`` of the ranked ``docs`` (content, score, metadata),
+        diversified by MMR
+
+        Relevance is each doc's retrieval score relative to the best one
+        (cosine or fused rank alike). Chunk embeddings are the vectors
+        stored in ``namespace`` under each doc's ``vector_id``; only docs
+        without one are embedded.
+        """
+        k = k or settings.VECTOR_SEARCH_TOP_K
+        if len(docs) <= 1:
+            return docs[:k]
+
+        try:
+            ids = [metadata.get("vector_id") for _, _, metadata in docs]
+            stored = {}
+            if namespace:
+                stored = await vector_store_service.fetch_vectors_async(
+                    namespace, [vector_id for vector_id in ids if vector_id]
+                )
+            missing = [i for i, vector_id in enumerate(ids) if vector_id not in stored]
+            encoded = []
+            if missing:
+                encoded = await vector_store_service.embed_texts_async(
+                    [docs[i][0] for i in missing]
+                )
+            encoded = dict(zip(missing, encoded))
+            vectors = np.vstack(
+                [
+                    encoded[i] if i in encoded else stored[vector_id]
+                    for i, vector_id in enumerate(ids)
+                ]
+            ).astype(np.float32)
+        except Exception as e:
+            logger.warning(f"MMR skipped, keeping retrieval order: {e}")
+            return docs[:k]
+
+        vectors = vectors / np.maximum(
+            np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12
+        )
+        scores = np.array([score for _, score, _ in docs], dtype=np.float32)
+        relevance = scores / max(float(scores.max()), 1e-12)
+        picked = mmr_select(relevance, vectors, k, settings.CONTEXT_MMR_LAMBDA)
+        return [docs[i] for i in picked]
+
+    def pack(self, docs: List[tuple], model: str, budget: int = None) -> List[str]:
+        """Chunk texts, in order, that fit ``budget`` tokens of ``model``
+
+        Greedy: a chunk too large for the remaining budget is skipped and
+        later (smaller) ones still get a chance.
+        """
+        budget = budget or settings.MAX_CONTEXT_TOKENS
+        packed, used = [], 0
+        for content, _, _ in docs:
+            text = content.strip()
+            if not text:
+                continue
+            cost = self.tokens.count(text, model)
+            if used + cost <= budget:
+                packed.append(text)
+                used += cost
+        return packed
+
+
+# Global instance
+context_builder = ContextBuilder()
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor
+from typing import Callable, List, Tuple
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text encodes into batched ``encode`` calls.
+
+    Requests queue on the event loop and a drain task runs one ``encode``
+    per batch in the executor, handing each caller its row. Only one batch
+    runs at a time: requests arriving meanwhile form the next batch instead
+    of competing with it for CPU. An idle batcher dispatches at once, so a
+    lone query pays no delay; under load each batch waits until its oldest
+    request is ``max_wait_ms`` old or ``max_batch_size`` are queued.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        executor: Executor,
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+    ):
+        self.encode_batch = encode
+        self.executor = executor
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        self.max_wait = (
+            settings.EMBEDDING_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        ) / 1000
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._full = None
+        self._task = None
+        self.stats = {"requests": 0, "batches": 0}
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Embedding of one text, computed as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        if self._full is None:
+            self._full = asyncio.Event()
+
+        future = loop.create_future()
+        self._pending.append((text, future, time.monotonic()))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        idle = True
+        while self._pending:
+            # Under load, wait out the oldest request's budget unless full
+            remaining = self._pending[0][2] + self.max_wait - time.monotonic()
+            if not idle and remaining > 0 and len(self._pending) < self.max_batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            # Callers that gave up (e.g. cancelled speculative retrieval)
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            self.stats["batches"] += 1
+            idle = False
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor, self.encode_batch, [text for text, _, _ in batch]
+                )
+            except asyncio.CancelledError:
+                for _, future, _ in batch:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Batched embedding of {len(batch)} texts failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two-level cache of text embeddings keyed by normalized text + model.
+
+    L1 is an in-process LRU of float32 vectors; L2 is Redis holding raw
+    float16 bytes (a 384-dim vector is 768 bytes) so every worker reuses
+    embeddings computed by the others. Only the event loop touches L1.
+    When Redis is unreachable the cache runs L1-only and reconnects at
+    most every ``EMBEDDING_CACHE_RETRY_INTERVAL`` seconds, keeping
+    connection attempts off the query-embedding path.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None):
+        self.max_size = max_size or settings.EMBEDDING_CACHE_L1_MAX_SIZE
+        self.ttl = ttl or settings.EMBEDDING_CACHE_TTL
+        self.redis_client = None
+        self._redis_lock = asyncio.Lock()
+        self._last_attempt: Optional[float] = None
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+
+    async def _get_redis_client(self):
+        """Binary-safe Redis client (the shared one decodes responses)"""
+        if self.redis_client is None and self._may_connect():
+            async with self._redis_lock:
+                if self.redis_client is None and self._may_connect():
+                    self._last_attempt = time.monotonic()
+                    try:
+                        self.redis_client = redis.from_url(
+                            settings.REDIS_URL,
+                            decode_responses=False,
+                            retry_on_timeout=True,
+                            health_check_interval=30,
+                        )
+                        await self.redis_client.ping()
+                    except Exception as e:
+                        logger.warning(f"Embedding cache running without Redis: {e}")
+                        self.redis_client = None
+        return self.redis_client
+
+    def _may_connect(self) -> bool:
+        return (
+            self._last_attempt is None
+            or time.monotonic() - self._last_attempt
+            >= settings.EMBEDDING_CACHE_RETRY_INTERVAL
+        )
+
+    async def _drop_if_unreachable(self, error: Exception):
+        """Go L1-only until the next reconnect attempt if Redis went away"""
+        if not isinstance(error, (redis.ConnectionError, redis.TimeoutError)):
+            return
+        client, self.redis_client = self.redis_client, None
+        self._last_attempt = time.monotonic()
+        if client is not None:
+            try:
+                await client.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """Hash of the normalized text and the embedding model name"""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        digest = hashlib.sha256(
+            f"{settings.EMBEDDING_MODEL}\n{normalized}".encode("utf-8")
+        ).hexdigest()
+        return f"embedding:{digest}"
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 embeddings in input order, None for misses"""
+        keys = [self._key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = []
+        missing: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.l1_hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+            results.append(vector)
+
+        if missing:
+            redis_client = await self._get_redis_client()
+            if redis_client:
+                try:
+                    stored = await redis_client.mget(list(missing))
+                except Exception as e:
+                    logger.warning(f"Embedding cache read failed: {e}")
+                    await self._drop_if_unreachable(e)
+                    stored = [None] * len(missing)
+                for (key, positions), data in zip(list(missing.items()), stored):
+                    if data is None:
+                        continue
+                    vector = np.frombuffer(data, dtype=np.float16).astype(np.float32)
+                    self._remember(key, vector)
+                    for i in positions:
+                        results[i] = vector
+                    self.l2_hits += len(positions)
+                    del missing[key]
+
+        self.misses += sum(len(positions) for positions in missing.values())
+        return results
+
+    async def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Store freshly computed embeddings in both levels"""
+        if not len(texts):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [self._key(text) for text in texts]
+        for key, vector in zip(keys, vectors):
+            self._remember(key, vector)
+
+        redis_client = await self._get_redis_client()
+        if not redis_client:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, vector in zip(keys, vectors):
+                pipe.set(key, vector.astype(np.float16).tobytes(), ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+            await self._drop_if_unreachable(e)
+
+    def get_stats(self) -> Dict:
+        """Hit ratios for this worker"""
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "l1_size": len(self._entries),
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "l1_hit_ratio": round(self.l1_hits / lookups * 100, 2) if lookups else 0,
+            "l2_hit_ratio": round(self.l2_hits / lookups * 100, 2) if lookups else 0,
+        }
+
+    async def close(self):
+        if self.redis_client:
+            await self.redis_client.close()
+            self.redis_client = None
+
+
+# Global instance
+embedding_cache = EmbeddingCache()
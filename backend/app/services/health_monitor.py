@@ -0,0 +1,270 @@
+import asyncio
+import enum
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+from sqlalchemy import text
+from ..core.config import settings
+from ..core.database import async_engine
+from ..services.llm_service import llm_service
+from ..services.vector_store import vector_store_service
+from ..services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for a single dependency"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = None,
+        recovery_timeout: int = None,
+    ):
+        self.name = name
+        self.failure_threshold = (
+            failure_threshold or settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD
+        )
+        self.recovery_timeout = (
+            recovery_timeout or settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+        )
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> CircuitState:
+        """Current state, moving OPEN -> HALF_OPEN once the recovery window passes"""
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = CircuitState.HALF_OPEN
+            self._trial_started = None
+        return self._state
+
+    def _trial_in_flight(self) -> bool:
+        # A trial whose outcome never arrives lapses after the recovery window
+        return (
+            self._trial_started is not None
+            and time.monotonic() - self._trial_started < self.recovery_timeout
+        )
+
+    def is_available(self) -> bool:
+        """Whether a call would be let through now (does not claim the trial)"""
+        state = self.state
+        if state == CircuitState.HALF_OPEN:
+            return not self._trial_in_flight()
+        return state == CircuitState.CLOSED
+
+    def allow_request(self) -> bool:
+        """Whether this caller may send traffic to the dependency.
+
+        In HALF_OPEN a single trial call is let through; others are
+        rejected until its outcome (or a probe's) is recorded.
+        """
+        if not self.is_available():
+            return False
+        if self._state == CircuitState.HALF_OPEN:
+            self._trial_started = time.monotonic()
+        return True
+
+    @contextmanager
+    def attempt(self) -> Iterator[bool]:
+        """Yield whether a call may go through (see ``allow_request``).
+
+        An exception from the call counts as a failure. A trial claimed
+        here is given up on exit, so a call that ends without an outcome
+        (cancelled) doesn't hold the circuit shut until the trial lapses.
+        """
+        allowed = self.allow_request()
+        trial = self._trial_started if allowed else None
+        try:
+            yield allowed
+        except Exception:
+            if allowed:
+                self.record_failure()
+            raise
+        finally:
+            if trial is not None and self._trial_started == trial:
+                self._trial_started = None
+
+    def record_success(self):
+        """Close the circuit after a successful call or probe"""
+        if self._state != CircuitState.CLOSED:
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._trial_started = None
+
+    def record_failure(self):
+        """Count a failure, opening the circuit once the threshold is reached"""
+        self._consecutive_failures += 1
+
+        # A failed trial in HALF_OPEN re-opens immediately
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self._consecutive_failures >= self.failure_threshold
+        ):
+            if self._state != CircuitState.OPEN:
+                logger.warning(
+                    f"Circuit '{self.name}' opened after "
+                    f"{self._consecutive_failures} consecutive failures"
+                )
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self._trial_started = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self._consecutive_failures,
+            "trial_in_flight": self._trial_in_flight(),
+        }
+
+
+class HealthMonitor:
+    """
+    Background poller for external dependencies.
+
+    Probes run on an interval and publish a cached snapshot, so request
+    handlers read dependency health without any network I/O.
+    """
+
+    def __init__(self, interval: int = None):
+        self.interval = interval or settings.HEALTH_CHECK_INTERVAL
+        self.probes: Dict[str, Callable[[], Awaitable[bool]]] = {
+            "ollama": llm_service.health_check,
+            "vector_store": vector_store_service.health_check,
+            "redis": cache_service.health_check,
+            "database": self._check_database,
+        }
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(name) for name in self.probes
+        }
+        self._snapshot: Dict[str, Dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _check_database(self) -> bool:
+        """Run SELECT 1 on the async engine"""
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+
+    async def _run_probe(self, name: str, probe: Callable[[], Awaitable[bool]]):
+        """Run one probe, update its breaker and snapshot entry"""
+        start_time = time.monotonic()
+        error = None
+
+        try:
+            healthy = await asyncio.wait_for(
+                probe(), timeout=settings.HEALTH_CHECK_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            healthy = False
+            error = f"Probe timed out after {settings.HEALTH_CHECK_TIMEOUT}s"
+        except Exception as e:
+            healthy = False
+            error = str(e)
+
+        breaker = self.breakers[name]
+        if healthy:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        self._snapshot[name] = {
+            "healthy": bool(healthy),
+            "latency_ms": int((time.monotonic() - start_time) * 1000),
+            "last_checked": datetime.utcnow().isoformat(),
+            "error": error,
+        }
+
+    async def check_all(self):
+        """Probe every dependency concurrently"""
+        await asyncio.gather(
+            *(self._run_probe(name, probe) for name, probe in self.probes.items())
+        )
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Health poll failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start background polling on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+            logger.info(f"Health monitor started (interval {self.interval}s)")
+
+    async def stop(self):
+        """Stop background polling"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def is_available(self, name: str) -> bool:
+        """O(1) read used on the request path.
+
+        Before the first probe completes the circuit is closed, so traffic
+        flows and real call outcomes (see ``record_result``) drive the state.
+        """
+        breaker = self.breakers.get(name)
+        return breaker.is_available() if breaker else False
+
+    @contextmanager
+    def attempt(self, name: str) -> Iterator[bool]:
+        """Guard a real call: yields whether it may go through, claiming
+        the single trial of a half-open circuit. Record the outcome with
+        ``record_result`` inside the block."""
+        breaker = self.breakers.get(name)
+        if not breaker:
+            yield False
+            return
+        with breaker.attempt() as allowed:
+            yield allowed
+
+    def record_result(self, name: str, success: bool):
+        """Feed the outcome of a real request into the dependency's breaker"""
+        breaker = self.breakers.get(name)
+        if not breaker:
+            return
+        if success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def get_snapshot(self) -> Dict[str, Dict]:
+        """Cached health of every dependency with its circuit state"""
+        return {
+            name: {
+                "healthy": self._snapshot.get(name, {}).get("healthy"),
+                "available": breaker.is_available(),
+                "latency_ms": self._snapshot.get(name, {}).get("latency_ms"),
+                "last_checked": self._snapshot.get(name, {}).get("last_checked"),
+                "error": self._snapshot.get(name, {}).get("error"),
+                **breaker.to_dict(),
+            }
+            for name, breaker in self.breakers.items()
+        }
+
+
+# Global instance
+health_monitor = HealthMonitor()
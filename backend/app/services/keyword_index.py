@@ -0,0 +1,459 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import redis.asyncio as redis
+from ..core.config import settings
+from .chunk_store import chunk_store
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in "
+    "into is it its me my of on or our so than that the their them then there "
+    "these they this to was we were what when where which who why will with "
+    "you your".split()
+)
+
+# Shared per-widget index version, bumped by every update on any host
+VERSION_KEY = "keyword_index:version:widget:{}"
+
+# Gap widths (bytes) a term's delta-encoded postings can be stored at
+_GAP_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords"""
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower())
+        if token not in STOPWORDS
+    ]
+
+
+def _encode_gaps(docs: np.ndarray) -> Tuple[bytes, int]:
+    """Delta-encode ascending doc numbers at the narrowest width that fits"""
+    gaps = docs.copy()
+    gaps[1:] -= docs[:-1]
+    peak = int(gaps.max())
+    width = 1 if peak < 1 << 8 else 2 if peak < 1 << 16 else 4
+    return gaps.astype(_GAP_DTYPES[width]).tobytes(), width
+
+
+def _invert(texts: List[str], base: int) -> Tuple[Dict, np.ndarray]:
+    """term -> (doc numbers, term frequencies) for ``texts`` numbered from
+    ``base``, plus each text's token count"""
+    tokens, lengths = [], []
+    for text in texts:
+        text_tokens = tokenize(text)
+        lengths.append(len(text_tokens))
+        tokens.extend(text_tokens)
+    numbers: Dict[str, int] = {}
+    token_terms = [numbers.setdefault(token, len(numbers)) for token in tokens]
+
+    lengths = np.array(lengths, dtype=np.int64)
+    if not numbers:
+        return {}, lengths
+    # Sorting (term, doc) keys groups each term's postings in doc order
+    count = len(texts)
+    keys = np.array(token_terms, dtype=np.int64) * count + np.repeat(
+        np.arange(count), lengths
+    )
+    keys, tfs = np.unique(keys, return_counts=True)
+    terms, docs = np.divmod(keys, count)
+    docs += base
+    tfs = np.minimum(tfs, 0xFFFF).astype(np.uint16)
+    bounds = np.searchsorted(terms, np.arange(len(numbers) + 1))
+    return {
+        term: (docs[bounds[i] : bounds[i + 1]], tfs[bounds[i] : bounds[i + 1]])
+        for term, i in numbers.items()
+    }, lengths
+
+
+class KeywordIndex:
+    """
+    Immutable BM25 inverted index over one widget's chunks.
+
+    Postings live in flat arrays: each term's doc numbers are stored as
+    gaps in one byte buffer (uint8/16/32 per term, whichever fits its
+    largest gap) with term frequencies in a parallel uint16 array, so a
+    lookup is a ``frombuffer`` + ``cumsum``. Updates build a new index via
+    ``merge``; new chunks get the highest doc numbers, so unchanged
+    postings are copied as raw bytes unless rows were removed.
+    """
+
+    def __init__(
+        self,
+        doc_ids: np.ndarray,
+        doc_lengths: np.ndarray,
+        vocab: np.ndarray,
+        term_offsets: np.ndarray,
+        term_starts: np.ndarray,
+        term_widths: np.ndarray,
+        postings: np.ndarray,
+        tfs: np.ndarray,
+    ):
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.vocab = vocab
+        self.term_offsets = term_offsets
+        self.term_starts = term_starts
+        self.term_widths = term_widths
+        self.postings = postings
+        self.tfs = tfs
+        self.terms = {str(term): i for i, term in enumerate(vocab)}
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def empty(cls) -> "KeywordIndex":
+        return cls(
+            np.array([], dtype=str),
+            np.zeros(0, dtype=np.uint32),
+            np.array([], dtype=str),
+            np.zeros(0, dtype=np.int64),
+            np.zeros(1, dtype=np.int64),
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(0, dtype=np.uint8),
+            np.zeros(0, dtype=np.uint16),
+        )
+
+    @classmethod
+    def build(cls, chunks: Dict[str, str]) -> "KeywordIndex":
+        return cls.empty().merge(chunks)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the postings and term tables"""
+        return sum(
+            array.nbytes
+            for array in (
+                self.doc_lengths,
+                self.term_offsets,
+                self.term_starts,
+                self.term_widths,
+                self.postings,
+                self.tfs,
+            )
+        )
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.term_starts[term], self.term_starts[term + 1]
+        gaps = np.frombuffer(
+            self.postings,
+            dtype=_GAP_DTYPES[int(self.term_widths[term])],
+            count=int(end - start),
+            offset=int(self.term_offsets[term]),
+        )
+        return np.cumsum(gaps, dtype=np.int64), self.tfs[start:end]
+
+    def _raw_postings(self, term: int) -> Tuple[bytes, int, np.ndarray]:
+        start, end = self.term_starts[term], self.term_starts[term + 1]
+        width = int(self.term_widths[term])
+        offset = int(self.term_offsets[term])
+        data = self.postings[offset : offset + int(end - start) * width].tobytes()
+        return data, width, self.tfs[start:end]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top ``k`` (chunk ID, BM25 score) pairs for ``query``"""
+        terms = {self.terms[t] for t in tokenize(query) if t in self.terms}
+        if not terms:
+            return []
+
+        k1, b = settings.BM25_K1, settings.BM25_B
+        count = len(self.doc_ids)
+        scores = np.zeros(count, dtype=np.float32)
+        for term in terms:
+            docs, tfs = self._postings(term)
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = k1 * (1 - b + b * self.doc_lengths[docs] / self.avg_length)
+            # A term's doc numbers are unique, so plain fancy-index adds work
+            scores[docs] += idf * tfs * (k1 + 1) / (tfs + norm)
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(str(self.doc_ids[i]), float(scores[i])) for i in hits]
+
+    def merge(
+        self, added: Dict[str, str] = None, removed: Iterable[str] = ()
+    ) -> "KeywordIndex":
+        """New index without ``removed`` IDs and with ``added`` ID -> text"""
+        removed = set(removed)
+        keep = np.array([doc_id not in removed for doc_id in self.doc_ids], dtype=bool)
+        rewrite = not keep.all()
+        remap = np.cumsum(keep) - 1
+        base = int(keep.sum())
+
+        # Content-addressed IDs: an ID already indexed has the same text
+        existing = {str(doc_id) for doc_id in self.doc_ids[keep]}
+        new_ids, new_texts = [], []
+        for doc_id, text in (added or {}).items():
+            if doc_id not in existing:
+                existing.add(doc_id)
+                new_ids.append(doc_id)
+                new_texts.append(text)
+        new_postings, new_lengths = _invert(new_texts, base)
+
+        vocab, buffers, widths, starts, tf_parts, offsets = [], [], [], [0], [], []
+        offset = 0
+
+        def append(term: str, data: bytes, width: int, tfs: np.ndarray):
+            nonlocal offset
+            offsets.append(offset)
+            vocab.append(term)
+            buffers.append(data)
+            widths.append(width)
+            starts.append(starts[-1] + len(tfs))
+            tf_parts.append(tfs)
+            offset += len(data)
+
+        for term in list(self.terms) + [t for t in new_postings if t not in self.terms]:
+            extra = new_postings.get(term)
+            old = self.terms.get(term)
+            if old is not None and not rewrite and extra is None:
+                data, width, tfs = self._raw_postings(old)
+                append(term, data, width, tfs)
+                continue
+
+            if old is None:
+                docs, tfs = extra
+            else:
+                docs, tfs = self._postings(old)
+                if rewrite:
+                    live = keep[docs]
+                    docs, tfs = remap[docs[live]], tfs[live]
+                if extra is not None:
+                    docs = np.concatenate([docs, extra[0]])
+                    tfs = np.concatenate([tfs, extra[1]])
+            if not len(docs):
+                continue
+            data, width = _encode_gaps(docs)
+            append(term, data, width, tfs)
+
+        return KeywordIndex(
+            np.concatenate([self.doc_ids[keep], np.array(new_ids, dtype=str)]),
+            np.concatenate([self.doc_lengths[keep], new_lengths.astype(np.uint32)]),
+            np.array(vocab, dtype=str),
+            np.array(offsets, dtype=np.int64),
+            np.array(starts, dtype=np.int64),
+            np.array(widths, dtype=np.uint8),
+            np.frombuffer(b"".join(buffers), dtype=np.uint8),
+            (
+                np.concatenate(tf_parts).astype(np.uint16)
+                if tf_parts
+                else np.zeros(0, dtype=np.uint16)
+            ),
+        )
+
+    def save(self, path: str, version: int = -1):
+        """Atomically write the index to ``path``, tagged with ``version``"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                version=np.int64(version),
+                doc_ids=self.doc_ids,
+                doc_lengths=self.doc_lengths,
+                vocab=self.vocab,
+                term_offsets=self.term_offsets,
+                term_starts=self.term_starts,
+                term_widths=self.term_widths,
+                postings=self.postings,
+                tfs=self.tfs,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["KeywordIndex", int]:
+        """The index at ``path`` and the version it was saved with"""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(
+                data["doc_ids"],
+                data["doc_lengths"],
+                data["vocab"],
+                data["term_offsets"],
+                data["term_starts"],
+                data["term_widths"],
+                data["postings"],
+                data["tfs"],
+            )
+            return index, int(data["version"]) if "version" in data else -1
+
+
+class KeywordIndexService:
+    """
+    Per-widget BM25 indexes persisted under ``KEYWORD_INDEX_DIR``.
+
+    Each worker keeps the most recently used ``KEYWORD_INDEX_CACHE_SIZE``
+    indexes in memory. Every update bumps the widget's version in Redis;
+    at most every ``KEYWORD_INDEX_RELOAD_INTERVAL`` seconds a worker
+    compares its copy against it and, when behind, loads the local file
+    if that has the current version or else rebuilds from the widget's
+    ``training_chunks`` rows. Hosts that did not run the training thus
+    catch up from the database. Without Redis, a changed file is
+    reloaded instead.
+    """
+
+    def __init__(self, root: str = None, max_size: int = None):
+        self.root = root or settings.KEYWORD_INDEX_DIR
+        self.max_size = max_size or settings.KEYWORD_INDEX_CACHE_SIZE
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._redis_client = None
+
+    def _path(self, widget_id: str) -> str:
+        return os.path.join(self.root, f"{widget_id}.npz")
+
+    def _mtime(self, widget_id: str) -> Optional[int]:
+        try:
+            return os.stat(self._path(widget_id)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def _get_redis_client(self):
+        if self._redis_client is None:
+            try:
+                self._redis_client = redis.from_url(
+                    settings.REDIS_URL, decode_responses=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to connect to Redis for keyword index: {e}")
+                self._redis_client = None
+        return self._redis_client
+
+    async def _version(self, widget_id: str, bump: bool = False) -> Optional[int]:
+        """The widget's shared index version (after incrementing it if
+        ``bump``); None when Redis is unreachable"""
+        try:
+            redis_client = await self._get_redis_client()
+            if not redis_client:
+                return None
+            key = VERSION_KEY.format(widget_id)
+            version = await (redis_client.incr(key) if bump else redis_client.get(key))
+            return int(version or 0)
+        except Exception as e:
+            logger.warning(f"Keyword index version unavailable for {widget_id}: {e}")
+            return None
+
+    def _stamp(self, widget_id: str, version: Optional[int]) -> tuple:
+        # Shared version when known, else the local file's mtime
+        return (
+            ("version", version)
+            if version is not None
+            else ("mtime", self._mtime(widget_id))
+        )
+
+    def _remember(self, widget_id: str, index: KeywordIndex, stamp: tuple):
+        self._entries[widget_id] = (index, stamp, time.monotonic())
+        self._entries.move_to_end(widget_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _store(self, widget_id: str, index: KeywordIndex, version: Optional[int]):
+        os.makedirs(self.root, exist_ok=True)
+        await asyncio.to_thread(
+            index.save, self._path(widget_id), -1 if version is None else version
+        )
+        self._remember(widget_id, index, self._stamp(widget_id, version))
+
+    async def get(self, widget_id: str) -> KeywordIndex:
+        """The widget's current index"""
+        entry = self._entries.get(widget_id)
+        if entry is not None:
+            index, stamp, checked_at = entry
+            if time.monotonic() - checked_at < settings.KEYWORD_INDEX_RELOAD_INTERVAL:
+                self._entries.move_to_end(widget_id)
+                return index
+
+        version = await self._version(widget_id)
+        if entry is not None:
+            current = self._stamp(widget_id, version)
+            if current == stamp and current[1] is not None:
+                self._remember(widget_id, index, stamp)
+                return index
+
+        async with self._locks.setdefault(widget_id, asyncio.Lock()):
+            return await self._load(widget_id, version)
+
+    async def _load(self, widget_id: str, version: Optional[int]) -> KeywordIndex:
+        """The widget's index as of ``version``: its file if that is
+        current, else rebuilt from the database; callers hold the lock"""
+        if self._mtime(widget_id) is not None:
+            index, saved = await asyncio.to_thread(
+                KeywordIndex.load, self._path(widget_id)
+            )
+            if version is None or saved == version:
+                self._remember(widget_id, index, self._stamp(widget_id, version))
+                return index
+
+        logger.info(f"Building keyword index for widget {widget_id}")
+        chunks = await chunk_store.get_widget_chunks(widget_id)
+        index = await asyncio.to_thread(KeywordIndex.build, chunks)
+        await self._store(widget_id, index, version)
+        return index
+
+    async def search(
+        self, widget_id: str, query: str, k: int
+    ) -> List[Tuple[str, float]]:
+        """Top ``k`` (chunk ID, BM25 score) pairs"""
+        index = await self.get(widget_id)
+        if not len(index):
+            return []
+        return await asyncio.to_thread(index.search, query, k)
+
+    async def update(
+        self, widget_id: str, added: Dict[str, str] = None, removed: Iterable[str] = ()
+    ):
+        """Add ``added`` chunk ID -> text and drop ``removed`` IDs
+
+        Call after committing the change to ``training_chunks``.
+        """
+        removed = list(removed)
+        if not added and not removed:
+            return
+        try:
+            async with self._locks.setdefault(widget_id, asyncio.Lock()):
+                version = await self._version(widget_id)
+                index = await self._load(widget_id, version)
+                index = await asyncio.to_thread(index.merge, added, removed)
+                bumped = await self._version(widget_id, bump=True)
+                if None not in (version, bumped) and bumped != version + 1:
+                    # Another host updated it meanwhile; the database has both
+                    chunks = await chunk_store.get_widget_chunks(widget_id)
+                    index = await asyncio.to_thread(KeywordIndex.build, chunks)
+                await self._store(widget_id, index, bumped)
+        except Exception as e:
+            # Dropping the file makes the next query rebuild from the database
+            logger.error(f"Keyword index update failed for widget {widget_id}: {e}")
+            await self.delete(widget_id)
+
+    async def delete(self, widget_id: str):
+        """Forget the widget's index on every host"""
+        self._entries.pop(widget_id, None)
+        try:
+            os.remove(self._path(widget_id))
+        except FileNotFoundError:
+            pass
+        await self._version(widget_id, bump=True)
+
+    async def close(self):
+        if self._redis_client:
+            await self._redis_client.close()
+            self._redis_client = None
+
+
+# Global instance
+keyword_index_service = KeywordIndexService()
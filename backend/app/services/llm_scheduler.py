@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+from ..core.config import settings
+from ..core.exceptions import LLMOverloadedError
+from .ollama_pool import ollama_pool
+
+logger = logging.getLogger(__name__)
+
+# Recent queue waits kept for percentiles
+WAIT_SAMPLES = 1000
+# Smoothing for the slot hold time behind Retry-After
+SERVICE_TIME_ALPHA = 0.2
+
+
+def _plan_name(plan) -> str:
+    return getattr(plan, "value", plan)
+
+
+def _plan_limit(plan: str, key: str, default):
+    return settings.get_plan_limits(plan).get(key, default)
+
+
+class _Waiter:
+    __slots__ = ("tenant", "plan", "weight", "future", "state")
+
+    def __init__(self, tenant: str, plan: str):
+        self.tenant = tenant
+        self.plan = plan
+        self.weight = _plan_limit(plan, "llm_weight", 1)
+        self.future = asyncio.get_running_loop().create_future()
+        self.state = "queued"  # then granted, or gone
+
+
+class LLMScheduler:
+    """
+    Admission control in front of Ollama: a bounded, tenant-fair queue.
+
+    At most ``capacity`` chat generations run at once (the concurrency
+    limits of the Ollama hosts that are not ejected). Requests beyond
+    that wait, ordered by start-time fair queuing: each tenant's requests
+    get virtual finish tags spaced ``1 / llm_weight`` apart, so a
+    backlogged tenant receives capacity in proportion to its plan's
+    weight and one tenant's burst only delays others by its share.
+
+    The queue holds ``LLM_QUEUE_SIZE`` requests. When it is full, the
+    newest request of the tenant with the most queued per unit of weight
+    is pushed out, unless that would be the newcomer's own tenant; plan
+    ``llm_priority`` breaks ties here and in dispatch order. Pushed-out
+    requests, and those waiting longer than ``LLM_QUEUE_TIMEOUT``, fail
+    at once with ``LLMOverloadedError`` carrying a Retry-After estimate.
+    Per worker process.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._heap = []  # (finish tag, -priority, seq, start tag, waiter)
+        self._seq = itertools.count()
+        self._finish: Dict[str, float] = {}  # last finish tag per tenant
+        self._virtual_time = 0.0
+        self._queued: Dict[str, deque] = {}  # waiting requests per tenant
+        self._depth = Counter()  # waiting requests per plan
+        self._waits = deque(maxlen=WAIT_SAMPLES)  # ms
+        self._service_s: Optional[float] = None  # EWMA of slot hold time
+        self.stats = Counter()
+        self._by_plan = defaultdict(Counter)
+
+    @property
+    def capacity(self) -> int:
+        hosts = [host for host in ollama_pool.hosts if not host.ejected]
+        return max(1, sum(host.max_concurrent for host in hosts or ollama_pool.hosts))
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self._depth.values())
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained; never
+        more than the queue timeout, by which every waiter has left"""
+        service_s = self._service_s or settings.LLM_QUEUE_TIMEOUT
+        drain = (self.queue_depth + 1) * service_s / self.capacity
+        return max(1, min(math.ceil(settings.LLM_QUEUE_TIMEOUT), math.ceil(drain)))
+
+    def _pressure(self, tenant: str, plan: str, extra: int = 0) -> tuple:
+        queued = len(self._queued.get(tenant, ())) + extra
+        return (
+            queued / _plan_limit(plan, "llm_weight", 1),
+            -_plan_limit(plan, "llm_priority", 0),
+        )
+
+    def _victim(self, tenant: str, plan: str) -> Optional[_Waiter]:
+        """Newest request of the tenant most over its share, if that
+        tenant is further over it than ``tenant`` would be"""
+        mine = self._pressure(tenant, plan, extra=1)
+        worst, worst_pressure = None, mine
+        for other, waiters in self._queued.items():
+            pressure = self._pressure(other, waiters[-1].plan)
+            if other != tenant and pressure > worst_pressure:
+                worst, worst_pressure = waiters[-1], pressure
+        return worst
+
+    def check_admission(self, tenant: str, plan: str):
+        """Raise ``LLMOverloadedError`` if ``tenant`` could not queue now"""
+        plan = _plan_name(plan)
+        if self.queue_depth < settings.LLM_QUEUE_SIZE:
+            return
+        if self._victim(tenant, plan) is None:
+            self._reject(plan, "queue_full")
+            raise LLMOverloadedError("LLM queue is full", self.retry_after())
+
+    def _reject(self, plan: str, reason: str):
+        self.stats[f"rejected_{reason}"] += 1
+        self._by_plan[plan]["rejected"] += 1
+        logger.warning(
+            f"Rejected {plan} LLM request ({reason.replace('_', ' ')}): "
+            f"{self.queue_depth} waiting, {self.in_flight} running"
+        )
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, plan: str) -> AsyncIterator[float]:
+        """Hold one generation slot for ``tenant``; yields the queue wait
+        in milliseconds"""
+        plan = _plan_name(plan)
+        started = time.monotonic()
+        if self.in_flight < self.capacity and not self.queue_depth:
+            self.in_flight += 1
+        else:
+            self.check_admission(tenant, plan)
+            if self.queue_depth >= settings.LLM_QUEUE_SIZE:
+                self._push_out(self._victim(tenant, plan))
+            waiter = self._enqueue(tenant, plan)
+            self._dispatch()  # capacity may have grown (host re-admitted)
+            try:
+                await asyncio.wait_for(waiter.future, settings.LLM_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                self._reject(plan, "timeout")
+                raise LLMOverloadedError(
+                    f"No LLM capacity within {settings.LLM_QUEUE_TIMEOUT}s",
+                    self.retry_after(),
+                )
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+        admitted = time.monotonic()
+        wait_ms = (admitted - started) * 1000
+        self._waits.append(wait_ms)
+        self.stats["admitted"] += 1
+        self._by_plan[plan]["admitted"] += 1
+        try:
+            yield wait_ms
+        finally:
+            self._release(time.monotonic() - admitted)
+
+    def _enqueue(self, tenant: str, plan: str) -> _Waiter:
+        waiter = _Waiter(tenant, plan)
+        start = max(self._virtual_time, self._finish.get(tenant, 0.0))
+        finish = start + 1.0 / waiter.weight
+        self._finish[tenant] = finish
+
+        priority = _plan_limit(plan, "llm_priority", 0)
+        heapq.heappush(self._heap, (finish, -priority, next(self._seq), start, waiter))
+        self._queued.setdefault(tenant, deque()).append(waiter)
+        self._depth[plan] += 1
+        return waiter
+
+    def _unqueue(self, waiter: _Waiter, state: str):
+        waiter.state = state
+        waiters = self._queued[waiter.tenant]
+        waiters.remove(waiter)
+        if not waiters:
+            del self._queued[waiter.tenant]
+        self._depth[waiter.plan] -= 1
+
+    def _push_out(self, waiter: _Waiter):
+        self._unqueue(waiter, "gone")
+        self._reject(waiter.plan, "pushed_out")
+        waiter.future.set_exception(
+            LLMOverloadedError("LLM queue is full", self.retry_after())
+        )
+
+    def _abandon(self, waiter: _Waiter):
+        """The waiter gave up (timeout, cancelled or pushed out)"""
+        if waiter.state == "queued":
+            self._unqueue(waiter, "gone")
+            self._dispatch()
+        elif waiter.state == "granted":
+            # Granted a slot just as it gave up
+            self._release(0.0)
+
+    def _dispatch(self):
+        while self._heap and self.in_flight < self.capacity:
+            _, _, _, start, waiter = heapq.heappop(self._heap)
+            if waiter.state != "queued":
+                continue
+            self._unqueue(waiter, "granted")
+            self._virtual_time = start
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+        if not self.queue_depth:
+            # Nobody is backlogged, so past usage stops mattering
+            self._heap.clear()
+            self._finish.clear()
+            self._virtual_time = 0.0
+
+    def _release(self, held_s: float):
+        self.in_flight -= 1
+        if held_s:
+            self._service_s = (
+                held_s
+                if self._service_s is None
+                else SERVICE_TIME_ALPHA * held_s
+                + (1 - SERVICE_TIME_ALPHA) * self._service_s
+            )
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(pct: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))], 1)
+
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_plan": {
+                plan: depth for plan, depth in self._depth.items() if depth
+            },
+            "queue_limit": settings.LLM_QUEUE_SIZE,
+            "wait_ms": {
+                "p50": percentile(50),
+                "p95": percentile(95),
+                "p99": percentile(99),
+                "samples": len(waits),
+            },
+            "service_time_ms": (
+                round(self._service_s * 1000, 1) if self._service_s else None
+            ),
+            **self.stats,
+            "by_plan": {plan: dict(counts) for plan, counts in self._by_plan.items()},
+        }
+
+
+# Global instance
+llm_scheduler = LLMScheduler()
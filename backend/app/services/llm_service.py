@@ -3,20 +3,127 @@ import aiohttp
 import logging
 import time
 import json
-from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+from typing import List, Optional, Dict, Any, AsyncIterator
 from ..core.config import settings
 from ..core.exceptions import LLMError
+from .context_builder import context_builder
+from .model_router import model_router
+from .ollama_pool import ollama_pool
 
 logger = logging.getLogger(__name__)
 
 
+class _Attempt:
+    """One model's generation in a hedged race, streamed by a background task"""
+
+    def __init__(
+        self,
+        service: "OllamaLLMService",
+        config: Dict[str, Any],
+        prompt: str,
+        temperature: float,
+        max_tokens: Optional[int],
+    ):
+        self.name = config["name"]
+        self.prompt = prompt
+        self.usage = {}
+        self.tokens: List[str] = []
+        self.queue: asyncio.Queue = asyncio.Queue()  # tokens, then None
+        self.first_token = asyncio.Event()
+        self.first_token_at = None
+        self.error = None
+        self.started = time.monotonic()
+        model_router.started(self.name)
+        self.task = asyncio.create_task(
+            self._run(service, config, temperature, max_tokens)
+        )
+        self.first_token_task = asyncio.create_task(self.first_token.wait())
+
+    async def _run(self, service, config, temperature, max_tokens):
+        try:
+            async for token in service._stream_generate_async(
+                prompt=self.prompt,
+                model=self.name,
+                temperature=temperature,
+                max_tokens=max_tokens or config["max_tokens"],
+                timeout=config["timeout"],
+                usage=self.usage,
+            ):
+                # Drop leading whitespace, like the non-streaming .strip()
+                if not self.tokens:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                    self.first_token_at = time.monotonic()
+                    model_router.first_token(
+                        self.name, (self.first_token_at - self.started) * 1000
+                    )
+                    self.first_token.set()
+
+                self.tokens.append(token)
+                self.queue.put_nowait(token)
+        except asyncio.CancelledError:
+            # Lost the race: a stall counts against the model, a cut-off
+            # stream says nothing about it
+            self._report(False if self.first_token_at is None else None, "stalled")
+            raise
+        except Exception as e:
+            self.error = e
+            self._report(False, str(e))
+        else:
+            self._report(self.valid, None if self.valid else "empty response")
+        finally:
+            self.queue.put_nowait(None)
+
+    def _report(self, ok: Optional[bool], error: Optional[str]):
+        model_router.finished(
+            self.name, ok, (time.monotonic() - self.started) * 1000, error
+        )
+
+    @property
+    def response(self) -> str:
+        return "".join(self.tokens).strip()
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None and len(self.response) > 10
+
+    def cancel(self):
+        self.task.cancel()
+        self.first_token_task.cancel()
+
+
 class OllamaLLMService:
     def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
         self.timeout = settings.OLLAMA_TIMEOUT
         self.session = None
 
+        self.hedged_requests = 0
+
+        # Models smallest first; model_router picks the order per request
+        self.model_cascade = [
+            {
+                "name": "qwen:0.5b",
+                "timeout": 30,
+                "max_tokens": 120,
+                "context_tokens": 768,
+            },  # Increased from 8s
+            {
+                "name": "tinydolphin:latest",
+                "timeout": 45,
+                "max_tokens": 150,
+                "context_tokens": 1024,
+            },  # Increased from 15s
+            {
+                "name": "phi:latest",
+                "timeout": 60,
+                "max_tokens": 200,
+                "context_tokens": 1536,
+            },  # Increased from 20s
+        ]
+
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create HTTP session"""
         if self.session is None or self.session.closed:
@@ -34,24 +141,21 @@ class OllamaLLMService:
         system_prompt: str,
         context_docs: List[tuple],
         user_question: str,
-        max_context_length: int = None,
+        model: str = None,
+        context_tokens: int = None,
     ) -> str:
-        """Create a well-structured prompt with context"""
-        max_length = max_context_length or settings.MAX_CONTEXT_LENGTH
-
-        # Build context from retrieved documents
-        context_parts = []
-        current_length = 0
-
-        for content, score, metadata in context_docs:
-            # Only include high-quality matches (higher score = better match in cosine similarity)
-            if score >= 0.7:  # Cosine similarity threshold
-                doc_text = f"Document: {content.strip()}"
-                if len(doc_text) + current_length < max_length:
-                    context_parts.append(doc_text)
-                    current_length += len(doc_text)
-                else:
-                    break
+        """Create a well-structured prompt with context
+
+        Documents arrive ranked, filtered and de-duplicated by retrieval;
+        they are packed in order into ``context_tokens`` tokens as counted
+        by ``model``'s tokenizer.
+        """
+        context_parts = [
+            f"Document: {text}"
+            for text in context_builder.pack(
+                context_docs, model or self.model, context_tokens
+            )
+        ]
 
         context = (
             "\n\n".join(context_parts)
@@ -77,71 +181,150 @@ Answer:"""
 
         return prompt
 
-    async def get_response_async(
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """Router stats and decisions for the configured cascade, and the
+        state of each Ollama host"""
+        return {
+            "hedged_requests": self.hedged_requests,
+            **model_router.get_stats(self.model_cascade),
+            "hosts": ollama_pool.get_stats(),
+        }
+
+    async def _race(
         self,
         system_prompt: str,
         context_docs: List[tuple],
         user_question: str,
-        temperature: float = None,
-        max_tokens: int = None,
-    ) -> Dict[str, Any]:
-        """Get LLM response asynchronously"""
-        start_time = time.time()
-
-        try:
-            # Create prompt with context
+        temperature: float,
+        max_tokens: Optional[int],
+        deadline: float,
+        commit_on_first_token: bool,
+    ) -> Optional["_Attempt"]:
+        """
+        Run the model cascade as a hedged race; returns the winning attempt.
+
+        ``model_router`` orders the cascade and the first model starts
+        alone. If no first token arrives within its adaptive hedge delay,
+        the next model starts alongside it; a model that fails starts the
+        next one at once. With ``commit_on_first_token`` the first attempt
+        to produce a token wins (streaming), otherwise the first to
+        complete a valid answer.
+        Losers are cancelled; nothing outlives ``deadline``.
+        """
+        cascade = model_router.order(self.model_cascade, user_question)
+        running: List[_Attempt] = []
+
+        def launch():
+            nonlocal launched
+            launched += 1
+            config = cascade.pop(0)
             prompt = self.create_context_prompt(
                 system_prompt=system_prompt,
                 context_docs=context_docs,
                 user_question=user_question,
+                model=config["name"],
+                context_tokens=config["context_tokens"],
             )
+            running.append(_Attempt(self, config, prompt, temperature, max_tokens))
+            if len(running) > 1:
+                logger.info(f"Hedging with {config['name']}")
 
-            # Try multiple models in order of preference
-            models_to_try = [
-                {
-                    "name": "qwen:0.5b",
-                    "timeout": 30,
-                    "max_tokens": 120,
-                },  # Increased from 8s
-                {
-                    "name": "tinydolphin:latest",
-                    "timeout": 45,
-                    "max_tokens": 150,
-                },  # Increased from 15s
-                {
-                    "name": "phi:latest",
-                    "timeout": 60,
-                    "max_tokens": 200,
-                },  # Increased from 20s
-            ]
-
-            for model_config in models_to_try:
-                try:
-                    response = await self._generate_response_async(
-                        prompt=prompt,
-                        model=model_config["name"],
-                        temperature=temperature or 0.4,
-                        max_tokens=max_tokens or model_config["max_tokens"],
-                        timeout=model_config["timeout"],
+        launched = 0
+        launch()
+        winner = None
+        try:
+            while running and winner is None:
+                now = time.monotonic()
+                if now >= deadline:
+                    logger.warning("LLM request deadline reached")
+                    break
+
+                started = any(attempt.first_token_at for attempt in running)
+                wait = deadline - now
+                if cascade and not started:
+                    newest = running[-1]
+                    hedge_at = newest.started + model_router.hedge_delay(newest.name)
+                    wait = min(wait, max(0.0, hedge_at - now))
+
+                waiters = {attempt.task for attempt in running}
+                if commit_on_first_token:
+                    waiters |= {
+                        attempt.first_token_task
+                        for attempt in running
+                        if not attempt.first_token.is_set()
+                    }
+                await asyncio.wait(
+                    waiters, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for attempt in list(running):
+                    if commit_on_first_token and attempt.first_token.is_set():
+                        winner = attempt
+                        break
+                    if not attempt.task.done():
+                        continue
+                    if attempt.valid:
+                        winner = attempt
+                        break
+                    logger.warning(f"Model {attempt.name} failed: {attempt.error}")
+                    attempt.cancel()
+                    running.remove(attempt)
+
+                if winner is None and cascade:
+                    started = any(attempt.first_token_at for attempt in running)
+                    newest_late = running and (
+                        time.monotonic() - running[-1].started
+                        >= model_router.hedge_delay(running[-1].name)
                     )
+                    if not running or (not started and newest_late):
+                        launch()
+        finally:
+            for attempt in running:
+                if attempt is not winner:
+                    attempt.cancel()
+            if launched > 1:
+                self.hedged_requests += 1
 
-                    if response and len(response.strip()) > 10:  # Valid response
-                        response_time = int((time.time() - start_time) * 1000)
+        return winner
+
+    async def get_response_async(
+        self,
+        system_prompt: str,
+        context_docs: List[tuple],
+        user_question: str,
+        temperature: float = None,
+        max_tokens: int = None,
+    ) -> Dict[str, Any]:
+        """Get LLM response asynchronously
 
-                        return {
-                            "response": response.strip(),
-                            "response_time_ms": response_time,
-                            "context_docs_used": len(context_docs),
-                            "tokens_used": self._estimate_tokens(prompt + response),
-                            "model_used": model_config["name"],
-                        }
+        Models race as described in ``_race``, all within
+        ``LLM_REQUEST_DEADLINE``; the template fallback answers if none
+        completes in time.
+        """
+        start_time = time.time()
+        deadline = time.monotonic() + settings.LLM_REQUEST_DEADLINE
 
-                except Exception as e:
-                    logger.warning(f"Model {model_config['name']} failed: {e}")
-                    continue
+        try:
+            winner = await self._race(
+                system_prompt,
+                context_docs,
+                user_question,
+                temperature or 0.4,
+                max_tokens,
+                deadline,
+                commit_on_first_token=False,
+            )
+            if winner is None:
+                raise LLMError("No model produced a response before the deadline")
 
-            # If all models fail, raise exception
-            raise LLMError("All available models failed to generate response")
+            response = winner.response
+            return {
+                "response": response,
+                "response_time_ms": int((time.time() - start_time) * 1000),
+                "context_docs_used": len(context_docs),
+                **self._token_usage(winner.prompt, response, winner.name, winner.usage),
+                "model_used": winner.name,
+            }
 
         except Exception as e:
             logger.error(f"LLM response generation failed: {e}")
@@ -157,22 +340,160 @@ Answer:"""
                 "fallback": True,
             }
 
-    async def _generate_response_async(
+    async def stream_response_async(
+        self,
+        system_prompt: str,
+        context_docs: List[tuple],
+        user_question: str,
+        temperature: float = None,
+        max_tokens: int = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream LLM response tokens as they are generated
+
+        Yields ``{"type": "token", "content": ...}`` events followed by a single
+        ``{"type": "done", ...}`` event carrying the same fields that
+        ``get_response_async`` returns. The first model to produce a token
+        (see ``_race``) is streamed; the answer is cut off at
+        ``LLM_REQUEST_DEADLINE``.
+        """
+        start_time = time.time()
+        started = time.monotonic()
+        deadline = started + settings.LLM_REQUEST_DEADLINE
+
+        winner = None
+        try:
+            winner = await self._race(
+                system_prompt,
+                context_docs,
+                user_question,
+                temperature or 0.4,
+                max_tokens,
+                deadline,
+                commit_on_first_token=True,
+            )
+
+            if winner is not None:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        logger.warning(f"Model {winner.name} cut off at deadline")
+                        break
+                    try:
+                        token = await asyncio.wait_for(winner.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Model {winner.name} cut off at deadline")
+                        break
+                    if token is None:
+                        break
+                    yield {"type": "token", "content": token}
+
+                if winner.error is not None:
+                    # Tokens already reached the client, so keep the partial answer
+                    logger.warning(
+                        f"Model {winner.name} stream interrupted: {winner.error}"
+                    )
+
+                response = "".join(winner.tokens).strip()
+                yield {
+                    "type": "done",
+                    "response": response,
+                    "response_time_ms": int((time.time() - start_time) * 1000),
+                    "time_to_first_token_ms": int(
+                        (winner.first_token_at - started) * 1000
+                    ),
+                    "context_docs_used": len(context_docs),
+                    **self._token_usage(
+                        winner.prompt, response, winner.name, winner.usage
+                    ),
+                    "model_used": winner.name,
+                }
+                return
+        finally:
+            if winner is not None:
+                winner.cancel()
+
+        logger.error("LLM streaming failed for all models")
+        fallback = self._get_fallback_response(context_docs, user_question)
+        response_time = int((time.time() - start_time) * 1000)
+
+        yield {"type": "token", "content": fallback}
+        yield {
+            "type": "done",
+            "response": fallback,
+            "response_time_ms": response_time,
+            "time_to_first_token_ms": response_time,
+            "context_docs_used": len(context_docs),
+            "tokens_used": 0,
+            "error": "No models produced a response",
+            "fallback": True,
+        }
+
+    async def _stream_generate_async(
         self,
         prompt: str,
         model: str = None,
         temperature: float = 0.4,
         max_tokens: int = 120,
         timeout: int = 10,
-    ) -> str:
-        """Generate response using Ollama API asynchronously"""
-        session = await self._get_session()
+        usage: Dict = None,
+    ) -> AsyncIterator[str]:
+        """Yield response tokens from Ollama's streaming generate API
+
+        ``usage`` (if given) receives Ollama's token counts from the final
+        chunk.
+        """
         model = model or self.model
 
-        payload = {
+        payload = self._build_generate_payload(
+            prompt, model, temperature, max_tokens, stream=True
+        )
+
+        try:
+            async with self._generate_request(payload, timeout) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise LLMError(f"HTTP {response.status}: {error_text}")
+
+                # Ollama streams one JSON object per line
+                async for line in response.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMError(chunk["error"])
+
+                    token = chunk.get("response", "")
+                    if token:
+                        yield token
+
+                    if chunk.get("done"):
+                        self._record_usage(chunk, usage)
+                        break
+
+        except LLMError:
+            raise
+        except asyncio.TimeoutError:
+            raise LLMError(f"Model {model} timed out after {timeout}s")
+        except aiohttp.ClientError as e:
+            raise LLMError(f"HTTP client error: {e}")
+        except json.JSONDecodeError as e:
+            raise LLMError(f"Malformed stream chunk from {model}: {e}")
+
+    def _build_generate_payload(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False,
+    ) -> Dict[str, Any]:
+        """Build request body for Ollama's generate API"""
+        return {
             "model": model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": temperature,
                 "num_predict": max_tokens,
@@ -182,31 +503,59 @@ Answer:"""
             },
         }
 
-        try:
-            async with session.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=timeout),
-            ) as response:
-
-                if response.status == 200:
-                    result = await response.json()
-                    generated_text = result.get("response", "").strip()
-
-                    if generated_text:
-                        return generated_text
+    @asynccontextmanager
+    async def _generate_request(
+        self, payload: Dict[str, Any], timeout: int
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """POST to /api/generate on the pool host picked for the model
+
+        Connection errors, timeouts before a response and 5xx count
+        against the host. Connection errors, 5xx and 404 (the host doesn't
+        have the model), where nothing was generated yet, are retried on
+        another host.
+        """
+        session = await self._get_session()
+        model = payload["model"]
+        tried = set()
+        while True:
+            async with ollama_pool.acquire(model, session, timeout, tried) as host:
+                tried.add(host)
+                try:
+                    response = await session.post(
+                        f"{host.url}/api/generate",
+                        json=payload,
+                        timeout=aiohttp.ClientTimeout(total=timeout),
+                    )
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    ollama_pool.record(host, False, str(e) or type(e).__name__)
+                    if isinstance(e, aiohttp.ClientError) and ollama_pool.can_retry(
+                        model, tried
+                    ):
+                        logger.warning(f"Retrying {model} elsewhere: {host.url}: {e}")
+                        continue
+                    raise
+
+                async with response:
+                    if response.status == 404:
+                        ollama_pool.record_missing_model(host, model)
+                        if ollama_pool.can_retry(model, tried):
+                            logger.warning(
+                                f"Retrying {model} elsewhere: {host.url} "
+                                f"doesn't have it"
+                            )
+                            continue
+                    elif response.status >= 500:
+                        ollama_pool.record(host, False, f"HTTP {response.status}")
+                        if ollama_pool.can_retry(model, tried):
+                            logger.warning(
+                                f"Retrying {model} elsewhere: {host.url}: "
+                                f"HTTP {response.status}"
+                            )
+                            continue
                     else:
-                        raise LLMError("Empty response from model")
-                else:
-                    error_text = await response.text()
-                    raise LLMError(f"HTTP {response.status}: {error_text}")
-
-        except asyncio.TimeoutError:
-            raise LLMError(f"Model {model} timed out after {timeout}s")
-        except aiohttp.ClientError as e:
-            raise LLMError(f"HTTP client error: {e}")
-        except Exception as e:
-            raise LLMError(f"Unexpected error: {e}")
+                        ollama_pool.record(host, True)
+                    yield response
+                    return
 
     def _get_fallback_response(
         self, context_docs: List[tuple], user_question: str
@@ -230,69 +579,82 @@ Answer:"""
         else:
             return f"According to {title}: {content[:200]}... Does this help answer your question?"
 
-    def _estimate_tokens(self, text: str) -> int:
-        """Rough token estimation (1 token ≈ 4 characters for English)"""
-        return len(text) // 4
+    @staticmethod
+    def _record_usage(result: Dict, usage: Optional[Dict]):
+        """Copy Ollama's prompt/completion token counts into ``usage``"""
+        if usage is not None:
+            for field in ("prompt_eval_count", "eval_count"):
+                if result.get(field) is not None:
+                    usage[field] = result[field]
+
+    def _token_usage(self, prompt: str, response: str, model: str, usage: Dict) -> Dict:
+        """Token counts reported by Ollama, else counted with the model's
+        tokenizer"""
+        prompt_tokens = usage.get("prompt_eval_count")
+        if prompt_tokens is None:
+            prompt_tokens = context_builder.tokens.count(prompt, model, remember=False)
+        completion_tokens = usage.get("eval_count")
+        if completion_tokens is None:
+            completion_tokens = context_builder.tokens.count(
+                response, model, remember=False
+            )
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_used": prompt_tokens + completion_tokens,
+        }
 
     async def health_check(self) -> bool:
-        """Check if Ollama service is healthy"""
+        """Check if Ollama service is healthy
+
+        Also refreshes which models each pool host has.
+        """
         try:
             session = await self._get_session()
-
-            async with session.get(
-                f"{self.base_url}/api/tags", timeout=aiohttp.ClientTimeout(total=5)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = data.get("models", [])
-
-                    # Check if our model is available
-                    available_models = [model.get("name", "") for model in models]
-                    return any(
-                        self.model in model_name for model_name in available_models
-                    )
-
-                return False
+            await ollama_pool.refresh(session)
+            return ollama_pool.has_model(self.model)
 
         except Exception as e:
             logger.error(f"Ollama health check failed: {e}")
             return False
 
     async def list_available_models(self) -> List[str]:
-        """List available models in Ollama"""
+        """List models available on any Ollama host"""
         try:
             session = await self._get_session()
-
-            async with session.get(f"{self.base_url}/api/tags") as response:
-                if response.status == 200:
-                    data = await response.json()
-                    models = data.get("models", [])
-                    return [model.get("name", "") for model in models]
-
-                return []
+            await ollama_pool.refresh(session)
+            return ollama_pool.models()
 
         except Exception as e:
             logger.error(f"Failed to list models: {e}")
             return []
 
     async def pull_model(self, model_name: str) -> bool:
-        """Pull a model if not available"""
-        try:
-            session = await self._get_session()
-
-            payload = {"name": model_name}
-
-            async with session.post(
-                f"{self.base_url}/api/pull",
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=300),  # 5 minutes for model pull
-            ) as response:
+        """Pull a model onto every host that doesn't have it"""
+        session = await self._get_session()
 
-                return response.status == 200
+        async def pull(host) -> bool:
+            try:
+                async with session.post(
+                    f"{host.url}/api/pull",
+                    json={"name": model_name},
+                    timeout=aiohttp.ClientTimeout(total=300),  # 5 minutes per pull
+                ) as response:
+                    return response.status == 200
+            except Exception as e:
+                logger.error(f"Failed to pull model {model_name} on {host.url}: {e}")
+                return False
 
-        except Exception as e:
-            logger.error(f"Failed to pull model {model_name}: {e}")
-            return False
+        hosts = [
+            host
+            for host in ollama_pool.hosts
+            if not host.ejected
+            and (host.models is None or not host.has_model(model_name))
+        ]
+        results = await asyncio.gather(*(pull(host) for host in hosts))
+        if hosts:
+            await ollama_pool.refresh(session)
+        return all(results)
 
 
 # Global instance
@@ -0,0 +1,258 @@
+import logging
+import re
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Recent routing decisions kept for the diagnostics endpoint
+DECISION_LOG_SIZE = 100
+
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+", re.MULTILINE)
+
+
+def classify_question(question: str) -> str:
+    """``simple``, ``standard`` or ``complex``
+
+    Multi-part questions (several question marks or list items) and long
+    ones are complex; short single questions are simple.
+    """
+    words = len(question.split())
+    parts = max(question.count("?"), len(_LIST_ITEM.findall(question)))
+    if parts >= 2 or words >= settings.LLM_ROUTER_COMPLEX_MIN_WORDS:
+        return "complex"
+    if words <= settings.LLM_ROUTER_SIMPLE_MAX_WORDS:
+        return "simple"
+    return "standard"
+
+
+class ModelStats:
+    """Live traffic stats for one model"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency_ms: Optional[float] = None  # EWMA of full generations
+        self.ttft_ms: Optional[float] = None  # EWMA of time-to-first-token
+        self.error_rate = 0.0  # EWMA of failed attempts (errors and stalls)
+        self.ttft_samples = deque(maxlen=settings.LLM_HEDGE_WINDOW)
+        self.degraded_until = 0.0
+        self.probe_started = 0.0
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        return alpha * sample + (1 - alpha) * current
+
+    @property
+    def sampled(self) -> bool:
+        return self.requests >= settings.LLM_ROUTER_MIN_SAMPLES
+
+    def state(self, now: float) -> str:
+        """``healthy``, ``degraded`` (no traffic) or ``probing`` (one trial
+        request allowed after the cooldown)"""
+        if not self.degraded_until:
+            return "healthy"
+        if now < self.degraded_until:
+            return "degraded"
+        return "probing"
+
+    def expected_ttft_ms(self) -> Optional[float]:
+        """Time-to-first-token inflated by the chance of having to retry"""
+        if self.ttft_ms is None:
+            return None
+        return self.ttft_ms / max(1.0 - self.error_rate, 0.05)
+
+
+class ModelRouter:
+    """
+    Orders the model cascade per request from live traffic.
+
+    Every attempt in a race reports its time-to-first-token and outcome;
+    the router keeps EWMA latency, TTFT and error rate per model. A model
+    whose error rate (errors and stalls that lost a hedge) passes
+    ``LLM_ROUTER_MAX_ERROR_RATE`` is degraded and gets no traffic for
+    ``LLM_ROUTER_COOLDOWN`` seconds, then one probe request decides
+    whether it recovers. The question's complexity picks the starting
+    point: simple ones go smallest model first, complex ones largest
+    first, the rest fastest first. Models much slower than the fastest
+    are moved to the back. Stats are per worker process.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, ModelStats] = {}
+        self._decisions = deque(maxlen=DECISION_LOG_SIZE)
+        self._classes = Counter()
+
+    def _model(self, name: str) -> ModelStats:
+        if name not in self._stats:
+            self._stats[name] = ModelStats()
+        return self._stats[name]
+
+    def order(self, cascade: List[Dict[str, Any]], question: str) -> List[Dict]:
+        """Cascade entries (smallest model first) in the order to try them"""
+        now = time.monotonic()
+        kind = classify_question(question)
+        self._classes[kind] += 1
+
+        preferred = list(reversed(cascade)) if kind == "complex" else list(cascade)
+        if kind == "standard":
+            # Fastest first among measured models; unmeasured keep their slot
+            slots = [
+                i
+                for i, config in enumerate(preferred)
+                if self._is_measured(config["name"])
+            ]
+            ranked = sorted(
+                (preferred[i] for i in slots),
+                key=lambda config: self._stats[config["name"]].expected_ttft_ms(),
+            )
+            for i, config in zip(slots, ranked):
+                preferred[i] = config
+
+        eligible, skipped = [], []
+        for config in preferred:
+            stats = self._model(config["name"])
+            state = stats.state(now)
+            in_probe = now - stats.probe_started < settings.LLM_ROUTER_COOLDOWN
+            if state == "degraded" or (state == "probing" and in_probe):
+                skipped.append(config["name"])
+            else:
+                eligible.append(config)
+
+        if not eligible:
+            # Everything is degraded; trying beats the template fallback
+            logger.warning("All models degraded, using the full cascade")
+            eligible, skipped = preferred, []
+
+        fastest = min(
+            (
+                self._stats[config["name"]].expected_ttft_ms()
+                for config in eligible
+                if self._is_measured(config["name"])
+            ),
+            default=None,
+        )
+        if fastest is not None:
+            # Simple questions stay on the smallest model even when it is slow
+            pinned = 1 if kind == "simple" else 0
+            eligible[pinned:] = sorted(
+                eligible[pinned:],
+                key=lambda config: self._is_slow(config["name"], fastest),
+            )
+
+        self._decisions.append(
+            {
+                "at": datetime.utcnow().isoformat(),
+                "class": kind,
+                "words": len(question.split()),
+                "order": [config["name"] for config in eligible],
+                "skipped": skipped,
+            }
+        )
+        return eligible
+
+    def _is_measured(self, name: str) -> bool:
+        stats = self._model(name)
+        return stats.sampled and stats.ttft_ms is not None
+
+    def _is_slow(self, name: str, fastest: float) -> bool:
+        return (
+            self._is_measured(name)
+            and self._stats[name].expected_ttft_ms()
+            > fastest * settings.LLM_ROUTER_SLOW_FACTOR
+        )
+
+    def started(self, name: str):
+        """An attempt on ``name`` was launched"""
+        stats = self._model(name)
+        if stats.state(time.monotonic()) == "probing":
+            stats.probe_started = time.monotonic()
+            logger.info(f"Probing degraded model {name}")
+
+    def first_token(self, name: str, ttft_ms: float):
+        stats = self._model(name)
+        stats.ttft_ms = stats._ewma(stats.ttft_ms, ttft_ms)
+        stats.ttft_samples.append(ttft_ms)
+
+    def finished(
+        self, name: str, ok: Optional[bool], latency_ms: float, error: str = None
+    ):
+        """Outcome of an attempt; ``ok=None`` when it was cancelled after
+        streaming tokens, which says nothing about the model"""
+        stats = self._model(name)
+        stats.probe_started = 0.0
+        if ok is None:
+            return
+
+        stats.requests += 1
+        stats.error_rate = stats._ewma(stats.error_rate, 0.0 if ok else 1.0)
+        if ok:
+            stats.latency_ms = stats._ewma(stats.latency_ms, latency_ms)
+            if stats.degraded_until:
+                logger.info(f"Model {name} recovered")
+            stats.degraded_until = 0.0
+            return
+
+        stats.errors += 1
+        stats.last_error = error
+        probing = stats.state(time.monotonic()) == "probing"
+        if probing or (
+            stats.sampled and stats.error_rate > settings.LLM_ROUTER_MAX_ERROR_RATE
+        ):
+            if not stats.degraded_until or probing:
+                logger.warning(
+                    f"Model {name} degraded "
+                    f"(error rate {stats.error_rate:.0%}): {error}"
+                )
+            stats.degraded_until = time.monotonic() + settings.LLM_ROUTER_COOLDOWN
+
+    def hedge_delay(self, name: str) -> float:
+        """Seconds to wait for ``name``'s first token before hedging: the
+        p95 of its recent time-to-first-token, or the initial delay until
+        enough samples exist"""
+        samples = self._model(name).ttft_samples
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            delay = settings.LLM_HEDGE_INITIAL_DELAY_MS
+        else:
+            ordered = sorted(samples)
+            delay = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return max(delay, settings.LLM_HEDGE_MIN_DELAY_MS) / 1000
+
+    def get_stats(self, cascade: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Per-model stats and recent decisions, for diagnostics"""
+        now = time.monotonic()
+
+        def rounded(value):
+            return None if value is None else round(value, 1)
+
+        models = {}
+        for config in cascade:
+            stats = self._model(config["name"])
+            models[config["name"]] = {
+                "state": stats.state(now),
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "error_rate": round(stats.error_rate, 3),
+                "latency_ms": rounded(stats.latency_ms),
+                "ttft_ms": rounded(stats.ttft_ms),
+                "hedge_delay_ms": int(self.hedge_delay(config["name"]) * 1000),
+                "ttft_samples": len(stats.ttft_samples),
+                "degraded_for_s": rounded(max(0.0, stats.degraded_until - now)),
+                "last_error": stats.last_error,
+            }
+        return {
+            "models": models,
+            "questions_by_class": dict(self._classes),
+            "recent_decisions": list(self._decisions),
+        }
+
+
+# Global instance
+model_router = ModelRouter()
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+import aiohttp
+from ..core.config import settings
+from ..core.exceptions import LLMError
+
+logger = logging.getLogger(__name__)
+
+
+def _model_key(name: str) -> str:
+    """Ollama treats ``phi`` and ``phi:latest`` as the same model"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class OllamaHost:
+    """One Ollama server: its load, the models it has, and its health"""
+
+    def __init__(self, url: str, max_concurrent: int):
+        self.url = url.rstrip("/")
+        self.max_concurrent = max_concurrent
+        self.outstanding = 0
+        self.models: Optional[Set[str]] = None  # unknown until /api/tags answers
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    @property
+    def load(self) -> float:
+        return self.outstanding / self.max_concurrent
+
+    def has_model(self, model: str) -> bool:
+        return self.models is None or _model_key(model) in self.models
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": "ejected" if self.ejected else "active",
+            "outstanding": self.outstanding,
+            "max_concurrent": self.max_concurrent,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "models": sorted(self.models) if self.models is not None else None,
+        }
+
+
+class OllamaPool:
+    """
+    Spreads generate calls over ``OLLAMA_HOSTS``.
+
+    Each request goes to a host whose ``/api/tags`` lists the model,
+    chosen by power of two choices: two random candidates with a free
+    slot, the less loaded one wins. A host runs at most
+    ``OLLAMA_HOST_MAX_CONCURRENT`` generations; when every candidate is
+    full, callers wait for a slot. ``OLLAMA_HOST_EJECT_FAILURES``
+    consecutive connection errors or 5xx responses eject a host for
+    ``OLLAMA_HOST_EJECT_SECONDS``; after that it gets traffic again and
+    one success re-admits it, one failure ejects it again.
+    """
+
+    def __init__(self, urls: List[str] = None):
+        self.configure(urls or settings.OLLAMA_HOSTS or [settings.OLLAMA_BASE_URL])
+
+    def configure(self, urls: List[str]):
+        """Replace the pool's hosts"""
+        self.hosts = [
+            OllamaHost(url, settings.OLLAMA_HOST_MAX_CONCURRENT) for url in urls
+        ]
+        self._slots: Optional[asyncio.Condition] = None
+        self._placement_task: Optional[asyncio.Task] = None
+        self._placed = False
+
+    def _condition(self) -> asyncio.Condition:
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        return self._slots
+
+    def _candidates(self, model: str, exclude=()) -> List[OllamaHost]:
+        hosts = [host for host in self.hosts if host not in exclude]
+        hosts = [host for host in hosts if not host.ejected] or hosts
+        # A model nobody lists may still be pulled or loading; let Ollama answer
+        return [host for host in hosts if host.has_model(model)] or hosts
+
+    def _pick(self, model: str, exclude=()) -> Optional[OllamaHost]:
+        free = [
+            host
+            for host in self._candidates(model, exclude)
+            if host.outstanding < host.max_concurrent
+        ]
+        if len(free) > 2:
+            free = random.sample(free, 2)
+        return min(free, key=lambda host: host.load, default=None)
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        model: str,
+        session: aiohttp.ClientSession,
+        timeout: float,
+        exclude: Set[OllamaHost] = frozenset(),
+    ) -> AsyncIterator[OllamaHost]:
+        """Hold a generation slot on the best host for ``model``, other
+        than those in ``exclude``"""
+        if not self._placed:
+            await self._first_refresh(session)
+
+        slots = self._condition()
+        async with slots:
+            try:
+                host = await asyncio.wait_for(
+                    slots.wait_for(lambda: self._pick(model, exclude)), timeout
+                )
+            except asyncio.TimeoutError:
+                raise LLMError(f"No Ollama host free for {model} after {timeout}s")
+            host.outstanding += 1
+            host.requests += 1
+
+        try:
+            yield host
+        finally:
+            async with slots:
+                host.outstanding -= 1
+                slots.notify_all()
+
+    async def _first_refresh(self, session: aiohttp.ClientSession):
+        """Learn model placement before the first request, once"""
+        if self._placement_task is None:
+            self._placement_task = asyncio.create_task(self.refresh(session))
+        await asyncio.shield(self._placement_task)
+
+    def can_retry(self, model: str, tried: Set[OllamaHost]) -> bool:
+        """Whether a host not yet ``tried`` could take ``model``"""
+        return bool(self._candidates(model, tried))
+
+    def record(self, host: OllamaHost, success: bool, error: str = None):
+        """Passive health: feed the outcome of a real call"""
+        if success:
+            if host.consecutive_failures >= settings.OLLAMA_HOST_EJECT_FAILURES:
+                logger.info(f"Ollama host {host.url} re-admitted")
+            host.consecutive_failures = 0
+            host.ejected_until = 0.0
+            return
+
+        host.failures += 1
+        host.consecutive_failures += 1
+        if host.consecutive_failures >= settings.OLLAMA_HOST_EJECT_FAILURES:
+            if not host.ejected:
+                logger.warning(f"Ollama host {host.url} ejected: {error}")
+            host.ejected_until = time.monotonic() + settings.OLLAMA_HOST_EJECT_SECONDS
+
+    def record_missing_model(self, host: OllamaHost, model: str):
+        """The host answered 404 for ``model``: stop routing it there"""
+        if host.models is not None:
+            host.models.discard(_model_key(model))
+        else:
+            host.models = set()
+
+    async def refresh(self, session: aiohttp.ClientSession):
+        """Re-read ``/api/tags`` on every host"""
+
+        async def fetch(host: OllamaHost):
+            try:
+                async with session.get(
+                    f"{host.url}/api/tags",
+                    timeout=aiohttp.ClientTimeout(total=settings.HEALTH_CHECK_TIMEOUT),
+                ) as response:
+                    if response.status != 200:
+                        raise LLMError(f"HTTP {response.status}")
+                    data = await response.json()
+                host.models = {
+                    _model_key(model.get("name", ""))
+                    for model in data.get("models", [])
+                }
+                self.record(host, True)
+            except Exception as e:
+                logger.warning(f"Ollama host {host.url} tags failed: {e}")
+                self.record(host, False, str(e))
+
+        await asyncio.gather(*(fetch(host) for host in self.hosts))
+        self._placed = True
+
+    def has_model(self, model: str) -> bool:
+        """Whether a host that is not ejected lists ``model``"""
+        return any(
+            not host.ejected and host.models and _model_key(model) in host.models
+            for host in self.hosts
+        )
+
+    def models(self) -> List[str]:
+        """Every model listed by any host"""
+        return sorted(set().union(*(host.models or () for host in self.hosts)))
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [host.to_dict() for host in self.hosts]
+
+
+# Global instance
+ollama_pool = OllamaPool()
@@ -0,0 +1,210 @@
+import base64
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _WidgetIndex:
+    """Fixed-capacity matrix of unit-length query embeddings for one widget"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.matrix: Optional[np.ndarray] = None  # float32 [capacity, dim]
+        self.keys: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.last_used: List[float] = []
+        self.loaded_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def search(self, vector: np.ndarray) -> Optional[Tuple[str, float]]:
+        if not self.rows:
+            return None
+        used = len(self.keys)
+        scores = self.matrix[:used] @ vector
+        # Freed rows hold zeros and can never win against a real match
+        row = int(np.argmax(scores))
+        key = self.keys[row]
+        if key is None:
+            return None
+        self.last_used[row] = time.monotonic()
+        return key, float(scores[row])
+
+    def upsert(self, key: str, vector: np.ndarray) -> Optional[str]:
+        """Insert or replace a vector; returns the key evicted to make room"""
+        if self.matrix is None or self.matrix.shape[1] != vector.shape[0]:
+            self.matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            self.keys, self.rows, self.last_used = [], {}, []
+
+        evicted = None
+        row = self.rows.get(key)
+        if row is None:
+            if len(self.keys) < self.capacity:
+                row = len(self.keys)
+                self.keys.append(None)
+                self.last_used.append(0.0)
+            elif None in self.keys:
+                row = self.keys.index(None)
+            else:
+                # Least recently used
+                row = int(np.argmin(self.last_used))
+                evicted = self.keys[row]
+                del self.rows[evicted]
+
+        self.matrix[row] = vector
+        self.keys[row] = key
+        self.rows[key] = row
+        self.last_used[row] = time.monotonic()
+        return evicted
+
+    def remove(self, key: str):
+        row = self.rows.pop(key, None)
+        if row is not None:
+            self.matrix[row] = 0.0
+            self.keys[row] = None
+
+
+class SemanticCache:
+    """
+    Per-widget nearest-neighbour index over cached query embeddings.
+
+    Each worker keeps a compact float32 matrix per widget and reloads it from
+    Redis (float16 vectors in a hash, recency in a sorted set) when it is
+    older than the refresh interval, so answers cached by other workers are
+    found too. Both tiers are bounded with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_widgets: int = None,
+        refresh_interval: int = None,
+    ):
+        self.max_entries = max_entries or settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.max_widgets = max_widgets or settings.SEMANTIC_CACHE_MAX_WIDGETS
+        self.refresh_interval = (
+            refresh_interval or settings.SEMANTIC_CACHE_REFRESH_INTERVAL
+        )
+        self._indexes: "OrderedDict[str, _WidgetIndex]" = OrderedDict()
+
+    def _vectors_key(self, widget_id: str) -> str:
+        return f"semantic:widget:{widget_id}:vectors"
+
+    def _lru_key(self, widget_id: str) -> str:
+        return f"semantic:widget:{widget_id}:lru"
+
+    def widget_keys(self, widget_id: str) -> List[str]:
+        """Redis keys holding a widget's semantic index"""
+        return [self._vectors_key(widget_id), self._lru_key(widget_id)]
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def _encode(vector: np.ndarray) -> str:
+        return base64.b64encode(vector.astype(np.float16).tobytes()).decode()
+
+    @staticmethod
+    def _decode(data: str) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(data), dtype=np.float16).astype(
+            np.float32
+        )
+
+    def _get_index(self, widget_id: str) -> _WidgetIndex:
+        index = self._indexes.get(widget_id)
+        if index is None:
+            index = self._indexes[widget_id] = _WidgetIndex(self.max_entries)
+            while len(self._indexes) > self.max_widgets:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(widget_id)
+        return index
+
+    async def _refresh(self, redis_client, widget_id: str, index: _WidgetIndex):
+        if time.monotonic() - index.loaded_at < self.refresh_interval:
+            return
+
+        stored = await redis_client.hgetall(self._vectors_key(widget_id))
+        index.loaded_at = time.monotonic()
+
+        for key in [key for key in index.rows if key not in stored]:
+            index.remove(key)
+        for key, data in stored.items():
+            if key not in index.rows:
+                index.upsert(key, self._decode(data))
+
+    async def lookup(
+        self, redis_client, widget_id: str, embedding, threshold: float
+    ) -> Optional[Tuple[str, float]]:
+        """Closest cached query hash for this embedding if above threshold"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+
+        index = self._get_index(widget_id)
+        await self._refresh(redis_client, widget_id, index)
+
+        match = index.search(vector)
+        if match is None or match[1] < threshold:
+            return None
+
+        await redis_client.zadd(self._lru_key(widget_id), {match[0]: time.time()})
+        return match
+
+    async def add(self, redis_client, widget_id: str, query_hash: str, embedding):
+        """Store an embedding for a cached query, trimming the LRU tail"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        self._get_index(widget_id).upsert(query_hash, vector)
+
+        vectors_key = self._vectors_key(widget_id)
+        lru_key = self._lru_key(widget_id)
+
+        pipe = redis_client.pipeline()
+        pipe.hset(vectors_key, query_hash, self._encode(vector))
+        pipe.zadd(lru_key, {query_hash: time.time()})
+        pipe.zcard(lru_key)
+        pipe.expire(vectors_key, settings.CACHE_TTL)
+        pipe.expire(lru_key, settings.CACHE_TTL)
+        size = (await pipe.execute())[2]
+
+        if size > self.max_entries:
+            evicted = await redis_client.zpopmin(lru_key, size - self.max_entries)
+            evicted_keys = [key for key, _ in evicted]
+            if evicted_keys:
+                await redis_client.hdel(vectors_key, *evicted_keys)
+
+    async def remove(self, redis_client, widget_id: str, query_hash: str):
+        """Drop an entry whose cached response has expired"""
+        index = self._indexes.get(widget_id)
+        if index:
+            index.remove(query_hash)
+
+        pipe = redis_client.pipeline()
+        pipe.hdel(self._vectors_key(widget_id), query_hash)
+        pipe.zrem(self._lru_key(widget_id), query_hash)
+        await pipe.execute()
+
+    def clear_widget(self, widget_id: str):
+        self._indexes.pop(widget_id, None)
+
+    def size(self, widget_id: str) -> int:
+        index = self._indexes.get(widget_id)
+        return len(index) if index else 0
+
+
+# Global instance
+semantic_cache = SemanticCache()
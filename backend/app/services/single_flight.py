@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Delete / extend the lease only if we still own it
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+@dataclass
+class _Flight:
+    future: asyncio.Future
+    task: Optional[asyncio.Task] = None
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work so it runs once per burst.
+
+    Inside a process, callers with the same key await one shared future.
+    Across workers, a Redis lease elects a leader; followers poll for the
+    leader's JSON result and take over if the lease disappears without one.
+    The work runs detached from any single caller, so a cancelled leader
+    doesn't fail its followers; it is cancelled once no caller is waiting.
+    """
+
+    def __init__(
+        self,
+        lease_timeout: int = None,
+        wait_timeout: int = None,
+        poll_interval: float = None,
+        result_ttl: int = None,
+    ):
+        self.lease_timeout = lease_timeout or settings.SINGLE_FLIGHT_LEASE_TIMEOUT
+        self.wait_timeout = wait_timeout or settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+        self.poll_interval = poll_interval or settings.SINGLE_FLIGHT_POLL_INTERVAL
+        self.result_ttl = result_ttl or settings.SINGLE_FLIGHT_RESULT_TTL
+        self._flights: Dict[str, _Flight] = {}
+        self._tasks: set = set()
+        self._redis_client = None
+        self.stats = {"leaders": 0, "coalesced_local": 0, "coalesced_remote": 0}
+
+    async def _get_redis_client(self):
+        if self._redis_client is None:
+            try:
+                self._redis_client = redis.from_url(
+                    settings.REDIS_URL, decode_responses=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to connect to Redis for single-flight: {e}")
+                self._redis_client = None
+        return self._redis_client
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        distributed: bool = True,
+    ) -> Tuple[Any, bool]:
+        """Run ``fn`` once per key burst.
+
+        Returns ``(result, shared)`` where ``shared`` is True when the result
+        came from another caller's execution. With ``distributed=True`` the
+        result must be JSON-serializable so other workers can read it.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.stats["coalesced_local"] += 1
+            result, _ = await self._wait(key, flight)
+            return result, True
+
+        flight = _Flight(future=asyncio.get_running_loop().create_future())
+        self._flights[key] = flight
+
+        flight.task = asyncio.create_task(self._fly(key, fn, flight, distributed))
+        self._tasks.add(flight.task)
+        flight.task.add_done_callback(self._tasks.discard)
+
+        return await self._wait(key, flight)
+
+    async def _wait(self, key: str, flight: _Flight) -> Tuple[Any, bool]:
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        except asyncio.CancelledError:
+            # Stop the work only once nobody is waiting for it any more
+            if flight.waiters == 1 and not flight.future.done():
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def _fly(self, key: str, fn, flight: _Flight, distributed: bool):
+        try:
+            redis_client = await self._get_redis_client() if distributed else None
+            if redis_client:
+                outcome = await self._run_distributed(redis_client, key, fn)
+            else:
+                self.stats["leaders"] += 1
+                outcome = (await fn(), False)
+            flight.future.set_result(outcome)
+        except asyncio.CancelledError:
+            flight.future.cancel()
+            raise
+        except Exception as e:
+            flight.future.set_exception(e)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def _run_distributed(self, redis_client, key: str, fn) -> Tuple[Any, bool]:
+        lock_key = f"singleflight:lock:{key}"
+        result_key = f"singleflight:result:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            try:
+                acquired = await redis_client.set(
+                    lock_key, token, nx=True, px=int(self.lease_timeout * 1000)
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Single-flight lease unavailable, running locally: {e}")
+                self.stats["leaders"] += 1
+                return await fn(), False
+
+            if acquired:
+                self.stats["leaders"] += 1
+                return await self._lead(redis_client, lock_key, result_key, token, fn)
+
+            # Follower: wait for the leader's result or for its lease to lapse
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                try:
+                    pipe = redis_client.pipeline()
+                    pipe.get(result_key)
+                    pipe.exists(lock_key)
+                    cached, lease_held = await pipe.execute()
+                except redis.RedisError:
+                    break
+
+                if cached is not None:
+                    self.stats["coalesced_remote"] += 1
+                    return json.loads(cached), True
+                if not lease_held:
+                    break  # Leader died without a result; contend again
+            else:
+                logger.warning(f"Single-flight wait timed out for {key}")
+                self.stats["leaders"] += 1
+                return await fn(), False
+
+    async def _lead(self, redis_client, lock_key, result_key, token, fn):
+        lease_ms = int(self.lease_timeout * 1000)
+
+        async def renew_lease():
+            while True:
+                await asyncio.sleep(self.lease_timeout / 3)
+                try:
+                    await redis_client.eval(RENEW_SCRIPT, 1, lock_key, token, lease_ms)
+                except redis.RedisError as e:
+                    logger.warning(f"Single-flight lease renewal failed: {e}")
+
+        heartbeat = asyncio.create_task(renew_lease())
+        try:
+            result = await fn()
+
+            try:
+                await redis_client.set(
+                    result_key,
+                    json.dumps(result, default=str),
+                    px=int(self.result_ttl * 1000),
+                )
+            except (TypeError, ValueError, redis.RedisError) as e:
+                logger.warning(f"Could not publish single-flight result: {e}")
+
+            return result, False
+        finally:
+            heartbeat.cancel()
+            try:
+                await redis_client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                # The lease expires on its own
+                logger.warning(f"Single-flight lease release failed: {e}")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "in_flight": len(self._flights)}
+
+    async def stop(self):
+        """Wait for detached flights and close Redis"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._redis_client:
+            await self._redis_client.close()
+            self._redis_client = None
+
+
+# Global instance
+single_flight = SingleFlight()
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+import redis.asyncio as redis
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "tenant_cache:invalidate"
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    id: str
+    subscription_plan: str
+    is_subscription_active: bool
+
+
+@dataclass(frozen=True)
+class WidgetSnapshot:
+    id: str
+    user_id: str
+    system_prompt: str
+    temperature: float
+    max_tokens: int
+    search_threshold: float
+    semantic_cache_threshold: float
+    ann_m: Optional[int]
+    ann_ef_search: Optional[int]
+    vector_quantization: Optional[str]
+    training_status: str
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    user: UserSnapshot
+    widget: WidgetSnapshot
+    plan_limits: Mapping
+
+
+class TenantCache:
+    """
+    Bounded TTL LRU mapping API key -> immutable (user, widget, plan) snapshot.
+
+    Lets the chat hot path resolve a tenant without touching the database.
+    Entries are dropped on TTL expiry, LRU eviction, or a Redis pub/sub
+    invalidation published whenever a widget or its training status changes,
+    so every worker process stays coherent.
+    """
+
+    def __init__(self, max_size: int = None, ttl: int = None):
+        self.max_size = max_size or settings.TENANT_CACHE_MAX_SIZE
+        self.ttl = ttl or settings.CACHE_USER_TTL
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_user: Dict[str, set] = {}
+        self._redis_client = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, api_key: str) -> Optional[TenantSnapshot]:
+        """Return the cached snapshot for an API key, if fresh"""
+        entry = self._entries.get(api_key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, snapshot = entry
+        if time.monotonic() >= expires_at:
+            self._remove(api_key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(api_key)
+        self.hits += 1
+        return snapshot
+
+    def put(self, api_key: str, user, widget) -> TenantSnapshot:
+        """Snapshot ORM user/widget rows and cache them under the API key"""
+        snapshot = TenantSnapshot(
+            user=UserSnapshot(
+                id=user.id,
+                subscription_plan=user.subscription_plan,
+                is_subscription_active=bool(user.is_subscription_active),
+            ),
+            widget=WidgetSnapshot(
+                id=widget.id,
+                user_id=widget.user_id,
+                system_prompt=widget.system_prompt,
+                temperature=widget.temperature,
+                max_tokens=widget.max_tokens,
+                search_threshold=widget.search_threshold,
+                semantic_cache_threshold=(
+                    settings.SEMANTIC_CACHE_THRESHOLD
+                    if widget.semantic_cache_threshold is None
+                    else widget.semantic_cache_threshold
+                ),
+                ann_m=widget.ann_m,
+                ann_ef_search=widget.ann_ef_search,
+                vector_quantization=widget.vector_quantization,
+                training_status=getattr(
+                    widget.training_status, "value", widget.training_status
+                ),
+            ),
+            plan_limits=MappingProxyType(
+                dict(settings.get_plan_limits(user.subscription_plan))
+            ),
+        )
+
+        self._remove(api_key)
+        self._entries[api_key] = (time.monotonic() + self.ttl, snapshot)
+        self._keys_by_user.setdefault(user.id, set()).add(api_key)
+
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+
+        return snapshot
+
+    def _remove(self, api_key: str):
+        entry = self._entries.pop(api_key, None)
+        if entry is None:
+            return
+        user_id = entry[1].user.id
+        keys = self._keys_by_user.get(user_id)
+        if keys:
+            keys.discard(api_key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def evict_user(self, user_id: str) -> int:
+        """Drop every cached snapshot belonging to a user (local process only)"""
+        keys = list(self._keys_by_user.get(user_id, ()))
+        for api_key in keys:
+            self._remove(api_key)
+        return len(keys)
+
+    async def _get_redis_client(self):
+        if self._redis_client is None:
+            try:
+                self._redis_client = redis.from_url(
+                    settings.REDIS_URL, decode_responses=True
+                )
+            except Exception as e:
+                logger.error(f"Failed to connect to Redis for tenant cache: {e}")
+                self._redis_client = None
+        return self._redis_client
+
+    async def invalidate_user(self, user_id: str):
+        """Evict a user's snapshots here and in every other worker"""
+        self.evict_user(user_id)
+
+        try:
+            redis_client = await self._get_redis_client()
+            if redis_client:
+                await redis_client.publish(
+                    INVALIDATION_CHANNEL, json.dumps({"user_id": user_id})
+                )
+        except Exception as e:
+            # TTL still bounds staleness if the broadcast is lost
+            logger.warning(f"Tenant cache invalidation publish failed: {e}")
+
+    async def _listen(self):
+        """Apply invalidations published by other workers"""
+        while True:
+            pubsub = None
+            try:
+                redis_client = await self._get_redis_client()
+                if not redis_client:
+                    await asyncio.sleep(5)
+                    continue
+
+                pubsub = redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        data = json.loads(message["data"])
+                        self.evict_user(data["user_id"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning(f"Ignoring malformed invalidation: {message}")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Tenant cache listener error, resubscribing: {e}")
+                # Missed messages mean stale entries, so start cold
+                self.clear()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def start(self):
+        """Start the invalidation listener on the running event loop"""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop the invalidation listener and close Redis"""
+        if self._listener_task and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        self._listener_task = None
+
+        if self._redis_client:
+            await self._redis_client.close()
+            self._redis_client = None
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def get_stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total * 100, 2) if total else 0,
+        }
+
+
+# Global instance
+tenant_cache = TenantCache()
@@ -1,18 +1,42 @@
 import asyncio
+import hashlib
 import logging
+import unicodedata
 from typing import List, Dict, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, delete, select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from ..models.widget import Widget, TrainingDocument, TrainingStatus
+from ..models.widget import (
+    Widget,
+    TrainingChunk,
+    TrainingChunkSource,
+    TrainingDocument,
+    TrainingStatus,
+)
 from ..services.vector_store import vector_store_service
+from ..services.vector_backends import IndexOptions
 from ..services.cache_service import cache_service
+from ..services.keyword_index import keyword_index_service
+from ..services.tenant_cache import tenant_cache
 from ..core.config import settings
+from ..core.database import AsyncSessionLocal
 from ..core.exceptions import TrainingError
 from ..utils.document_loaders import DocumentProcessor
 
 logger = logging.getLogger(__name__)
 
+# Bound on IN (...) lists when deleting manifest rows
+MANIFEST_DELETE_BATCH = 1000
+
+
+def chunk_vector_id(widget_id: str, text: str) -> str:
+    """Content-addressed vector ID: a widget's identical chunk text (after
+    whitespace normalization) always maps to the same vector"""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    digest = hashlib.sha256(f"{widget_id}\n{normalized}".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
 
 class TrainingService:
     def __init__(self):
@@ -22,30 +46,43 @@ class TrainingService:
             separators=["\n\n", "\n", ". ", "! ", "? ", ", ", " ", ""],
         )
         self.document_processor = DocumentProcessor()
+        # Strong references so background training tasks aren't GC'd mid-run
+        self._background_tasks = set()
 
     async def start_training(
         self,
         widget_id: str,
         training_data: List[Dict],
-        db: Session,
+        db: AsyncSession,
         background: bool = True,
+        replace: bool = False,
     ) -> Dict:
-        """Start training process"""
+        """Start training process
+
+        With ``replace`` the widget's chunks are synced to ``training_data``:
+        chunks no longer produced are deleted. Otherwise training only adds.
+        """
         try:
             # Get widget
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
+            widget = await db.get(Widget, widget_id)
             if not widget:
                 raise TrainingError("Widget not found")
 
             # Update training status
             widget.training_status = TrainingStatus.IN_PROGRESS
-            db.commit()
+            await db.commit()
+            await tenant_cache.invalidate_user(widget.user_id)
 
             if background:
-                # Start training in background using asyncio task
+                # Start training in background using asyncio task. The request
+                # session closes with the response, so the task opens its own.
                 task = asyncio.create_task(
-                    self._process_training_data_async(widget_id, training_data, db)
+                    self._process_training_data_in_session(
+                        widget_id, training_data, replace
+                    )
                 )
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
 
                 return {
                     "task_id": str(id(task)),  # Simple task ID
@@ -56,7 +93,7 @@ class TrainingService:
             else:
                 # Process synchronously for testing
                 success = await self._process_training_data_async(
-                    widget_id, training_data, db
+                    widget_id, training_data, db, replace
                 )
                 return {
                     "status": "completed" if success else "failed",
@@ -68,20 +105,40 @@ class TrainingService:
             logger.error(f"Failed to start training for widget {widget_id}: {e}")
             # Reset training status on error
             try:
-                widget = db.query(Widget).filter(Widget.id == widget_id).first()
+                widget = await db.get(Widget, widget_id)
                 if widget:
                     widget.training_status = TrainingStatus.FAILED
-                    db.commit()
+                    await db.commit()
+                    await tenant_cache.invalidate_user(widget.user_id)
             except:
                 pass
             raise TrainingError(f"Training failed to start: {e}")
 
+    async def _process_training_data_in_session(
+        self, widget_id: str, training_data: List[Dict], replace: bool = False
+    ) -> bool:
+        """Process training data with a dedicated database session"""
+        async with AsyncSessionLocal() as db:
+            return await self._process_training_data_async(
+                widget_id, training_data, db, replace
+            )
+
     async def _process_training_data_async(
-        self, widget_id: str, training_data: List[Dict], db: Session
+        self,
+        widget_id: str,
+        training_data: List[Dict],
+        db: AsyncSession,
+        replace: bool = False,
     ) -> bool:
-        """Process training data asynchronously"""
+        """Process training data asynchronously
+
+        Vector IDs are content-addressed and the widget's ``TrainingChunk``
+        rows record which are indexed, so only new chunks are embedded and
+        upserted (and, with ``replace``, only vanished ones deleted).
+        ``TrainingChunkSource`` rows record every document producing each.
+        """
         try:
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
+            widget = await db.get(Widget, widget_id)
             if not widget:
                 raise TrainingError("Widget not found")
 
@@ -120,35 +177,156 @@ class TrainingService:
             if not all_chunks:
                 raise TrainingError("No valid training data found")
 
+            # Repeated chunk text collapses to one vector (first occurrence);
+            # every document that produces it becomes one of its sources
+            chunks_by_id = {}
+            sources = {}  # (vector ID, document ID) -> chunk index
+            for chunk, metadata in zip(all_chunks, all_metadatas):
+                vector_id = chunk_vector_id(widget_id, chunk)
+                chunks_by_id.setdefault(vector_id, (chunk, metadata))
+                sources.setdefault(
+                    (vector_id, metadata["document_id"]), metadata["chunk_index"]
+                )
+
+            # Vector ID -> the document its search results are attributed to
+            owners = dict(
+                (
+                    await db.execute(
+                        select(TrainingChunk.id, TrainingChunk.document_id).where(
+                            TrainingChunk.widget_id == widget_id
+                        )
+                    )
+                ).all()
+            )
+            indexed = set(owners)
+            known_sources = {
+                (chunk_id, document_id): row_id
+                for row_id, chunk_id, document_id in await db.execute(
+                    select(
+                        TrainingChunkSource.id,
+                        TrainingChunkSource.chunk_id,
+                        TrainingChunkSource.document_id,
+                    ).where(TrainingChunkSource.widget_id == widget_id)
+                )
+            }
+            if replace and not indexed:
+                # Vectors written before the manifest existed can't be diffed
+                await vector_store_service.delete_namespace_async(namespace)
+                await keyword_index_service.delete(widget_id)
+
+            new_ids = [
+                vector_id for vector_id in chunks_by_id if vector_id not in indexed
+            ]
             logger.info(
-                f"Generated {len(all_chunks)} chunks from {processed_docs} documents"
+                f"Generated {len(all_chunks)} chunks from {processed_docs} documents: "
+                f"{len(new_ids)} new, {len(chunks_by_id) - len(new_ids)} unchanged"
             )
 
-            # Add to vector store in batches
+            # Embed and upsert only the new chunks, in batches
             batch_size = settings.EMBEDDING_BATCH_SIZE
             successful_batches = 0
+            added, removed = {}, []
 
-            for i in range(0, len(all_chunks), batch_size):
-                batch_chunks = all_chunks[i : i + batch_size]
-                batch_metadatas = all_metadatas[i : i + batch_size]
+            for i in range(0, len(new_ids), batch_size):
+                batch_ids = new_ids[i : i + batch_size]
+                batch_metadatas = [
+                    chunks_by_id[vector_id][1] for vector_id in batch_ids
+                ]
 
                 success = await vector_store_service.add_documents_async(
                     namespace=namespace,
-                    texts=batch_chunks,
+                    texts=[chunks_by_id[vector_id][0] for vector_id in batch_ids],
                     metadatas=batch_metadatas,
-                    document_id=f"batch_{i // batch_size}",
+                    ids=batch_ids,
+                    store_text=False,
+                    index_options=IndexOptions.from_widget(widget),
                 )
 
                 if success:
                     successful_batches += 1
+                    indexed.update(batch_ids)
+                    added.update(
+                        (vector_id, chunks_by_id[vector_id][0])
+                        for vector_id in batch_ids
+                    )
+                    db.add_all(
+                        TrainingChunk(
+                            id=vector_id,
+                            widget_id=widget_id,
+                            document_id=metadata["document_id"],
+                            chunk_index=metadata["chunk_index"],
+                            content=chunks_by_id[vector_id][0],
+                        )
+                        for vector_id, metadata in zip(batch_ids, batch_metadatas)
+                    )
                     logger.debug(f"Successfully added batch {i // batch_size + 1}")
                 else:
                     logger.warning(f"Failed to add batch {i // batch_size + 1}")
 
+            db.add_all(
+                TrainingChunkSource(
+                    chunk_id=vector_id,
+                    document_id=document_id,
+                    widget_id=widget_id,
+                    chunk_index=chunk_index,
+                )
+                for (vector_id, document_id), chunk_index in sources.items()
+                if vector_id in indexed
+                and (vector_id, document_id) not in known_sources
+            )
+
+            if replace:
+                stale = [
+                    vector_id for vector_id in indexed if vector_id not in chunks_by_id
+                ]
+                if stale and await vector_store_service.delete_vectors_async(
+                    namespace, stale
+                ):
+                    removed = stale
+                    for j in range(0, len(removed), MANIFEST_DELETE_BATCH):
+                        batch_ids = removed[j : j + MANIFEST_DELETE_BATCH]
+                        await db.execute(
+                            delete(TrainingChunkSource).where(
+                                TrainingChunkSource.chunk_id.in_(batch_ids)
+                            )
+                        )
+                        await db.execute(
+                            delete(TrainingChunk).where(TrainingChunk.id.in_(batch_ids))
+                        )
+                    indexed.difference_update(removed)
+
+                # Documents that no longer produce a kept chunk stop owning it
+                stale_sources = [
+                    row_id
+                    for (vector_id, document_id), row_id in known_sources.items()
+                    if vector_id in chunks_by_id
+                    and (vector_id, document_id) not in sources
+                ]
+                for j in range(0, len(stale_sources), MANIFEST_DELETE_BATCH):
+                    await db.execute(
+                        delete(TrainingChunkSource).where(
+                            TrainingChunkSource.id.in_(
+                                stale_sources[j : j + MANIFEST_DELETE_BATCH]
+                            )
+                        )
+                    )
+                await self._reassign_chunks(
+                    db,
+                    {
+                        vector_id: (
+                            chunks_by_id[vector_id][1]["document_id"],
+                            chunks_by_id[vector_id][1]["chunk_index"],
+                        )
+                        for vector_id in chunks_by_id
+                        if vector_id in owners
+                        and (vector_id, owners[vector_id]) not in sources
+                    },
+                )
+
             # Consider training successful if at least 80% of batches succeeded
-            total_batches = (len(all_chunks) + batch_size - 1) // batch_size
+            total_batches = (len(new_ids) + batch_size - 1) // batch_size
             success_rate = (
-                successful_batches / total_batches if total_batches > 0 else 0
+                successful_batches / total_batches if total_batches > 0 else 1.0
             )
 
             if success_rate < 0.8:
@@ -159,9 +337,11 @@ class TrainingService:
             # Update widget status
             widget.training_status = TrainingStatus.COMPLETED
             widget.total_documents = processed_docs
-            widget.total_chunks = len(all_chunks)
+            widget.total_chunks = len(indexed)
             widget.last_training_date = datetime.utcnow()
-            db.commit()
+            await db.commit()
+            await keyword_index_service.update(widget_id, added, removed)
+            await tenant_cache.invalidate_user(widget.user_id)
 
             logger.info(
                 f"✅ Training completed for widget {widget_id}: {processed_docs} docs, {len(all_chunks)} chunks"
@@ -173,17 +353,18 @@ class TrainingService:
 
             # Update widget status to failed
             try:
-                widget = db.query(Widget).filter(Widget.id == widget_id).first()
+                widget = await db.get(Widget, widget_id)
                 if widget:
                     widget.training_status = TrainingStatus.FAILED
-                    db.commit()
+                    await db.commit()
+                    await tenant_cache.invalidate_user(widget.user_id)
             except Exception as db_error:
                 logger.error(f"Failed to update widget status: {db_error}")
 
             return False
 
     async def _process_single_data_item(
-        self, data_item: Dict, widget_id: str, db: Session
+        self, data_item: Dict, widget_id: str, db: AsyncSession
     ) -> tuple:
         """Process a single training data item"""
         content_type = data_item.get("type")
@@ -193,17 +374,25 @@ class TrainingService:
         if not content:
             raise ValueError("No content provided")
 
-        # Save to database first
-        training_doc = TrainingDocument(
-            widget_id=widget_id,
-            title=title,
-            content=content[:10000],  # Truncate for storage
-            content_type=content_type,
-            source_url=data_item.get("source_url"),
-            document_metadata=data_item.get("metadata", {}),
-        )
-        db.add(training_doc)
-        db.flush()
+        # Retraining reprocesses the widget's documents in place
+        training_doc = None
+        if data_item.get("document_id"):
+            training_doc = await db.get(TrainingDocument, data_item["document_id"])
+            if training_doc and training_doc.widget_id != widget_id:
+                training_doc = None
+
+        if training_doc is None:
+            # Save to database first
+            training_doc = TrainingDocument(
+                widget_id=widget_id,
+                title=title,
+                content=content[:10000],  # Truncate for storage
+                content_type=content_type,
+                source_url=data_item.get("source_url"),
+                document_metadata=data_item.get("metadata", {}),
+            )
+            db.add(training_doc)
+            await db.flush()
 
         # Process content based on type
         try:
@@ -242,7 +431,7 @@ class TrainingService:
         # Update document with chunk count
         training_doc.chunk_count = len(chunks)
         training_doc.is_processed = True
-        db.commit()
+        await db.commit()
 
         return chunks, metadatas
 
@@ -335,46 +524,102 @@ class TrainingService:
         return await self._process_text_content(faq_text)
 
     async def delete_training_document(
-        self, document_id: str, widget_id: str, db: Session
+        self, document_id: str, widget_id: str, db: AsyncSession
     ) -> bool:
         """Delete a training document and its vectors"""
         try:
             # Get document
-            doc = (
-                db.query(TrainingDocument)
-                .filter(
+            doc = await db.scalar(
+                select(TrainingDocument).where(
                     TrainingDocument.id == document_id,
                     TrainingDocument.widget_id == widget_id,
                 )
-                .first()
             )
 
             if not doc:
                 return False
 
             # Get widget for namespace
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
+            widget = await db.get(Widget, widget_id)
             if not widget:
                 return False
 
-            # Delete from vector store
+            # Chunks this document produces; those no other document
+            # produces are deleted, the rest move to a remaining source
             namespace = vector_store_service.get_namespace(widget.user_id, widget_id)
-            success = await vector_store_service.delete_document_async(
-                namespace, document_id
+            chunk_ids = (
+                await db.scalars(
+                    select(TrainingChunkSource.chunk_id).where(
+                        TrainingChunkSource.widget_id == widget_id,
+                        TrainingChunkSource.document_id == document_id,
+                    )
+                )
+            ).all()
+            heirs = {}
+            for chunk_id, heir_id, chunk_index in await db.execute(
+                select(
+                    TrainingChunkSource.chunk_id,
+                    TrainingChunkSource.document_id,
+                    TrainingChunkSource.chunk_index,
+                )
+                .where(
+                    TrainingChunkSource.chunk_id.in_(chunk_ids),
+                    TrainingChunkSource.document_id != document_id,
+                )
+                .order_by(TrainingChunkSource.created_at)
+            ):
+                heirs.setdefault(chunk_id, (heir_id, chunk_index))
+            orphaned = [chunk_id for chunk_id in chunk_ids if chunk_id not in heirs]
+
+            # Vectors indexed before the manifest existed: metadata filter
+            unmanifested = not chunk_ids and not await db.scalar(
+                select(TrainingChunk.id)
+                .where(TrainingChunk.widget_id == widget_id)
+                .limit(1)
             )
+            if unmanifested:
+                success = await vector_store_service.delete_document_async(
+                    namespace, document_id
+                )
+            elif orphaned:
+                success = await vector_store_service.delete_vectors_async(
+                    namespace, orphaned
+                )
+            else:
+                success = True  # nothing only this document produces
 
             if success:
                 # Delete from database
-                db.delete(doc)
+                await db.execute(
+                    delete(TrainingChunkSource).where(
+                        TrainingChunkSource.widget_id == widget_id,
+                        TrainingChunkSource.document_id == document_id,
+                    )
+                )
+                for j in range(0, len(orphaned), MANIFEST_DELETE_BATCH):
+                    await db.execute(
+                        delete(TrainingChunk).where(
+                            TrainingChunk.id.in_(
+                                orphaned[j : j + MANIFEST_DELETE_BATCH]
+                            )
+                        )
+                    )
+                await self._reassign_chunks(db, heirs, document_id)
+                await db.delete(doc)
 
                 # Update widget counts
                 widget.total_documents = max(0, widget.total_documents - 1)
-                widget.total_chunks = max(0, widget.total_chunks - doc.chunk_count)
+                widget.total_chunks = max(
+                    0,
+                    widget.total_chunks
+                    - (doc.chunk_count if unmanifested else len(orphaned)),
+                )
 
                 # Invalidate cache
                 await cache_service.invalidate_widget_cache(widget_id)
 
-                db.commit()
+                await db.commit()
+                await keyword_index_service.update(widget_id, removed=orphaned)
                 logger.info(f"Deleted training document {document_id}")
                 return True
 
@@ -384,37 +629,55 @@ class TrainingService:
             logger.error(f"Failed to delete training document {document_id}: {e}")
             return False
 
+    async def _reassign_chunks(
+        self, db: AsyncSession, owners: Dict[str, tuple], previous: str = None
+    ):
+        """Attribute chunks to another (document ID, chunk index), only
+        where still attributed to ``previous`` if given"""
+        if not owners:
+            return
+        table = TrainingChunk.__table__
+        statement = update(table).where(table.c.id == bindparam("b_id"))
+        if previous is not None:
+            statement = statement.where(table.c.document_id == previous)
+        await db.execute(
+            statement.values(
+                document_id=bindparam("b_document_id"),
+                chunk_index=bindparam("b_chunk_index"),
+            ),
+            [
+                {"b_id": chunk_id, "b_document_id": owner, "b_chunk_index": index}
+                for chunk_id, (owner, index) in owners.items()
+            ],
+        )
+
     async def retrain_widget(
-        self, widget_id: str, db: Session, clear_existing: bool = True
+        self, widget_id: str, db: AsyncSession, clear_existing: bool = True
     ) -> Dict:
         """Retrain widget with existing documents"""
         try:
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
+            widget = await db.get(Widget, widget_id)
             if not widget:
                 raise TrainingError("Widget not found")
 
             # Get all training documents
             docs = (
-                db.query(TrainingDocument)
-                .filter(TrainingDocument.widget_id == widget_id)
-                .all()
-            )
+                await db.scalars(
+                    select(TrainingDocument).where(
+                        TrainingDocument.widget_id == widget_id
+                    )
+                )
+            ).all()
 
             if not docs:
                 raise TrainingError("No training documents found")
 
-            # Clear existing vectors if requested
-            if clear_existing:
-                namespace = vector_store_service.get_namespace(
-                    widget.user_id, widget_id
-                )
-                await vector_store_service.delete_namespace_async(namespace)
-
             # Convert documents to training data format
             training_data = []
             for doc in docs:
                 training_data.append(
                     {
+                        "document_id": doc.id,
                         "type": doc.content_type,
                         "content": doc.content,
                         "title": doc.title,
@@ -423,34 +686,35 @@ class TrainingService:
                     }
                 )
 
-            # Start retraining
-            return await self.start_training(widget_id, training_data, db)
+            # Start retraining; with clear_existing, chunks no longer produced
+            # are deleted while unchanged ones are kept without re-embedding
+            return await self.start_training(
+                widget_id, training_data, db, replace=clear_existing
+            )
 
         except Exception as e:
             logger.error(f"Failed to retrain widget {widget_id}: {e}")
             raise TrainingError(f"Retraining failed: {e}")
 
-    async def get_training_progress(self, widget_id: str, db: Session) -> Dict:
+    async def get_training_progress(self, widget_id: str, db: AsyncSession) -> Dict:
         """Get training progress for a widget"""
         try:
-            widget = db.query(Widget).filter(Widget.id == widget_id).first()
+            widget = await db.get(Widget, widget_id)
             if not widget:
                 return {"error": "Widget not found"}
 
             # Get document counts
-            total_docs = (
-                db.query(TrainingDocument)
-                .filter(TrainingDocument.widget_id == widget_id)
-                .count()
+            total_docs = await db.scalar(
+                select(func.count(TrainingDocument.id)).where(
+                    TrainingDocument.widget_id == widget_id
+                )
             )
 
-            processed_docs = (
-                db.query(TrainingDocument)
-                .filter(
+            processed_docs = await db.scalar(
+                select(func.count(TrainingDocument.id)).where(
                     TrainingDocument.widget_id == widget_id,
                     TrainingDocument.is_processed == True,
                 )
-                .count()
             )
 
             # Get vector store stats
@@ -1,17 +1,45 @@
 import redis.asyncio as redis
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import json
 import logging
 import asyncio
-from sqlalchemy.orm import Session
-from ..models.user import User, UsageLog
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.user import User
+from ..models.widget import Widget
 from ..core.config import settings, SubscriptionPlan
-from ..core.database import get_db
 from ..core.exceptions import RateLimitError, SubscriptionError
+from ..services.write_behind import (
+    write_behind_queue,
+    UsageCounterEvent,
+    UsageEvent,
+)
 
 logger = logging.getLogger(__name__)
 
+# Give back one unit of each counter, never taking it below zero (the
+# counter may have expired since the request was counted)
+REFUND_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    local current = tonumber(redis.call("GET", key) or "0")
+    if current > 0 then
+        redis.call("DECR", key)
+    end
+end
+return 1
+"""
+
+
+@dataclass(frozen=True)
+class UsageCharge:
+    """Usage counted for one request by ``charge_usage``"""
+
+    user_id: str
+    queries_used_today: int
+    keys: Tuple[str, ...] = ()  # Redis counters that were incremented
+
 
 class UsageService:
     def __init__(self):
@@ -52,12 +80,30 @@ class UsageService:
         return f"rate_limit:hourly:{user_id}:{hour}"
 
     async def check_and_increment_usage(
-        self, user_id: str, db: Session
+        self, user_id: str, db: AsyncSession, user=None
     ) -> Dict[str, any]:
-        """Check subscription limits and increment usage"""
+        """Check subscription limits and increment usage
+
+        ``user`` may be a cached tenant snapshot (see ``tenant_cache``) to
+        skip the user lookup.
+        """
+        usage_info, charge = await self.charge_usage(user_id, db, user=user)
+        await self.commit_usage(charge)
+        return usage_info
+
+    async def charge_usage(
+        self, user_id: str, db: AsyncSession, user=None
+    ) -> Tuple[Dict[str, any], UsageCharge]:
+        """Check subscription limits and count the request against them
+
+        The persisted counters are only updated by ``commit_usage``, so a
+        request shed before any work was done for it can be given back
+        with ``refund_usage`` instead.
+        """
 
         # Get user and subscription info
-        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            user = await db.scalar(select(User).where(User.id == user_id))
         if not user:
             raise SubscriptionError("User not found")
 
@@ -71,6 +117,7 @@ class UsageService:
 
         daily_limit = plan_limits["daily_queries"]
         api_rate_limit = plan_limits.get("api_rate_limit", 60)
+        keys = ()
 
         try:
             redis_client = await self._get_redis_client()
@@ -126,39 +173,65 @@ class UsageService:
                 pipe.expire(hourly_key, 3600)  # 1 hour
 
                 await pipe.execute()
+                keys = (daily_key, rate_key, hourly_key)
 
                 # Update incremented values
                 current_usage += 1
 
             else:
                 # Fallback to database-only tracking
-                current_usage = user.queries_used_today + 1
+                current_usage = await self._get_db_usage_today(user_id, db) + 1
                 if daily_limit != -1 and current_usage > daily_limit:
                     raise RateLimitError(f"Daily query limit ({daily_limit}) exceeded.")
 
         except redis.RedisError as e:
             logger.warning(f"Redis error, falling back to database: {e}")
             # Fallback to database tracking
-            current_usage = user.queries_used_today + 1
+            current_usage = await self._get_db_usage_today(user_id, db) + 1
             if daily_limit != -1 and current_usage > daily_limit:
                 raise RateLimitError(f"Daily query limit ({daily_limit}) exceeded.")
 
-        # Update database (async for performance)
-        try:
-            user.queries_used_today = current_usage
-            user.total_queries_lifetime += 1
-            db.commit()
-        except Exception as e:
-            logger.error(f"Failed to update user usage in DB: {e}")
-            db.rollback()
-
-        return {
+        usage_info = {
             "current_usage": current_usage,
             "daily_limit": daily_limit,
             "remaining": daily_limit - current_usage if daily_limit != -1 else -1,
             "plan": user.subscription_plan,
             "api_rate_limit": api_rate_limit,
         }
+        return usage_info, UsageCharge(user_id, current_usage, keys)
+
+    async def commit_usage(self, charge: UsageCharge):
+        """Persist a charged request's counters"""
+        # Off the request path (coalesced per user per flush)
+        try:
+            await write_behind_queue.enqueue(
+                UsageCounterEvent(
+                    user_id=charge.user_id,
+                    queries_used_today=charge.queries_used_today,
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to queue user usage update: {e}")
+
+    async def refund_usage(self, charge: UsageCharge):
+        """Give back a charged request that was shed before any work was
+        done for it. The exact counters it incremented are decremented, so
+        a minute or hour that has since rolled over is left alone."""
+        if not charge.keys:
+            return
+        try:
+            redis_client = await self._get_redis_client()
+            if redis_client:
+                await redis_client.eval(REFUND_SCRIPT, len(charge.keys), *charge.keys)
+        except Exception as e:
+            logger.warning(f"Failed to refund usage for user {charge.user_id}: {e}")
+
+    async def _get_db_usage_today(self, user_id: str, db: AsyncSession) -> int:
+        """Read the persisted daily counter (used when Redis is unavailable)"""
+        queries_used_today = await db.scalar(
+            select(User.queries_used_today).where(User.id == user_id)
+        )
+        return queries_used_today or 0
 
     async def log_usage(
         self,
@@ -166,43 +239,37 @@ class UsageService:
         widget_id: str,
         query_text: str,
         response_time_ms: int,
-        db: Session,
     ):
-        """Log usage for analytics"""
+        """Log usage for analytics (persisted by the write-behind queue)"""
         try:
-            usage_log = UsageLog(
-                user_id=user_id,
-                widget_id=widget_id,
-                query_text=query_text[:1000],  # Truncate for storage
-                response_time_ms=response_time_ms,
+            await write_behind_queue.enqueue(
+                UsageEvent(
+                    user_id=user_id,
+                    widget_id=widget_id,
+                    query_text=query_text,
+                    response_time_ms=response_time_ms,
+                )
             )
-            db.add(usage_log)
-            db.commit()
 
             # Also log to Redis for real-time analytics
             redis_client = await self._get_redis_client()
             if redis_client:
                 analytics_key = f"analytics:widget:{widget_id}:daily:{datetime.utcnow().strftime('%Y-%m-%d')}"
-                analytics_data = {
-                    "queries": 1,
-                    "avg_response_time": response_time_ms,
-                    "last_query": datetime.utcnow().isoformat(),
-                }
-
-                # Update analytics
-                await redis_client.hincrby(analytics_key, "queries", 1)
-                await redis_client.hset(
-                    analytics_key, "last_response_time", response_time_ms
-                )
-                await redis_client.expire(analytics_key, 86400 * 7)  # Keep for 7 days
+
+                # Update analytics in one round trip
+                pipe = redis_client.pipeline()
+                pipe.hincrby(analytics_key, "queries", 1)
+                pipe.hset(analytics_key, "last_response_time", response_time_ms)
+                pipe.expire(analytics_key, 86400 * 7)  # Keep for 7 days
+                await pipe.execute()
 
         except Exception as e:
             logger.error(f"Failed to log usage: {e}")
 
-    async def get_usage_stats(self, user_id: str, db: Session) -> Dict:
+    async def get_usage_stats(self, user_id: str, db: AsyncSession) -> Dict:
         """Get usage statistics for user"""
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.scalar(select(User).where(User.id == user_id))
             if not user:
                 return {}
 
@@ -225,7 +292,11 @@ class UsageService:
             daily_limit = plan_limits.get("daily_queries", 0)
 
             # Get widget count
-            widget_count = len([w for w in user.widgets if w.is_active])
+            widget_count = await db.scalar(
+                select(func.count(Widget.id)).where(
+                    Widget.user_id == user_id, Widget.is_active == True
+                )
+            )
 
             return {
                 "daily_usage": current_daily,
@@ -243,10 +314,10 @@ class UsageService:
             logger.error(f"Failed to get usage stats: {e}")
             return {}
 
-    async def reset_daily_usage_if_needed(self, user_id: str, db: Session):
+    async def reset_daily_usage_if_needed(self, user_id: str, db: AsyncSession):
         """Reset daily usage if it's a new day"""
         try:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = await db.scalar(select(User).where(User.id == user_id))
             if not user:
                 return
 
@@ -257,7 +328,7 @@ class UsageService:
             if last_reset != today:
                 user.queries_used_today = 0
                 user.last_query_reset = datetime.utcnow()
-                db.commit()
+                await db.commit()
 
                 # Also clear Redis key
                 redis_client = await self._get_redis_client()
@@ -315,23 +386,20 @@ class UsageService:
     async def check_subscription_limits(self, user_id: str, action: str) -> bool:
         """Check if user can perform a specific action based on subscription"""
         try:
-            from ..models.user import User
-            from ..models.widget import Widget
-            from ..core.database import SessionLocal
+            from ..core.database import AsyncSessionLocal
 
-            db = SessionLocal()
-            try:
-                user = db.query(User).filter(User.id == user_id).first()
+            async with AsyncSessionLocal() as db:
+                user = await db.scalar(select(User).where(User.id == user_id))
                 if not user:
                     return False
 
                 plan_limits = settings.get_plan_limits(user.subscription_plan)
 
                 if action == "create_widget":
-                    current_widgets = (
-                        db.query(Widget)
-                        .filter(Widget.user_id == user_id, Widget.is_active == True)
-                        .count()
+                    current_widgets = await db.scalar(
+                        select(func.count(Widget.id)).where(
+                            Widget.user_id == user_id, Widget.is_active == True
+                        )
                     )
                     return current_widgets < plan_limits.get("max_widgets", 1)
 
@@ -342,9 +410,6 @@ class UsageService:
 
                 return True
 
-            finally:
-                db.close()
-
         except Exception as e:
             logger.error(f"Failed to check subscription limits: {e}")
             return False
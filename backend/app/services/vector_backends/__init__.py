@@ -0,0 +1,22 @@
+from ...core.config import settings
+from ...core.exceptions import VectorStoreError
+from .base import IndexOptions, VectorBackend
+
+
+def create_backend(name: str = None) -> VectorBackend:
+    """Instantiate the configured vector backend (``VECTOR_BACKEND``)"""
+    name = name or settings.VECTOR_BACKEND
+
+    if name == "pinecone":
+        from .pinecone_backend import PineconeBackend
+
+        return PineconeBackend()
+    if name == "local":
+        from .local_backend import LocalVectorBackend
+
+        return LocalVectorBackend()
+
+    raise VectorStoreError(f"Unknown vector backend: {name}")
+
+
+__all__ = ["IndexOptions", "VectorBackend", "create_backend"]
@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+@dataclass(frozen=True)
+class IndexOptions:
+    """Per-widget index tuning; ``None`` falls back to the global setting"""
+
+    ann_m: Optional[int] = None
+    ann_ef_search: Optional[int] = None
+    quantization: Optional[str] = None  # "none", "int8" or "binary"
+
+    @classmethod
+    def from_widget(cls, widget) -> "IndexOptions":
+        """Build from a Widget row or WidgetSnapshot"""
+        return cls(
+            ann_m=getattr(widget, "ann_m", None),
+            ann_ef_search=getattr(widget, "ann_ef_search", None),
+            quantization=getattr(widget, "vector_quantization", None),
+        )
+
+
+class VectorBackend(ABC):
+    """
+    Storage and nearest-neighbour search for embedded chunks.
+
+    ``VectorStoreService`` owns embedding and result shaping and calls these
+    synchronous methods from its thread pools. Backends with a native
+    asyncio client set ``native_async`` and add ``<method>_async``
+    coroutines, which the service awaits on the event loop instead. Scores
+    are cosine similarity (higher is better); metadata is returned exactly
+    as it was upserted.
+    """
+
+    name = "base"
+    native_async = False
+
+    @abstractmethod
+    def is_ready(self) -> bool:
+        """Whether the backend can serve reads and writes"""
+
+    @abstractmethod
+    def upsert(
+        self,
+        namespace: str,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict],
+    ) -> bool:
+        """Insert or replace vectors (``embeddings`` is [n, dim] float32)"""
+
+    @abstractmethod
+    def query(
+        self, namespace: str, embedding: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float, Dict]]:
+        """Top-k ``(id, score, metadata)`` matches, best first"""
+
+    def fetch_vectors(self, namespace: str, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Stored embeddings by ID, unknown IDs omitted (backends that
+        can't fetch return none and callers embed the text instead)"""
+        return {}
+
+    @abstractmethod
+    def delete_document(self, namespace: str, document_id: str) -> bool:
+        """Delete every vector whose metadata ``document_id`` matches"""
+
+    @abstractmethod
+    def delete_vectors(self, namespace: str, ids: List[str]) -> bool:
+        """Delete vectors by ID (unknown IDs are ignored)"""
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str) -> bool:
+        """Delete all vectors in a namespace"""
+
+    @abstractmethod
+    def namespace_stats(self, namespace: str) -> Dict:
+        """``total_vectors`` and ``dimension`` (plus backend extras)"""
+
+    def configure_namespace(self, namespace: str, options: IndexOptions):
+        """Apply per-widget tuning (backends without tunables ignore it)"""
+
+    def health_check(self) -> bool:
+        return self.is_ready()
+
+    def close(self):
+        """Flush and release resources"""
+
+    async def close_async(self):
+        """Release connections owned by the event loop"""
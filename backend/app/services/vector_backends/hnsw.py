@@ -0,0 +1,243 @@
+import heapq
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class HNSWGraph:
+    """
+    Hierarchical navigable small world graph over the rows of an external
+    float32 matrix of unit vectors (similarity = dot product).
+
+    The graph stores only links; the owner keeps ``vectors`` pointing at its
+    (possibly reallocated) matrix and adds a node after writing its row.
+    Deleted rows stay in the graph as waypoints and are filtered out of
+    results by the ``live`` mask passed to ``search``; the owner compacts by
+    rebuilding. ``to_arrays`` flattens the links for storage and
+    ``FrozenHNSWGraph`` searches them in place.
+    """
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, seed: int = None):
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = max(ef_construction, m)
+        self.level_mult = 1 / math.log(max(m, 2))
+        self.vectors: Optional[np.ndarray] = None
+        self.levels: List[int] = []
+        self.links: List[List[List[int]]] = []  # node -> level -> neighbours
+        self.entry_point: Optional[int] = None
+        self.max_level = -1
+        self._rng = random.Random(seed)
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def add(self, node: int):
+        """Link row ``node`` (must equal len(self)) into the graph"""
+        assert node == len(self.levels)
+        query = self.vectors[node]
+        level = int(-math.log(1.0 - self._rng.random()) * self.level_mult)
+        self.levels.append(level)
+        self.links.append([[] for _ in range(level + 1)])
+
+        if self.entry_point is None:
+            self.entry_point = node
+            self.max_level = level
+            return
+
+        entry = self.entry_point
+        for layer in range(self.max_level, level, -1):
+            entry = self._greedy(query, entry, layer)
+
+        entries = [entry]
+        for layer in range(min(level, self.max_level), -1, -1):
+            candidates = self._search_layer(query, entries, self.ef_construction, layer)
+            max_links = self.m0 if layer == 0 else self.m
+            neighbours = self._select(candidates, self.m)
+            self.links[node][layer] = neighbours
+
+            for neighbour in neighbours:
+                neighbour_links = self.links[neighbour][layer]
+                neighbour_links.append(node)
+                if len(neighbour_links) > max_links:
+                    self._shrink(neighbour, layer, max_links)
+
+            entries = [candidate for _, candidate in candidates]
+
+        if level > self.max_level:
+            self.entry_point = node
+            self.max_level = level
+
+    def search(
+        self, query: np.ndarray, k: int, ef: int, live: np.ndarray = None
+    ) -> List[Tuple[float, int]]:
+        """Approximate top-k ``(score, node)``, best first, skipping dead nodes"""
+        if self.entry_point is None:
+            return []
+
+        entry = self.entry_point
+        for layer in range(self.max_level, 0, -1):
+            entry = self._greedy(query, entry, layer)
+
+        candidates = self._search_layer(query, [entry], max(ef, k), 0)
+        if live is not None:
+            candidates = [(score, node) for score, node in candidates if live[node]]
+        return candidates[:k]
+
+    def _neighbours(self, node: int, layer: int) -> np.ndarray:
+        return np.asarray(self.links[node][layer], dtype=np.int64)
+
+    def _greedy(self, query: np.ndarray, entry: int, layer: int) -> int:
+        """Hill-climb to the closest node on an upper layer"""
+        best = entry
+        best_score = float(self.vectors[entry] @ query)
+        improved = True
+        while improved:
+            improved = False
+            neighbours = self._neighbours(best, layer)
+            if not len(neighbours):
+                break
+            scores = self.vectors[neighbours] @ query
+            i = int(np.argmax(scores))
+            if scores[i] > best_score:
+                best, best_score = neighbours[i], float(scores[i])
+                improved = True
+        return best
+
+    def _search_layer(
+        self, query: np.ndarray, entries: List[int], ef: int, layer: int
+    ) -> List[Tuple[float, int]]:
+        """Beam search on one layer; returns up to ef ``(score, node)``, best first"""
+        visited = np.zeros(len(self.levels), dtype=bool)
+        visited[entries] = True
+        scores = (self.vectors[entries] @ query).tolist()
+        candidates = [(-score, node) for score, node in zip(scores, entries)]
+        results = [(score, node) for score, node in zip(scores, entries)]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            negative_score, current = heapq.heappop(candidates)
+            if len(results) >= ef and -negative_score < results[0][0]:
+                break
+
+            neighbours = self._neighbours(current, layer)
+            neighbours = neighbours[~visited[neighbours]]
+            if not len(neighbours):
+                continue
+            visited[neighbours] = True
+
+            # Score the whole neighbourhood at once and only push the
+            # neighbours that can enter the beam
+            scores = self.vectors[neighbours] @ query
+            if len(results) >= ef:
+                better = scores > results[0][0]
+                neighbours, scores = neighbours[better], scores[better]
+
+            for score, neighbour in zip(scores.tolist(), neighbours.tolist()):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbour))
+                    heapq.heappush(results, (score, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    def _select(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbour-selection heuristic: keep a candidate only if it is closer
+        to the base than to any neighbour already kept, which spreads links
+        across clusters. Pruned candidates backfill any remaining slots.
+        """
+        if len(candidates) <= 1:
+            return [candidate for _, candidate in candidates]
+
+        nodes = [candidate for _, candidate in candidates]
+        vectors = self.vectors[nodes]
+        # Pairwise candidate similarities in one product instead of per check
+        pairwise = vectors @ vectors.T
+        closest = np.full(len(nodes), -np.inf, dtype=np.float32)
+
+        selected: List[int] = []
+        pruned: List[int] = []
+        for i, (score, _) in enumerate(candidates):
+            if len(selected) >= m:
+                break
+            if closest[i] > score:
+                pruned.append(i)
+            else:
+                selected.append(i)
+                np.maximum(closest, pairwise[i], out=closest)
+
+        selected.extend(pruned[: m - len(selected)])
+        return [nodes[i] for i in selected]
+
+    def _shrink(self, node: int, layer: int, max_links: int):
+        neighbours = self.links[node][layer]
+        scores = (self.vectors[neighbours] @ self.vectors[node]).tolist()
+        candidates = sorted(zip(scores, neighbours), reverse=True)
+        self.links[node][layer] = self._select(candidates, max_links)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Flatten links into CSR arrays per layer for ``np.savez``"""
+        arrays = {
+            "levels": np.asarray(self.levels, dtype=np.int32),
+            "header": np.asarray(
+                [
+                    self.m,
+                    self.ef_construction,
+                    -1 if self.entry_point is None else self.entry_point,
+                    self.max_level,
+                ],
+                dtype=np.int64,
+            ),
+        }
+        for layer in range(self.max_level + 1):
+            nodes = [n for n, level in enumerate(self.levels) if level >= layer]
+            offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+            flat: List[int] = []
+            for i, node in enumerate(nodes):
+                flat.extend(self.links[node][layer])
+                offsets[i + 1] = len(flat)
+            arrays[f"nodes_{layer}"] = np.asarray(nodes, dtype=np.int32)
+            arrays[f"offsets_{layer}"] = offsets
+            arrays[f"links_{layer}"] = np.asarray(flat, dtype=np.int32)
+        return arrays
+
+
+class FrozenHNSWGraph(HNSWGraph):
+    """
+    Read-only graph over the CSR arrays produced by ``HNSWGraph.to_arrays``.
+
+    Links are sliced straight out of the arrays, so a graph stored in a
+    memory-mapped segment is searched without being copied or parsed.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], vectors: np.ndarray):
+        m, ef_construction, entry_point, max_level = arrays["header"].tolist()
+        super().__init__(m=int(m), ef_construction=int(ef_construction))
+        self.vectors = vectors
+        self.levels = arrays["levels"]
+        self.entry_point = None if entry_point < 0 else int(entry_point)
+        self.max_level = int(max_level)
+        self._offsets = [arrays[f"offsets_{layer}"] for layer in range(max_level + 1)]
+        self._links = [arrays[f"links_{layer}"] for layer in range(max_level + 1)]
+        # Layer 0 holds every node in order; upper layers are sparse
+        self._positions = [None] + [
+            {node: i for i, node in enumerate(arrays[f"nodes_{layer}"].tolist())}
+            for layer in range(1, max_level + 1)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def _neighbours(self, node: int, layer: int) -> np.ndarray:
+        i = node if layer == 0 else self._positions[layer][node]
+        offsets = self._offsets[layer]
+        return self._links[layer][offsets[i] : offsets[i + 1]]
+
+    def add(self, node: int):
+        raise TypeError("FrozenHNSWGraph is read-only")
@@ -0,0 +1,755 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from ...core.config import settings
+from .base import IndexOptions, VectorBackend
+from .hnsw import HNSWGraph
+from .quantization import quantize
+from .segments import Segment, normalize_rows, top_k_indices, write_segment
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, single worker only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+def _empty_manifest() -> Dict:
+    return {"segments": [], "deleted": {}, "options": {}, "obsolete": {}}
+
+
+class MemTable:
+    """Mutable in-memory segment holding writes not yet sealed to disk"""
+
+    def __init__(self):
+        self.matrix: Optional[np.ndarray] = None
+        self.size = 0
+        self.ids: List[str] = []
+        self.document_ids: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.rows: Dict[str, int] = {}
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict]):
+        dimension = embeddings.shape[1]
+        if self.matrix is None or self.matrix.shape[1] != dimension:
+            self.matrix = np.zeros((0, dimension), dtype=np.float32)
+
+        needed = self.size + len(ids)
+        if needed > self.matrix.shape[0]:
+            # Amortized growth; rows past ``size`` are unused
+            grown = np.zeros(
+                (max(needed, 2 * self.matrix.shape[0], 64), dimension),
+                dtype=np.float32,
+            )
+            grown[: self.size] = self.matrix[: self.size]
+            self.matrix = grown
+
+        for vector_id, embedding, metadata in zip(ids, embeddings, metadatas):
+            document_id = str(metadata.get("document_id", ""))
+            row = self.rows.get(vector_id)
+            if row is None:
+                row = self.size
+                self.size += 1
+                self.ids.append(vector_id)
+                self.document_ids.append(document_id)
+                self.metadatas.append(metadata)
+                self.rows[vector_id] = row
+            else:
+                self.document_ids[row] = document_id
+                self.metadatas[row] = metadata
+            self.matrix[row] = embedding
+
+    def delete_document(self, document_id: str) -> int:
+        return self._keep(
+            [row for row in range(self.size) if self.document_ids[row] != document_id]
+        )
+
+    def delete_ids(self, ids: set) -> int:
+        return self._keep([row for row in range(self.size) if self.ids[row] not in ids])
+
+    def _keep(self, keep: List[int]) -> int:
+        removed = self.size - len(keep)
+        if removed:
+            self.matrix[: len(keep)] = self.matrix[keep]
+            self.ids = [self.ids[row] for row in keep]
+            self.document_ids = [self.document_ids[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self.size = len(keep)
+            self.rows = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        return removed
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        if not self.size:
+            return []
+        scores = self.matrix[: self.size] @ query
+        return [(float(scores[row]), int(row)) for row in top_k_indices(scores, k)]
+
+
+class LocalNamespace:
+    """
+    One namespace: memory-mapped immutable segments plus a memtable.
+
+    ``manifest.json`` lists the segments in order, the deleted rows of each
+    (tombstones) and the index options. Writers change it only under an
+    exclusive file lock, re-reading it first, so commits from several
+    worker processes don't clobber each other. Readers re-read it when its
+    mtime changes and map only segments they haven't mapped yet.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.memtable = MemTable()
+        self.segments: Dict[str, Segment] = {}
+        self.live: Dict[str, np.ndarray] = {}  # only segments with tombstones
+        self.options = IndexOptions()
+        self.options_changed = False
+        self.pending_deletes: Dict[str, set] = {}
+        self.mtime_ns = 0
+        self.checked_at = time.monotonic()
+        self._locations: Optional[Dict[str, Tuple[str, int]]] = None
+        self._documents: Dict[str, np.ndarray] = {}
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.memtable.size or self.pending_deletes or self.options_changed)
+
+    @property
+    def quantization(self) -> str:
+        return self.options.quantization or settings.VECTOR_QUANTIZATION
+
+    @property
+    def dimension(self) -> int:
+        for segment in self.segments.values():
+            return segment.dim
+        return 0 if self.memtable.matrix is None else self.memtable.matrix.shape[1]
+
+    def live_count(self, name: str) -> int:
+        live = self.live.get(name)
+        return self.segments[name].count if live is None else int(live.sum())
+
+    @property
+    def total_live(self) -> int:
+        return self.memtable.size + sum(self.live_count(name) for name in self.segments)
+
+    def read_manifest(self) -> Dict:
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return _empty_manifest()
+
+    def refresh(self, manifest: Dict):
+        """Adopt a manifest, mapping new segments and reusing open ones"""
+        segments = {}
+        for name in manifest["segments"]:
+            segments[name] = self.segments.get(name) or Segment(
+                os.path.join(self.path, name)
+            )
+
+        live = {}
+        for name, rows in manifest["deleted"].items():
+            if name in segments and rows:
+                mask = np.ones(segments[name].count, dtype=bool)
+                mask[rows] = False
+                live[name] = mask
+
+        self.segments, self.live = segments, live
+        self._documents = {
+            name: docs for name, docs in self._documents.items() if name in segments
+        }
+        self._locations = None
+        if not self.options_changed:
+            self.options = IndexOptions(**manifest.get("options", {}))
+        try:
+            self.mtime_ns = os.stat(os.path.join(self.path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            self.mtime_ns = 0
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def merge_lock(self, blocking: bool = True):
+        """
+        Serialize merges across processes. Yields False instead of
+        waiting when ``blocking`` is off and another process holds it.
+        Separate from the manifest lock, which the merge commits under.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".merge.lock"), "w") as f:
+            if fcntl is not None:
+                flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                try:
+                    fcntl.flock(f, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def commit(self, mutate: Callable[[Dict], None] = None):
+        """
+        Read-modify-write the manifest under the file lock: apply pending
+        tombstones and options, then ``mutate`` (seal, merge, cleanup).
+        Call with ``self.lock`` held.
+        """
+        with self._file_lock():
+            manifest = self.read_manifest()
+            for name, rows in self.pending_deletes.items():
+                if name in manifest["segments"]:
+                    deleted = set(manifest["deleted"].get(name, []))
+                    manifest["deleted"][name] = sorted(deleted | rows)
+            manifest["options"] = asdict(self.options)
+            if mutate is not None:
+                mutate(manifest)
+
+            tmp_path = os.path.join(self.path, MANIFEST + ".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, os.path.join(self.path, MANIFEST))
+
+            self.pending_deletes = {}
+            self.options_changed = False
+            self.refresh(manifest)
+
+    def seal(self):
+        """Write the memtable out as a new immutable segment"""
+        memtable = self.memtable
+        if not memtable.size:
+            self.commit()
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        name = f"seg-{uuid.uuid4().hex[:12]}.seg"
+        matrix = memtable.matrix[: memtable.size]
+        write_segment(
+            os.path.join(self.path, name),
+            matrix,
+            memtable.ids,
+            memtable.document_ids,
+            memtable.metadatas,
+            extra_sections=quantize(matrix, self.quantization),
+        )
+        self.commit(lambda manifest: manifest["segments"].append(name))
+        self.memtable = MemTable()
+
+    def locations(self) -> Dict[str, Tuple[str, int]]:
+        """Writer-side index of live segment rows by vector id, built lazily"""
+        if self._locations is None:
+            locations = {}
+            for name, segment in self.segments.items():
+                live = self.live.get(name)
+                for row, vector_id in enumerate(segment.vector_ids()):
+                    if live is None or live[row]:
+                        locations[vector_id] = (name, row)
+            self._locations = locations
+        return self._locations
+
+    def tombstone(self, name: str, row: int):
+        live = self.live.get(name)
+        if live is None:
+            live = self.live[name] = np.ones(self.segments[name].count, dtype=bool)
+        live[row] = False
+        self.pending_deletes.setdefault(name, set()).add(row)
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, metadatas: List[Dict]):
+        if self.segments:
+            locations = self.locations()
+            for vector_id in ids:
+                location = locations.pop(vector_id, None)
+                if location is not None:
+                    self.tombstone(*location)
+        self.memtable.upsert(ids, normalize_rows(embeddings), metadatas)
+
+    def delete_document(self, document_id: str):
+        self.memtable.delete_document(document_id)
+        for name, segment in self.segments.items():
+            documents = self._documents.get(name)
+            if documents is None:
+                documents = self._documents[name] = np.array(segment.document_ids())
+            matches = documents == document_id
+            live = self.live.get(name)
+            if live is not None:
+                matches &= live
+            for row in np.flatnonzero(matches).tolist():
+                self.tombstone(name, row)
+        self._locations = None
+
+    def delete_ids(self, ids: List[str]):
+        ids = set(ids)
+        self.memtable.delete_ids(ids)
+        if self.segments:
+            locations = self.locations()
+            for vector_id in ids:
+                location = locations.pop(vector_id, None)
+                if location is not None:
+                    self.tombstone(*location)
+
+    def fetch(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Live stored (unit-length) vectors of ``ids``"""
+        vectors = {}
+        locations = self.locations() if self.segments else {}
+        for vector_id in ids:
+            row = self.memtable.rows.get(vector_id)
+            if row is not None:
+                vectors[vector_id] = self.memtable.matrix[row].copy()
+            elif vector_id in locations:
+                name, row = locations[vector_id]
+                vectors[vector_id] = np.array(self.segments[name].vectors[row])
+        return vectors
+
+    def search(
+        self, embedding: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float, Dict]]:
+        query = normalize_rows(embedding)[0]
+        ef = max(self.options.ann_ef_search or settings.ANN_EF_SEARCH, top_k)
+        rescore = top_k * settings.QUANTIZATION_RESCORE_FACTOR
+
+        candidates = [
+            (score, None, row) for score, row in self.memtable.search(query, top_k)
+        ]
+        for name, segment in self.segments.items():
+            live = self.live.get(name)
+            segment_ef = ef
+            if live is not None:
+                live_count = int(live.sum())
+                if not live_count:
+                    continue
+                # Tombstones still take beam slots; widen the beam to compensate
+                segment_ef = int(ef * segment.count / live_count)
+            candidates.extend(
+                (score, name, row)
+                for score, row in segment.search(
+                    query, top_k, segment_ef, live, rescore
+                )
+            )
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        results = []
+        for score, name, row in candidates[:top_k]:
+            if name is None:
+                memtable = self.memtable
+                results.append((memtable.ids[row], score, memtable.metadatas[row]))
+            else:
+                segment = self.segments[name]
+                results.append((segment.vector_id(row), score, segment.metadata(row)))
+        return results
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    On-box vector store built from memory-mapped immutable segments.
+
+    Writes land in a per-namespace memtable that is sealed into a segment
+    file every ``LOCAL_VECTOR_MAINTENANCE_INTERVAL`` (or once it holds
+    ``LOCAL_VECTOR_MEMTABLE_SIZE`` rows). Segments are scored in place via
+    NumPy views on the mapping, so a restart maps files instead of parsing
+    them and every worker on the host shares the page cache.
+
+    The maintenance thread also merges segments: the smallest ones once
+    there are more than ``LOCAL_VECTOR_MAX_SEGMENTS``, and any segment
+    whose tombstones exceed ``ANN_COMPACTION_RATIO``. A segment with at
+    least ``ANN_MIN_VECTORS`` live rows is rewritten with an HNSW graph and
+    searched approximately; smaller ones are scanned exactly. Namespaces
+    with int8 or binary quantization skip the graph: their segments carry
+    codes that are scanned first, and only the best candidates are
+    rescored against the float vectors, which stay on disk. Replaced
+    files are unlinked after ``LOCAL_VECTOR_OBSOLETE_GRACE`` seconds so
+    readers holding an older manifest can still open them.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str = None,
+        ann_min_vectors: int = None,
+        maintenance_interval: float = None,
+    ):
+        self.root = root or settings.LOCAL_VECTOR_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self.ann_min_vectors = (
+            settings.ANN_MIN_VECTORS if ann_min_vectors is None else ann_min_vectors
+        )
+        self.maintenance_interval = (
+            maintenance_interval or settings.LOCAL_VECTOR_MAINTENANCE_INTERVAL
+        )
+        self._namespaces: Dict[str, LocalNamespace] = {}
+        self._lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._maintenance_loop, name="local-vectors", daemon=True
+        )
+        self._thread.start()
+
+    def _path(self, namespace: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace)
+        return os.path.join(self.root, safe_name)
+
+    def _get(self, namespace: str, create: bool = False) -> Optional[LocalNamespace]:
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                path = self._path(namespace)
+                if not create and not os.path.exists(os.path.join(path, MANIFEST)):
+                    return None
+                ns = LocalNamespace(path)
+                with ns.lock:
+                    ns.refresh(ns.read_manifest())
+                self._namespaces[namespace] = ns
+                return ns
+
+        self._reload_if_changed(ns)
+        return ns
+
+    def _reload_if_changed(self, ns: LocalNamespace):
+        """Pick up segments and tombstones other processes committed"""
+        now = time.monotonic()
+        if now - ns.checked_at < settings.LOCAL_VECTOR_RELOAD_INTERVAL:
+            return
+        ns.checked_at = now
+
+        try:
+            mtime_ns = os.stat(os.path.join(ns.path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = 0
+        if mtime_ns == ns.mtime_ns:
+            return
+
+        with ns.lock:
+            if ns.dirty:
+                return  # our next commit merges their changes
+            try:
+                ns.refresh(ns.read_manifest())
+            except FileNotFoundError as e:
+                # A segment vanished between manifest read and open; retry later
+                logger.warning(f"Vector namespace reload deferred: {e}")
+
+    def _plan_merge(self, ns: LocalNamespace) -> Optional[List[str]]:
+        """Pick the segments to rewrite next, if any"""
+        names = list(ns.segments)
+        m = ns.options.ann_m or settings.ANN_M
+        quantization = ns.quantization
+
+        for name in names:
+            segment = ns.segments[name]
+            live_count = ns.live_count(name)
+            if (
+                segment.count - live_count
+                > settings.ANN_COMPACTION_RATIO * segment.count
+            ):
+                return [name]
+            if segment.quantization != quantization:
+                return [name]
+            if quantization != "none":
+                continue  # the quantized scan replaces the graph
+            if segment.graph is None:
+                if live_count >= self.ann_min_vectors:
+                    return [name]
+            elif segment.graph.m != m or live_count < self.ann_min_vectors // 2:
+                # Hysteresis so segments near the threshold don't flap
+                return [name]
+
+        if len(names) > settings.LOCAL_VECTOR_MAX_SEGMENTS:
+            by_size = sorted(names, key=ns.live_count)
+            return by_size[: len(names) - settings.LOCAL_VECTOR_MAX_SEGMENTS + 1]
+        return None
+
+    def _merge(self, ns: LocalNamespace, names: List[str]):
+        """
+        Rewrite ``names`` as one segment without their tombstones.
+
+        Rows are gathered and the graph is built without holding the
+        namespace lock; rows tombstoned meanwhile are carried over to the
+        new segment when it is swapped in.
+        """
+        with ns.lock:
+            segments = [ns.segments[name] for name in names]
+            snapshot = {}
+            for name in names:
+                live = ns.live.get(name)
+                snapshot[name] = None if live is None else live.copy()
+            m = ns.options.ann_m or settings.ANN_M
+            quantization = ns.quantization
+
+        vectors, ids, documents, metadatas = [], [], [], []
+        row_maps = {}
+        for name, segment in zip(names, segments):
+            live = snapshot[name]
+            rows = np.arange(segment.count) if live is None else np.flatnonzero(live)
+            row_map = np.full(segment.count, -1, dtype=np.int64)
+            row_map[rows] = np.arange(len(ids), len(ids) + len(rows))
+            row_maps[name] = row_map
+
+            vectors.append(segment.vectors[rows])
+            picked = rows.tolist()
+            segment_ids = segment.vector_ids()
+            segment_documents = segment.document_ids()
+            segment_metadatas = segment.raw_metadatas()
+            ids.extend(segment_ids[row] for row in picked)
+            documents.extend(segment_documents[row] for row in picked)
+            metadatas.extend(segment_metadatas[row] for row in picked)
+
+        merged_name = None
+        if ids:
+            matrix = np.concatenate(vectors)
+            graph = None
+            if quantization == "none" and len(ids) >= self.ann_min_vectors:
+                started = time.monotonic()
+                graph = HNSWGraph(m=m, ef_construction=settings.ANN_EF_CONSTRUCTION)
+                graph.vectors = matrix
+                for node in range(len(ids)):
+                    graph.add(node)
+                logger.info(
+                    f"Built HNSW graph over {len(ids)} vectors "
+                    f"in {time.monotonic() - started:.1f}s"
+                )
+            merged_name = f"seg-{uuid.uuid4().hex[:12]}.seg"
+            write_segment(
+                os.path.join(ns.path, merged_name),
+                matrix,
+                ids,
+                documents,
+                metadatas,
+                graph=graph,
+                extra_sections=quantize(matrix, quantization),
+            )
+
+        def swap(manifest: Dict):
+            if any(name not in manifest["segments"] for name in names):
+                raise RuntimeError("Segments changed during merge")
+
+            carried = []
+            for name in names:
+                before = snapshot[name]
+                for row in manifest["deleted"].pop(name, []):
+                    if before is None or before[row]:
+                        carried.append(int(row_maps[name][row]))
+
+            position = manifest["segments"].index(names[0])
+            remaining = [name for name in manifest["segments"] if name not in names]
+            if merged_name is not None:
+                remaining.insert(min(position, len(remaining)), merged_name)
+                if carried:
+                    manifest["deleted"][merged_name] = sorted(carried)
+            manifest["segments"] = remaining
+            for name in names:
+                manifest["obsolete"][name] = time.time()
+
+        with ns.lock:
+            try:
+                ns.commit(swap)
+            except RuntimeError:
+                if merged_name is not None:
+                    os.remove(os.path.join(ns.path, merged_name))
+                raise
+
+    def _remove_obsolete(self, ns: LocalNamespace):
+        cutoff = time.time() - settings.LOCAL_VECTOR_OBSOLETE_GRACE
+        expired = [
+            name
+            for name, retired in ns.read_manifest()["obsolete"].items()
+            if retired < cutoff
+        ]
+        if not expired:
+            return
+
+        def forget(manifest: Dict):
+            for name in expired:
+                manifest["obsolete"].pop(name, None)
+
+        with ns.lock:
+            ns.commit(forget)
+        for name in expired:
+            try:
+                os.remove(os.path.join(ns.path, name))
+            except FileNotFoundError:
+                pass
+
+    def _merge_next(self, ns: LocalNamespace) -> bool:
+        """Plan one merge against the current manifest and run it"""
+        with ns.lock:
+            manifest = ns.read_manifest()
+            if not ns.dirty and manifest["segments"] != list(ns.segments):
+                ns.refresh(manifest)  # another worker merged since our last reload
+            plan = self._plan_merge(ns)
+        if not plan:
+            return False
+        self._merge(ns, plan)
+        return True
+
+    def run_maintenance(self) -> bool:
+        """
+        One pass over loaded namespaces: seal memtables, run at most one
+        merge per namespace and unlink expired segment files. Returns
+        whether any merge ran, so callers can loop until things settle.
+        """
+        merged = False
+        with self._maintenance_lock:
+            with self._lock:
+                namespaces = list(self._namespaces.items())
+
+            for namespace, ns in namespaces:
+                try:
+                    with ns.lock:
+                        if self._namespaces.get(namespace) is not ns:
+                            continue
+                        if ns.dirty:
+                            ns.seal()
+                    with ns.merge_lock(blocking=False) as acquired:
+                        # Another worker is merging this namespace; leave it
+                        if acquired and self._merge_next(ns):
+                            merged = True
+                    self._remove_obsolete(ns)
+                except Exception as e:
+                    logger.error(f"Vector maintenance failed for {namespace}: {e}")
+        return merged
+
+    def compact(self, namespace: str):
+        """Seal a namespace and merge it into a single segment"""
+        ns = self._get(namespace)
+        if ns is None:
+            return
+        with self._maintenance_lock, ns.merge_lock():
+            with ns.lock:
+                ns.seal()
+                names = list(ns.segments)
+            if names:
+                self._merge(ns, names)
+
+    def _maintenance_loop(self):
+        while not self._stop.wait(self.maintenance_interval):
+            self.run_maintenance()
+
+    def is_ready(self) -> bool:
+        return os.access(self.root, os.W_OK)
+
+    def configure_namespace(self, namespace: str, options: IndexOptions):
+        ns = self._get(namespace)
+        if ns is None:
+            return
+        with ns.lock:
+            if ns.options != options:
+                ns.options = options
+                ns.options_changed = True
+
+    def upsert(
+        self,
+        namespace: str,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict],
+    ) -> bool:
+        ns = self._get(namespace, create=True)
+        with ns.lock:
+            ns.upsert(ids, embeddings, metadatas)
+            if ns.memtable.size >= settings.LOCAL_VECTOR_MEMTABLE_SIZE:
+                ns.seal()
+        return True
+
+    def query(
+        self, namespace: str, embedding: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float, Dict]]:
+        ns = self._get(namespace)
+        if ns is None:
+            return []
+        with ns.lock:
+            return ns.search(embedding, top_k)
+
+    def fetch_vectors(self, namespace: str, ids: List[str]) -> Dict[str, np.ndarray]:
+        ns = self._get(namespace)
+        if ns is None:
+            return {}
+        with ns.lock:
+            return ns.fetch(ids)
+
+    def delete_document(self, namespace: str, document_id: str) -> bool:
+        ns = self._get(namespace)
+        if ns is None:
+            return True
+        with ns.lock:
+            ns.delete_document(document_id)
+            # Deletes are rare and should reach other workers promptly
+            ns.commit()
+        return True
+
+    def delete_vectors(self, namespace: str, ids: List[str]) -> bool:
+        ns = self._get(namespace)
+        if ns is None:
+            return True
+        with ns.lock:
+            ns.delete_ids(ids)
+            ns.commit()
+        return True
+
+    def delete_namespace(self, namespace: str) -> bool:
+        with self._lock:
+            ns = self._namespaces.pop(namespace, None)
+            if ns is None:
+                shutil.rmtree(self._path(namespace), ignore_errors=True)
+                return True
+        with ns.lock:
+            shutil.rmtree(ns.path, ignore_errors=True)
+        return True
+
+    def namespace_stats(self, namespace: str) -> Dict:
+        ns = self._get(namespace)
+        if ns is None:
+            return {"total_vectors": 0, "dimension": 0, "backend": self.name}
+        with ns.lock:
+            indexed = sum(
+                ns.live_count(name)
+                for name, segment in ns.segments.items()
+                if segment.graph is not None or segment.quantized is not None
+            )
+            if ns.quantization != "none":
+                index = ns.quantization
+            else:
+                index = "hnsw" if indexed else "exact"
+            return {
+                "total_vectors": ns.total_live,
+                "dimension": ns.dimension,
+                "backend": self.name,
+                "index": index,
+                "indexed_vectors": indexed,
+                "index_bytes": sum(
+                    segment.index_bytes for segment in ns.segments.values()
+                ),
+                "segments": len(ns.segments),
+                "unsealed_vectors": ns.memtable.size,
+                "deleted_vectors": sum(
+                    segment.count - ns.live_count(name)
+                    for name, segment in ns.segments.items()
+                ),
+            }
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self.run_maintenance()
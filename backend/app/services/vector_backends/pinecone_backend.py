@@ -0,0 +1,405 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from pinecone import Pinecone, ServerlessSpec
+from ...core.config import settings
+from .base import VectorBackend
+
+logger = logging.getLogger(__name__)
+
+# Pinecone accepts at most 1000 IDs per delete request
+DELETE_BATCH_SIZE = 1000
+
+
+def _status(error: Exception) -> Optional[int]:
+    # ``status`` on older SDKs, ``status_code`` on newer ones
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After") or headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class PineconeBackend(VectorBackend):
+    """
+    Pinecone serverless index.
+
+    The connection is made lazily on first use (not at import time) and
+    retried after ``PINECONE_RETRY_INTERVAL`` if the index is missing or
+    unreachable, so a cold or flaky start doesn't disable search for the
+    life of the process.
+
+    The ``*_async`` methods use the SDK's asyncio index (``pinecone[asyncio]``)
+    on the event loop, splitting upserts into batches sent in parallel and
+    retrying 429s and 5xx responses with jittered exponential backoff.
+    """
+
+    name = "pinecone"
+    native_async = True
+
+    def __init__(self):
+        self.pc = None
+        self.index = None
+        self.host = None
+        self.async_index = None
+        self._lock = threading.Lock()
+        self._last_attempt = 0.0
+
+    def _connect(self):
+        """Connect to the index, rate-limiting reconnect attempts"""
+        if self.index is not None:
+            return self.index
+
+        with self._lock:
+            if self.index is not None:
+                return self.index
+            if time.monotonic() - self._last_attempt < settings.PINECONE_RETRY_INTERVAL:
+                return None
+            self._last_attempt = time.monotonic()
+
+            try:
+                # Initialize Pinecone with new client (v5+)
+                self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+
+                # Check if index exists
+                existing_indexes = [index.name for index in self.pc.list_indexes()]
+
+                if settings.PINECONE_INDEX_NAME not in existing_indexes:
+                    logger.warning(f"Index '{settings.PINECONE_INDEX_NAME}' not found.")
+                    logger.warning("Available indexes: %s", existing_indexes)
+                    logger.warning(
+                        "Please create the index manually in Pinecone console:"
+                    )
+                    logger.warning(f"  - Name: {settings.PINECONE_INDEX_NAME}")
+                    logger.warning(f"  - Dimensions: {settings.PINECONE_DIMENSION}")
+                    logger.warning("  - Metric: cosine")
+                    logger.warning("  - Cloud: AWS")
+                    logger.warning("  - Region: us-east-1")
+                    return None
+
+                # Get index reference
+                self.host = self.pc.describe_index(settings.PINECONE_INDEX_NAME).host
+                self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
+                logger.info(
+                    f"✅ Pinecone index '{settings.PINECONE_INDEX_NAME}' connected successfully!"
+                )
+
+            except Exception as e:
+                logger.error(f"Failed to initialize Pinecone: {e}")
+                logger.warning("Vector search is unavailable until Pinecone connects")
+
+        return self.index
+
+    def is_ready(self) -> bool:
+        return self._connect() is not None
+
+    def upsert(
+        self,
+        namespace: str,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict],
+    ) -> bool:
+        index = self._connect()
+        if index is None:
+            return False
+
+        vectors = [
+            {"id": vector_id, "values": embedding.tolist(), "metadata": metadata}
+            for vector_id, embedding, metadata in zip(ids, embeddings, metadatas)
+        ]
+
+        # Upsert vectors in batches
+        batch_size = settings.PINECONE_UPSERT_BATCH_SIZE
+        for i in range(0, len(vectors), batch_size):
+            batch = vectors[i : i + batch_size]
+            index.upsert(vectors=batch, namespace=namespace)
+            logger.debug(f"Upserted batch {i//batch_size + 1} to namespace {namespace}")
+        return True
+
+    def query(
+        self, namespace: str, embedding: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float, Dict]]:
+        index = self._connect()
+        if index is None:
+            return []
+
+        search_response = index.query(
+            vector=embedding.tolist(),
+            top_k=top_k,
+            namespace=namespace,
+            include_metadata=True,
+            include_values=False,
+        )
+        return [
+            (match.id, match.score, match.metadata or {})
+            for match in search_response.matches
+        ]
+
+    def fetch_vectors(self, namespace: str, ids: List[str]) -> Dict[str, np.ndarray]:
+        index = self._connect()
+        if index is None or not ids:
+            return {}
+        return self._format_vectors(index.fetch(ids=ids, namespace=namespace))
+
+    @staticmethod
+    def _format_vectors(response) -> Dict[str, np.ndarray]:
+        return {
+            vector_id: np.asarray(vector.values, dtype=np.float32)
+            for vector_id, vector in (response.vectors or {}).items()
+        }
+
+    def delete_document(self, namespace: str, document_id: str) -> bool:
+        index = self._connect()
+        if index is None:
+            return False
+
+        # Delete by metadata filter
+        index.delete(filter={"document_id": document_id}, namespace=namespace)
+        return True
+
+    def delete_vectors(self, namespace: str, ids: List[str]) -> bool:
+        index = self._connect()
+        if index is None:
+            return False
+
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            index.delete(ids=ids[i : i + DELETE_BATCH_SIZE], namespace=namespace)
+        return True
+
+    def delete_namespace(self, namespace: str) -> bool:
+        index = self._connect()
+        if index is None:
+            return False
+
+        # Delete all vectors in namespace
+        index.delete(delete_all=True, namespace=namespace)
+        return True
+
+    def namespace_stats(self, namespace: str) -> Dict:
+        index = self._connect()
+        if index is None:
+            return {"total_vectors": 0, "dimension": 0}
+
+        return self._format_stats(index.describe_index_stats(), namespace)
+
+    @staticmethod
+    def _format_stats(stats, namespace: str) -> Dict:
+        namespace_stats = stats.get("namespaces", {}).get(namespace, {})
+
+        return {
+            "total_vectors": namespace_stats.get("vector_count", 0),
+            "dimension": stats.get("dimension", settings.PINECONE_DIMENSION),
+            "index_fullness": stats.get("index_fullness", 0.0),
+        }
+
+    def health_check(self) -> bool:
+        index = self._connect()
+        if index is None:
+            return False
+        index.describe_index_stats()
+        return True
+
+    async def _aconnect(self):
+        """Asyncio index handle, created on the running loop once connected"""
+        if self.async_index is None:
+            if self.index is None:
+                # One-time (rate-limited) blocking setup, off the event loop
+                await asyncio.to_thread(self._connect)
+                if self.index is None:
+                    return None
+            if self.async_index is None:
+                self.async_index = self.pc.IndexAsyncio(host=self.host)
+        return self.async_index
+
+    async def _with_retries(self, call: Callable[[], Awaitable]):
+        """Await ``call()``, backing off on rate limits and server errors"""
+        for attempt in range(settings.PINECONE_MAX_RETRIES + 1):
+            try:
+                return await call()
+            except Exception as e:
+                status = _status(e)
+                retryable = status == 429 or (status is not None and status >= 500)
+                if not retryable or attempt == settings.PINECONE_MAX_RETRIES:
+                    raise
+                delay = _retry_after(e) or (
+                    settings.PINECONE_RETRY_BACKOFF
+                    * 2**attempt
+                    * random.uniform(0.5, 1.5)
+                )
+                logger.warning(
+                    f"Pinecone returned {status}, retry {attempt + 1} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def is_ready_async(self) -> bool:
+        return await self._aconnect() is not None
+
+    async def upsert_async(
+        self,
+        namespace: str,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict],
+    ) -> bool:
+        index = await self._aconnect()
+        if index is None:
+            return False
+
+        vectors = [
+            {"id": vector_id, "values": embedding.tolist(), "metadata": metadata}
+            for vector_id, embedding, metadata in zip(ids, embeddings, metadatas)
+        ]
+        batch_size = settings.PINECONE_UPSERT_BATCH_SIZE
+        semaphore = asyncio.Semaphore(settings.PINECONE_UPSERT_CONCURRENCY)
+
+        async def send(batch: List[Dict]):
+            async with semaphore:
+                await self._with_retries(
+                    lambda: index.upsert(vectors=batch, namespace=namespace)
+                )
+
+        results = await asyncio.gather(
+            *(
+                send(vectors[i : i + batch_size])
+                for i in range(0, len(vectors), batch_size)
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        logger.debug(f"Upserted {len(results)} batches to namespace {namespace}")
+        return True
+
+    async def query_async(
+        self, namespace: str, embedding: np.ndarray, top_k: int
+    ) -> List[Tuple[str, float, Dict]]:
+        index = await self._aconnect()
+        if index is None:
+            return []
+
+        search_response = await self._with_retries(
+            lambda: index.query(
+                vector=embedding.tolist(),
+                top_k=top_k,
+                namespace=namespace,
+                include_metadata=True,
+                include_values=False,
+            )
+        )
+        return [
+            (match.id, match.score, match.metadata or {})
+            for match in search_response.matches
+        ]
+
+    async def fetch_vectors_async(
+        self, namespace: str, ids: List[str]
+    ) -> Dict[str, np.ndarray]:
+        index = await self._aconnect()
+        if index is None or not ids:
+            return {}
+        return self._format_vectors(
+            await self._with_retries(lambda: index.fetch(ids=ids, namespace=namespace))
+        )
+
+    async def delete_document_async(self, namespace: str, document_id: str) -> bool:
+        index = await self._aconnect()
+        if index is None:
+            return False
+
+        await self._with_retries(
+            lambda: index.delete(
+                filter={"document_id": document_id}, namespace=namespace
+            )
+        )
+        return True
+
+    async def delete_vectors_async(self, namespace: str, ids: List[str]) -> bool:
+        index = await self._aconnect()
+        if index is None:
+            return False
+
+        for i in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[i : i + DELETE_BATCH_SIZE]
+            await self._with_retries(
+                lambda: index.delete(ids=batch, namespace=namespace)
+            )
+        return True
+
+    async def delete_namespace_async(self, namespace: str) -> bool:
+        index = await self._aconnect()
+        if index is None:
+            return False
+
+        await self._with_retries(
+            lambda: index.delete(delete_all=True, namespace=namespace)
+        )
+        return True
+
+    async def namespace_stats_async(self, namespace: str) -> Dict:
+        index = await self._aconnect()
+        if index is None:
+            return {"total_vectors": 0, "dimension": 0}
+
+        stats = await self._with_retries(index.describe_index_stats)
+        return self._format_stats(stats, namespace)
+
+    async def health_check_async(self) -> bool:
+        index = await self._aconnect()
+        if index is None:
+            return False
+        await index.describe_index_stats()
+        return True
+
+    async def close_async(self):
+        if self.async_index is not None:
+            await self.async_index.close()
+            self.async_index = None
+
+    def create_index_if_not_exists(self, dimension: int = None) -> bool:
+        """Create Pinecone index if it doesn't exist"""
+        try:
+            dimension = dimension or settings.PINECONE_DIMENSION
+            self.pc = self.pc or Pinecone(api_key=settings.PINECONE_API_KEY)
+
+            # Check if index exists
+            existing_indexes = [index.name for index in self.pc.list_indexes()]
+
+            if settings.PINECONE_INDEX_NAME in existing_indexes:
+                logger.info(f"Index {settings.PINECONE_INDEX_NAME} already exists")
+                return True
+
+            # Create new index
+            self.pc.create_index(
+                name=settings.PINECONE_INDEX_NAME,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+            )
+
+            # Wait for index to be ready
+            while not self.pc.describe_index(settings.PINECONE_INDEX_NAME).status[
+                "ready"
+            ]:
+                time.sleep(1)
+
+            # Update index reference
+            self.host = self.pc.describe_index(settings.PINECONE_INDEX_NAME).host
+            self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
+
+            logger.info(f"✅ Created index {settings.PINECONE_INDEX_NAME}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Failed to create index: {e}")
+            return False
@@ -0,0 +1,91 @@
+from typing import Dict, Optional
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# int8 codes are widened to float32 in blocks small enough to stay in cache
+INT8_BLOCK_ROWS = 256
+
+# Fallback popcount for NumPy < 2.0 (no np.bitwise_count)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pack_signs(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits of each row packed into uint64 words ([n, ceil(dim / 64)])"""
+    vectors = np.atleast_2d(vectors)
+    bits = np.packbits(vectors > 0, axis=1)
+    padding = -bits.shape[1] % 8
+    if padding:
+        bits = np.pad(bits, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def quantize(vectors: np.ndarray, mode: str) -> Dict[str, np.ndarray]:
+    """
+    Segment sections holding the ``mode`` codes of unit-length ``vectors``.
+
+    int8 uses a symmetric per-dimension scale (the dimension's max
+    magnitude maps to 127); binary keeps only the sign of each dimension.
+    """
+    if mode == "int8":
+        scale = np.abs(vectors).max(axis=0, initial=0.0) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return {"int8_codes": codes, "int8_scale": scale.astype(np.float32)}
+    if mode == "binary":
+        return {"binary_codes": pack_signs(vectors)}
+    return {}
+
+
+class QuantizedScorer:
+    """Approximate first-pass scores over the codes stored in a segment"""
+
+    def __init__(self, mode: str, sections: Dict[str, np.ndarray]):
+        self.mode = mode
+        if mode == "int8":
+            self.codes = sections["int8_codes"]
+            self.scale = sections["int8_scale"]
+        else:
+            self.codes = sections["binary_codes"]
+
+    @classmethod
+    def from_sections(
+        cls, sections: Dict[str, np.ndarray]
+    ) -> Optional["QuantizedScorer"]:
+        if "int8_codes" in sections:
+            return cls("int8", sections)
+        if "binary_codes" in sections:
+            return cls("binary", sections)
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """float32 scores, higher is better (only the ranking is meaningful)"""
+        if self.mode == "int8":
+            return self._int8_scores(query)
+        return -self._hamming(query).astype(np.float32)
+
+    def _int8_scores(self, query: np.ndarray) -> np.ndarray:
+        # codes * scale ~= vectors, so fold the scale into the query once
+        weights = (query * self.scale).astype(np.float32)
+        count = len(self.codes)
+        scores = np.empty(count, dtype=np.float32)
+        block = np.empty((min(INT8_BLOCK_ROWS, count), self.codes.shape[1]), np.float32)
+        for start in range(0, count, INT8_BLOCK_ROWS):
+            codes = self.codes[start : start + INT8_BLOCK_ROWS]
+            rows = len(codes)
+            np.copyto(block[:rows], codes, casting="unsafe")
+            np.matmul(block[:rows], weights, out=scores[start : start + rows])
+        return scores
+
+    def _hamming(self, query: np.ndarray) -> np.ndarray:
+        diff = self.codes ^ pack_signs(query)[0]
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(diff).sum(axis=1, dtype=np.int32)
+        bytes_per_row = diff.shape[1] * 8
+        return _POPCOUNT[diff.view(np.uint8).reshape(-1, bytes_per_row)].sum(
+            axis=1, dtype=np.int32
+        )
@@ -0,0 +1,239 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from .hnsw import FrozenHNSWGraph, HNSWGraph
+from .quantization import QuantizedScorer
+
+MAGIC = b"QVSEG001"
+ALIGNMENT = 64
+
+# magic, header length; the JSON header follows
+PREAMBLE = struct.Struct("<8sI")
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (O(n) selection + k log k)"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Unit-length float32 rows so dot product equals cosine similarity"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim == 1:
+        embeddings = embeddings[None, :]
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _pack_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob plus an offsets array ([n + 1] uint64) for random access"""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_segment(
+    path: str,
+    vectors: np.ndarray,
+    ids: List[str],
+    document_ids: List[str],
+    metadatas: List[Union[Dict, str]],
+    graph: Optional[HNSWGraph] = None,
+    extra_sections: Dict[str, np.ndarray] = None,
+):
+    """
+    Write an immutable segment file atomically.
+
+    Layout: ``MAGIC | u32 header length | JSON header`` followed by
+    64-byte-aligned sections. The header maps each section name to
+    ``[offset, dtype, shape]``. Sections: the contiguous ``vectors``
+    matrix, ``ids``/``documents``/``meta`` string tables (UTF-8 blobs
+    with ``*_offsets`` arrays), the optional HNSW graph (``graph_*``) and
+    any ``extra_sections`` (e.g. quantized codes). Metadata may be passed
+    pre-encoded as JSON strings (see ``Segment.raw_metadatas``).
+    """
+    ids_blob, id_offsets = _pack_strings(ids)
+    docs_blob, doc_offsets = _pack_strings(document_ids)
+    meta_blob, meta_offsets = _pack_strings(
+        [
+            metadata
+            if isinstance(metadata, str)
+            else json.dumps(metadata, separators=(",", ":"))
+            for metadata in metadatas
+        ]
+    )
+
+    sections = {
+        "vectors": np.ascontiguousarray(vectors, dtype=np.float32),
+        "ids_offsets": id_offsets,
+        "ids": ids_blob,
+        "documents_offsets": doc_offsets,
+        "documents": docs_blob,
+        "meta_offsets": meta_offsets,
+        "meta": meta_blob,
+    }
+    if graph is not None:
+        for name, array in graph.to_arrays().items():
+            sections[f"graph_{name}"] = array
+    sections.update(extra_sections or {})
+
+    # Offsets depend on the header length, so size the header first
+    layout = {
+        name: [0, array.dtype.str, list(array.shape)]
+        for name, array in sections.items()
+    }
+    header = {"count": len(ids), "dim": int(vectors.shape[1]), "sections": layout}
+    header_size = len(json.dumps(header)) + 32 * len(sections) + 64
+    offset = _align(PREAMBLE.size + header_size)
+    for name, array in sections.items():
+        layout[name][0] = offset
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    assert PREAMBLE.size + len(header_bytes) <= layout["vectors"][0]
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(layout[name][0])
+            f.write(array.tobytes())
+        f.truncate(offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Segment:
+    """
+    Immutable, memory-mapped segment.
+
+    Every section is a NumPy view straight onto the mapping: opening a
+    segment reads only the header, scoring touches the vector pages, and
+    processes that map the same file share one copy in the page cache.
+    Strings are decoded only for the rows a caller asks for.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a vector segment")
+        header = json.loads(
+            self._mmap[PREAMBLE.size : PREAMBLE.size + header_length].decode("utf-8")
+        )
+        self.count = header["count"]
+        self.dim = header["dim"]
+        self.sections: Dict[str, np.ndarray] = {
+            name: np.frombuffer(
+                self._mmap,
+                dtype=np.dtype(dtype),
+                count=int(np.prod(shape)),
+                offset=offset,
+            ).reshape(shape)
+            for name, (offset, dtype, shape) in header["sections"].items()
+        }
+        self.vectors = self.sections["vectors"]
+
+        self.graph: Optional[FrozenHNSWGraph] = None
+        graph_arrays = {
+            name[len("graph_") :]: array
+            for name, array in self.sections.items()
+            if name.startswith("graph_")
+        }
+        if graph_arrays:
+            self.graph = FrozenHNSWGraph(graph_arrays, self.vectors)
+        self.quantized = QuantizedScorer.from_sections(self.sections)
+
+    @property
+    def quantization(self) -> str:
+        return "none" if self.quantized is None else self.quantized.mode
+
+    @property
+    def index_bytes(self) -> int:
+        """Bytes the first search pass reads (codes, or vectors plus graph)"""
+        if self.quantized is not None:
+            return self.quantized.nbytes
+        return sum(
+            array.nbytes
+            for name, array in self.sections.items()
+            if name == "vectors" or name.startswith("graph_")
+        )
+
+    def _string(self, name: str, row: int) -> str:
+        offsets = self.sections[f"{name}_offsets"]
+        blob = self.sections[name][int(offsets[row]) : int(offsets[row + 1])]
+        return blob.tobytes().decode("utf-8")
+
+    def _strings(self, name: str) -> List[str]:
+        offsets = self.sections[f"{name}_offsets"].tolist()
+        data = self.sections[name].tobytes()
+        return [
+            data[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])
+        ]
+
+    def vector_id(self, row: int) -> str:
+        return self._string("ids", row)
+
+    def vector_ids(self) -> List[str]:
+        return self._strings("ids")
+
+    def document_ids(self) -> List[str]:
+        return self._strings("documents")
+
+    def metadata(self, row: int) -> Dict:
+        return json.loads(self._string("meta", row))
+
+    def raw_metadatas(self) -> List[str]:
+        return self._strings("meta")
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        ef: int,
+        live: np.ndarray = None,
+        rescore: int = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Top-k ``(score, row)``. Quantized segments scan their codes and
+        rescore the best ``rescore`` rows (default ``25 * k``) against the
+        float vectors; otherwise HNSW when there is a graph, else exact.
+        """
+        if self.graph is not None and self.quantized is None:
+            return self.graph.search(query, k, ef, live)
+
+        quantized = self.quantized is not None
+        scores = self.quantized.scores(query) if quantized else self.vectors @ query
+        if live is not None:
+            scores[~live] = -np.inf
+            k = min(k, int(live.sum()))
+        if k <= 0:
+            return []
+        if not quantized:
+            return [(float(scores[row]), int(row)) for row in top_k_indices(scores, k)]
+
+        candidates = top_k_indices(scores, max(rescore or 25 * k, k))
+        if live is not None:
+            candidates = candidates[live[candidates]]
+        # Sorted rows keep the reads of the mapped float vectors sequential
+        candidates = np.sort(candidates)
+        exact = self.vectors[candidates] @ query
+        return [(float(exact[i]), int(candidates[i])) for i in top_k_indices(exact, k)]
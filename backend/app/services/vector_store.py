@@ -1,55 +1,47 @@
-# Updated imports for the new Pinecone package
-from pinecone import Pinecone, ServerlessSpec
 from typing import List, Dict, Optional, Tuple
 import logging
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-import time
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from ..core.config import settings
 from ..core.exceptions import VectorStoreError
+from .chunk_store import chunk_store
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import embedding_cache
+from .vector_backends import IndexOptions, VectorBackend, create_backend
 
 logger = logging.getLogger(__name__)
 
 
 class VectorStoreService:
-    def __init__(self):
-        self.pc = None
-        self.index = None
-        self.embedding_model = None
-        self.executor = ThreadPoolExecutor(max_workers=5)
-        self.initialize_pinecone()
+    """
+    Embeds text and runs vector operations against the configured backend.
 
-    def initialize_pinecone(self):
-        """Initialize Pinecone connection and check if index exists"""
-        try:
-            # Initialize Pinecone with new client (v5+)
-            self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-
-            # Check if index exists
-            existing_indexes = [index.name for index in self.pc.list_indexes()]
-
-            if settings.PINECONE_INDEX_NAME not in existing_indexes:
-                logger.warning(f"Index '{settings.PINECONE_INDEX_NAME}' not found.")
-                logger.warning("Available indexes: %s", existing_indexes)
-                logger.warning("Please create the index manually in Pinecone console:")
-                logger.warning(f"  - Name: {settings.PINECONE_INDEX_NAME}")
-                logger.warning(f"  - Dimensions: {settings.PINECONE_DIMENSION}")
-                logger.warning("  - Metric: cosine")
-                logger.warning("  - Cloud: AWS")
-                logger.warning("  - Region: us-east-1")
-                return
-
-            # Get index reference
-            self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
-            logger.info(
-                f"✅ Pinecone index '{settings.PINECONE_INDEX_NAME}' connected successfully!"
-            )
+    Queries and ingestion use separate concurrency pools so a large
+    training job can't starve live chat retrieval: backends with native
+    coroutines (Pinecone) are bounded by per-pool semaphores, sync ones
+    (local) run in per-pool thread executors.
+    """
 
-        except Exception as e:
-            logger.error(f"Failed to initialize Pinecone: {e}")
-            logger.warning("Vector search will be disabled")
+    def __init__(self, backend: VectorBackend = None):
+        self.backend = backend or create_backend()
+        self.embedding_model = None
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.VECTOR_QUERY_CONCURRENCY,
+            thread_name_prefix="vector-query",
+        )
+        self.ingest_executor = ThreadPoolExecutor(
+            max_workers=settings.VECTOR_INGEST_CONCURRENCY,
+            thread_name_prefix="vector-ingest",
+        )
+        self._executors = {"query": self.executor, "ingest": self.ingest_executor}
+        self._limits = {
+            "query": asyncio.Semaphore(settings.VECTOR_QUERY_CONCURRENCY),
+            "ingest": asyncio.Semaphore(settings.VECTOR_INGEST_CONCURRENCY),
+        }
+        self.batcher = EmbeddingBatcher(self._encode_sync, self.executor)
+        logger.info(f"Vector backend: {self.backend.name}")
 
     def get_embedding_model(self) -> SentenceTransformer:
         """Get or load the embedding model"""
@@ -67,155 +59,192 @@ class VectorStoreService:
         """Generate unique namespace for user's widget"""
         return f"user_{user_id}_widget_{widget_id}"
 
-    async def add_documents_async(
-        self, namespace: str, texts: List[str], metadatas: List[Dict], document_id: str
-    ) -> bool:
-        """Add documents to vector store asynchronously"""
-        if not self.index:
-            logger.warning("Pinecone index not available, skipping vector store")
-            return False
-
-        loop = asyncio.get_event_loop()
-
-        try:
-            # Run embedding and upload in thread pool
-            result = await loop.run_in_executor(
-                self.executor,
-                self._add_documents_sync,
-                namespace,
-                texts,
-                metadatas,
-                document_id,
-            )
-            return result
+    async def _call(self, pool: str, method: str, *args):
+        """Run a backend method in the ``query`` or ``ingest`` pool"""
+        if self.backend.native_async:
+            coroutine = getattr(self.backend, f"{method}_async", None)
+            if coroutine is not None:
+                async with self._limits[pool]:
+                    return await coroutine(*args)
+            return getattr(self.backend, method)(*args)
 
-        except Exception as e:
-            logger.error(f"Failed to add documents to namespace {namespace}: {e}")
-            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executors[pool], getattr(self.backend, method), *args
+        )
 
-    def _add_documents_sync(
-        self, namespace: str, texts: List[str], metadatas: List[Dict], document_id: str
+    async def add_documents_async(
+        self,
+        namespace: str,
+        texts: List[str],
+        metadatas: List[Dict],
+        document_id: Optional[str] = None,
+        index_options: Optional[IndexOptions] = None,
+        ids: Optional[List[str]] = None,
+        store_text: bool = True,
     ) -> bool:
-        """Synchronous document addition"""
+        """Embed and add document chunks on the ingest pool
+
+        Pass ``ids`` to choose the vector IDs (``metadatas`` then keep their
+        own ``document_id``/``chunk_index``); otherwise they are derived from
+        ``document_id`` as ``{document_id}_chunk_{i}``. With ``store_text``
+        off the text stays out of the index and search fetches it from the
+        chunk store by vector ID.
+        """
         try:
-            if not self.index:
+            if not await self._call("ingest", "is_ready"):
+                logger.warning("Vector backend not available, skipping vector store")
                 return False
 
-            # Get embedding model
-            model = self.get_embedding_model()
-
-            # Generate embeddings
-            embeddings = model.encode(texts, convert_to_tensor=False)
+            if index_options is not None:
+                await self._call(
+                    "ingest", "configure_namespace", namespace, index_options
+                )
 
-            # Prepare vectors for upsert
-            vectors = []
-            for i, (text, metadata, embedding) in enumerate(
-                zip(texts, metadatas, embeddings)
+            embeddings = await self.embed_texts_async(texts, pool="ingest")
+
+            if ids is None:
+                # Create unique vector IDs
+                ids = [f"{document_id}_chunk_{i}" for i in range(len(texts))]
+
+            for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+                if store_text:
+                    metadata.update(
+                        {
+                            "namespace": namespace,
+                            "text_content": text[
+                                :1000
+                            ],  # Store first 1000 chars for reference
+                        }
+                    )
+                if document_id is not None:
+                    # Add document_id to metadata for easy deletion
+                    metadata.update({"document_id": document_id, "chunk_index": i})
+
+            if not await self._call(
+                "ingest", "upsert", namespace, ids, embeddings, metadatas
             ):
-                # Add document_id to metadata for easy deletion
-                metadata.update(
-                    {
-                        "document_id": document_id,
-                        "namespace": namespace,
-                        "text_content": text[
-                            :1000
-                        ],  # Store first 1000 chars for reference
-                        "chunk_index": i,
-                    }
-                )
+                return False
 
-                # Create unique vector ID
-                vector_id = f"{document_id}_chunk_{i}"
+            logger.info(f"✅ Added {len(texts)} chunks to namespace {namespace}")
+            return True
 
-                vectors.append(
-                    {
-                        "id": vector_id,
-                        "values": embedding.tolist(),
-                        "metadata": metadata,
-                    }
-                )
+        except Exception as e:
+            logger.error(f"Failed to add documents to namespace {namespace}: {e}")
+            return False
 
-            # Upsert vectors in batches
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i : i + batch_size]
-                self.index.upsert(vectors=batch, namespace=namespace)
-                logger.debug(
-                    f"Upserted batch {i//batch_size + 1} to namespace {namespace}"
+    def _encode_sync(self, texts: List[str]) -> np.ndarray:
+        model = self.get_embedding_model()
+        return np.asarray(
+            model.encode(texts, convert_to_tensor=False), dtype=np.float32
+        )
+
+    async def embed_texts_async(
+        self, texts: List[str], pool: str = "query"
+    ) -> np.ndarray:
+        """Embeddings for ``texts`` ([n, dim] float32), encoding only the
+        ones missing from the embedding cache"""
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            cached = [None] * len(texts)
+        else:
+            cached = await embedding_cache.get_many(texts)
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            if pool == "query" and len(missing_texts) == 1:
+                # Single queries from concurrent chats are batched together
+                encoded = [await self.batcher.encode(missing_texts[0])]
+            else:
+                loop = asyncio.get_running_loop()
+                encoded = await loop.run_in_executor(
+                    self._executors[pool], self._encode_sync, missing_texts
                 )
+            if settings.EMBEDDING_CACHE_ENABLED:
+                await embedding_cache.put_many(missing_texts, encoded)
+            for i, vector in zip(missing, encoded):
+                cached[i] = vector
 
-            logger.info(f"✅ Added {len(texts)} chunks to namespace {namespace}")
-            return True
+        return np.vstack(cached) if cached else np.zeros((0, 0), dtype=np.float32)
+
+    async def embed_query_async(self, query: str) -> Optional[List[float]]:
+        """Encode a query so it can be computed ahead of (or alongside) search"""
+        try:
+            return (await self.embed_texts_async([query]))[0].tolist()
 
         except Exception as e:
-            logger.error(f"Sync document addition failed: {e}")
-            return False
+            logger.error(f"Query embedding failed: {e}")
+            return None
 
     async def search_similar_async(
-        self, namespace: str, query: str, k: int = None, score_threshold: float = 0.7
+        self,
+        namespace: str,
+        query: str,
+        k: int = None,
+        score_threshold: float = 0.7,
+        query_embedding: Optional[List[float]] = None,
+        index_options: Optional[IndexOptions] = None,
     ) -> List[Tuple[str, float, Dict]]:
-        """Search for similar documents asynchronously"""
-        if not self.index:
-            logger.warning("Pinecone index not available, returning empty results")
-            return []
+        """Search for similar documents asynchronously
 
+        Pass ``query_embedding`` when the query was already encoded (see
+        ``embed_query_async``) to skip re-encoding, and ``index_options``
+        to apply the widget's ANN tuning.
+        """
         k = k or settings.VECTOR_SEARCH_TOP_K
-        loop = asyncio.get_event_loop()
 
         try:
-            result = await loop.run_in_executor(
-                self.executor,
-                self._search_similar_sync,
+            if not await self._call("query", "is_ready"):
+                logger.warning("Vector backend not available, returning empty results")
+                return []
+
+            if index_options is not None:
+                await self._call(
+                    "query", "configure_namespace", namespace, index_options
+                )
+
+            # Encode query unless the caller already did
+            if query_embedding is None:
+                query_embedding = await self.embed_query_async(query)
+                if query_embedding is None:
+                    return []
+
+            matches = await self._call(
+                "query",
+                "query",
                 namespace,
-                query,
+                np.asarray(query_embedding, dtype=np.float32),
                 k,
-                score_threshold,
             )
-            return result
 
-        except Exception as e:
-            logger.error(f"Search failed for namespace {namespace}: {e}")
-            return []
+            # Only include results above threshold
+            matches = [match for match in matches if match[1] >= score_threshold]
 
-    def _search_similar_sync(
-        self, namespace: str, query: str, k: int, score_threshold: float
-    ) -> List[Tuple[str, float, Dict]]:
-        """Synchronous similarity search"""
-        try:
-            if not self.index:
-                return []
-
-            # Get embedding model and encode query
-            model = self.get_embedding_model()
-            query_embedding = model.encode([query])[0]
-
-            # Search in Pinecone
-            search_response = self.index.query(
-                vector=query_embedding.tolist(),
-                top_k=k,
-                namespace=namespace,
-                include_metadata=True,
-                include_values=False,
+            # Bulk-fetch bodies of chunks whose text isn't in the index
+            texts = await chunk_store.get_many(
+                [
+                    vector_id
+                    for vector_id, _, metadata in matches
+                    if "text_content" not in metadata
+                ]
             )
 
             # Process results
             results = []
-            for match in search_response.matches:
-                score = match.score
-
-                # Only include results above threshold
-                if score >= score_threshold:
-                    metadata = match.metadata or {}
-                    text_content = metadata.get("text_content", "")
-
+            for vector_id, score, metadata in matches:
+                text_content = metadata.get("text_content") or texts.get(vector_id)
+                if text_content is not None:
                     # Remove internal metadata before returning
                     clean_metadata = {
                         k: v
                         for k, v in metadata.items()
                         if k not in ["text_content", "namespace"]
                     }
+                    clean_metadata["vector_id"] = vector_id
 
                     results.append((text_content, score, clean_metadata))
+                else:
+                    logger.debug(f"No stored text for vector {vector_id}")
 
             logger.debug(
                 f"Found {len(results)} similar documents for query in namespace {namespace}"
@@ -223,22 +252,35 @@ class VectorStoreService:
             return results
 
         except Exception as e:
-            logger.error(f"Sync search failed: {e}")
+            logger.error(f"Search failed for namespace {namespace}: {e}")
             return []
 
+    async def fetch_vectors_async(
+        self, namespace: str, ids: List[str]
+    ) -> Dict[str, np.ndarray]:
+        """Stored embeddings by vector ID (unknown IDs are omitted)"""
+        if not ids:
+            return {}
+        try:
+            return await self._call("query", "fetch_vectors", namespace, ids)
+        except Exception as e:
+            logger.warning(f"Vector fetch failed for namespace {namespace}: {e}")
+            return {}
+
     async def delete_document_async(self, namespace: str, document_id: str) -> bool:
         """Delete all vectors for a specific document"""
-        if not self.index:
-            logger.warning("Pinecone index not available, skipping deletion")
-            return False
+        try:
+            if not await self._call("ingest", "is_ready"):
+                logger.warning("Vector backend not available, skipping deletion")
+                return False
 
-        loop = asyncio.get_event_loop()
+            if not await self._call(
+                "ingest", "delete_document", namespace, document_id
+            ):
+                return False
 
-        try:
-            result = await loop.run_in_executor(
-                self.executor, self._delete_document_sync, namespace, document_id
-            )
-            return result
+            logger.info(f"✅ Deleted document {document_id} from namespace {namespace}")
+            return True
 
         except Exception as e:
             logger.error(
@@ -246,143 +288,78 @@ class VectorStoreService:
             )
             return False
 
-    def _delete_document_sync(self, namespace: str, document_id: str) -> bool:
-        """Synchronous document deletion"""
+    async def delete_vectors_async(self, namespace: str, ids: List[str]) -> bool:
+        """Delete specific vectors by ID"""
         try:
-            if not self.index:
+            if not await self._call("ingest", "is_ready"):
+                logger.warning("Vector backend not available, skipping deletion")
                 return False
 
-            # Delete by metadata filter
-            self.index.delete(filter={"document_id": document_id}, namespace=namespace)
+            if not await self._call("ingest", "delete_vectors", namespace, ids):
+                return False
 
-            logger.info(f"✅ Deleted document {document_id} from namespace {namespace}")
+            logger.info(f"✅ Deleted {len(ids)} vectors from namespace {namespace}")
             return True
 
         except Exception as e:
-            logger.error(f"Sync document deletion failed: {e}")
+            logger.error(f"Failed to delete vectors from namespace {namespace}: {e}")
             return False
 
     async def delete_namespace_async(self, namespace: str) -> bool:
         """Delete entire namespace"""
-        if not self.index:
-            return False
-
-        loop = asyncio.get_event_loop()
-
         try:
-            result = await loop.run_in_executor(
-                self.executor, self._delete_namespace_sync, namespace
-            )
-            return result
-
-        except Exception as e:
-            logger.error(f"Failed to delete namespace {namespace}: {e}")
-            return False
-
-    def _delete_namespace_sync(self, namespace: str) -> bool:
-        """Synchronous namespace deletion"""
-        try:
-            if not self.index:
+            if not await self._call("ingest", "is_ready"):
                 return False
 
-            # Delete all vectors in namespace
-            self.index.delete(delete_all=True, namespace=namespace)
+            if not await self._call("ingest", "delete_namespace", namespace):
+                return False
 
             logger.info(f"✅ Deleted namespace {namespace}")
             return True
 
         except Exception as e:
-            logger.error(f"Sync namespace deletion failed: {e}")
+            logger.error(f"Failed to delete namespace {namespace}: {e}")
             return False
 
     async def get_namespace_stats(self, namespace: str) -> Dict:
         """Get statistics for a namespace"""
-        if not self.index:
-            return {"total_vectors": 0, "dimension": 0}
-
-        loop = asyncio.get_event_loop()
-
         try:
-            result = await loop.run_in_executor(
-                self.executor, self._get_namespace_stats_sync, namespace
-            )
-            return result
-
-        except Exception as e:
-            logger.error(f"Failed to get stats for namespace {namespace}: {e}")
-            return {"total_vectors": 0, "dimension": 0}
-
-    def _get_namespace_stats_sync(self, namespace: str) -> Dict:
-        """Get namespace statistics synchronously"""
-        try:
-            if not self.index:
+            if not await self._call("query", "is_ready"):
                 return {"total_vectors": 0, "dimension": 0}
 
-            stats = self.index.describe_index_stats()
-
-            namespace_stats = stats.get("namespaces", {}).get(namespace, {})
-
-            return {
-                "total_vectors": namespace_stats.get("vector_count", 0),
-                "dimension": stats.get("dimension", settings.PINECONE_DIMENSION),
-                "index_fullness": stats.get("index_fullness", 0.0),
-            }
+            return await self._call("query", "namespace_stats", namespace)
 
         except Exception as e:
-            logger.error(f"Failed to get namespace stats: {e}")
+            logger.error(f"Failed to get stats for namespace {namespace}: {e}")
             return {"total_vectors": 0, "dimension": 0}
 
     async def health_check(self) -> bool:
         """Check if vector store is healthy"""
         try:
-            if not self.index:
-                return False
-
-            # Simple health check
-            stats = self.index.describe_index_stats()
-            return True
+            # Simple health check (off the event loop)
+            return await self._call("query", "health_check")
 
         except Exception as e:
             logger.error(f"Vector store health check failed: {e}")
             return False
 
     def create_index_if_not_exists(self, dimension: int = None) -> bool:
-        """Create Pinecone index if it doesn't exist"""
-        try:
-            dimension = dimension or settings.PINECONE_DIMENSION
-
-            # Check if index exists
-            existing_indexes = [index.name for index in self.pc.list_indexes()]
-
-            if settings.PINECONE_INDEX_NAME in existing_indexes:
-                logger.info(f"Index {settings.PINECONE_INDEX_NAME} already exists")
-                return True
-
-            # Create new index
-            self.pc.create_index(
-                name=settings.PINECONE_INDEX_NAME,
-                dimension=dimension,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-            )
-
-            # Wait for index to be ready
-            import time
-
-            while not self.pc.describe_index(settings.PINECONE_INDEX_NAME).status[
-                "ready"
-            ]:
-                time.sleep(1)
-
-            # Update index reference
-            self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
-
-            logger.info(f"✅ Created index {settings.PINECONE_INDEX_NAME}")
+        """Create Pinecone index if it doesn't exist (no-op for other backends)"""
+        create = getattr(self.backend, "create_index_if_not_exists", None)
+        if create is None:
             return True
-
-        except Exception as e:
-            logger.error(f"Failed to create index: {e}")
-            return False
+        return create(dimension)
+
+    def close(self):
+        """Release backend resources and the worker pools"""
+        self.backend.close()
+        self.executor.shutdown(wait=False)
+        self.ingest_executor.shutdown(wait=False)
+
+    async def close_async(self):
+        """``close`` plus the backend's async connections"""
+        await self.backend.close_async()
+        self.close()
 
 
 # Global instance
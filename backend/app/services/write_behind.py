@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.exc import DataError, IntegrityError
+from ..core.config import settings
+from ..core.database import AsyncSessionLocal
+from ..models.conversation import Conversation, Message, MessageRole
+from ..models.user import User, UsageLog, WriteBehindBatch
+
+logger = logging.getLogger(__name__)
+
+# Committed batch ids only need outliving a batch's retries
+BATCH_RETENTION = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class ConversationEvent:
+    user_id: str
+    widget_id: str
+    session_id: str
+    user_message: str
+    assistant_response: str
+    response_time_ms: int
+    tokens_used: int = 0
+    context_documents: int = 0
+
+
+@dataclass(frozen=True)
+class UsageEvent:
+    user_id: str
+    widget_id: str
+    query_text: str
+    response_time_ms: int
+
+
+@dataclass(frozen=True)
+class UsageCounterEvent:
+    user_id: str
+    queries_used_today: int
+
+
+class WriteBehindQueue:
+    """
+    Batches analytics writes off the request path.
+
+    Handlers enqueue conversation, usage-log and usage-counter events; a
+    background flusher writes them on a size/time trigger with multi-row
+    INSERTs, coalescing per-user counter updates into one UPDATE per flush.
+    Counters are incremented in SQL, so flushers in several workers don't
+    overwrite each other, and each batch commits its id with it, so a
+    retry never applies it twice. ``stop()`` drains the queue so no events
+    are lost on shutdown.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        flush_interval: float = None,
+        max_queue_size: int = None,
+    ):
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.WRITE_BEHIND_FLUSH_INTERVAL
+        self.max_queue_size = max_queue_size or settings.WRITE_BEHIND_MAX_QUEUE_SIZE
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._pruned_at = 0.0
+        self.stats = {"enqueued": 0, "flushed": 0, "flushes": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def enqueue(self, event):
+        """Queue an event; writes immediately if the flusher isn't running"""
+        if not self.running:
+            # Scripts, workers and tests without the app lifecycle
+            await self._flush([event])
+            return
+
+        # Blocks (backpressure) rather than dropping when the queue is full
+        await self._queue.put(event)
+        self.stats["enqueued"] += 1
+
+    def start(self):
+        """Start the background flusher on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Write-behind flusher started (batch {self.batch_size}, "
+            f"interval {self.flush_interval}s)"
+        )
+
+    async def stop(self):
+        """Drain queued events and stop the flusher"""
+        if not self.running:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        logger.info("Write-behind flusher drained and stopped")
+
+    async def _collect_batch(self) -> List:
+        """Wait for the first event, then gather more until size or time limit"""
+        batch = []
+        try:
+            first = await asyncio.wait_for(
+                self._queue.get(), timeout=self.flush_interval
+            )
+        except asyncio.TimeoutError:
+            return batch
+        batch.append(first)
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(
+                    await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                )
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            if self._stopping:
+                # Drain everything that is left
+                batch = []
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    if len(batch) >= self.batch_size:
+                        await self._flush(batch)
+                        batch = []
+                if batch:
+                    await self._flush(batch)
+                return
+
+            batch = await self._collect_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List):
+        """Write each event type in its own transaction, so a failure in
+        one (say a bad conversation row) doesn't lose the others"""
+        for kind, write in (
+            (UsageEvent, self._write_usage_logs),
+            (UsageCounterEvent, self._write_usage_counters),
+            (ConversationEvent, self._write_conversations),
+        ):
+            events = [event for event in batch if isinstance(event, kind)]
+            if events:
+                await self._write_events(write, events)
+        self.stats["flushes"] += 1
+
+        if time.monotonic() - self._pruned_at > BATCH_RETENTION.total_seconds():
+            self._pruned_at = time.monotonic()
+            await self._prune_batches()
+
+    async def _write_events(self, write, events: List, attempts: int = 3):
+        """Write events in one transaction, retrying transient failures.
+
+        Rows the database rejects (constraint or data errors) fail the
+        same way on every retry, so the batch is bisected instead until
+        only the offending events are dropped.
+        """
+        batch_id = str(uuid.uuid4())
+        for attempt in range(1, attempts + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    if attempt > 1 and await db.scalar(
+                        select(WriteBehindBatch.id).where(
+                            WriteBehindBatch.id == batch_id
+                        )
+                    ):
+                        # The failed attempt had committed after all
+                        self.stats["flushed"] += len(events)
+                        return
+                    await write(db, events)
+                    await db.execute(insert(WriteBehindBatch), [{"id": batch_id}])
+                    await db.commit()
+                self.stats["flushed"] += len(events)
+                return
+            except (IntegrityError, DataError) as e:
+                error = e
+                if len(events) > 1:
+                    middle = len(events) // 2
+                    await self._write_events(write, events[:middle], attempts)
+                    await self._write_events(write, events[middle:], attempts)
+                    return
+                break
+            except Exception as e:
+                error = e
+                logger.warning(
+                    f"Write-behind flush of {len(events)} events failed "
+                    f"(attempt {attempt}/{attempts}): {e}"
+                )
+                if attempt < attempts:
+                    await asyncio.sleep(0.5 * attempt)
+
+        self.stats["failed"] += len(events)
+        logger.error(
+            f"Dropped {len(events)} analytics events "
+            f"({type(events[0]).__name__}): {error}"
+        )
+
+    async def _prune_batches(self):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(WriteBehindBatch).where(
+                        WriteBehindBatch.created_at < func.now() - BATCH_RETENTION
+                    )
+                )
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to prune write-behind batch ids: {e}")
+
+    async def _write_usage_logs(self, db, batch: List):
+        rows = [
+            {
+                "user_id": event.user_id,
+                "widget_id": event.widget_id,
+                "query_text": event.query_text[:1000],  # Truncate for storage
+                "response_time_ms": event.response_time_ms,
+            }
+            for event in batch
+            if isinstance(event, UsageEvent)
+        ]
+        if rows:
+            # executemany -> multi-row INSERT ... VALUES (insertmanyvalues)
+            await db.execute(insert(UsageLog), rows)
+
+    async def _write_usage_counters(self, db, batch: List):
+        # Coalesce to one UPDATE per user per flush
+        counters: Dict[str, Dict] = {}
+        for event in batch:
+            if not isinstance(event, UsageCounterEvent):
+                continue
+            counter = counters.setdefault(
+                event.user_id, {"b_user_id": event.user_id, "b_increment": 0}
+            )
+            counter["b_increment"] += 1
+            counter["b_queries_today"] = max(
+                counter.get("b_queries_today", 0), event.queries_used_today
+            )
+
+        if not counters:
+            return
+
+        # Workers flush independently, so an older daily count may land last
+        users = User.__table__
+        await db.execute(
+            update(users)
+            .where(users.c.id == bindparam("b_user_id"))
+            .values(
+                queries_used_today=func.greatest(
+                    users.c.queries_used_today, bindparam("b_queries_today")
+                ),
+                total_queries_lifetime=users.c.total_queries_lifetime
+                + bindparam("b_increment"),
+            ),
+            list(counters.values()),
+        )
+
+    async def _write_conversations(self, db, batch: List):
+        events = [event for event in batch if isinstance(event, ConversationEvent)]
+        if not events:
+            return
+
+        # Look up existing conversations for every (session, widget) in one query
+        existing = await db.execute(
+            select(
+                Conversation.id,
+                Conversation.session_id,
+                Conversation.widget_id,
+            ).where(
+                Conversation.session_id.in_({e.session_id for e in events}),
+                Conversation.widget_id.in_({e.widget_id for e in events}),
+            )
+        )
+        conversations = {
+            (row.session_id, row.widget_id): {"id": row.id, "new": False}
+            for row in existing
+        }
+
+        messages = []
+        for event in events:
+            key = (event.session_id, event.widget_id)
+            conversation = conversations.get(key)
+            if conversation is None:
+                conversation = conversations[key] = {
+                    "id": str(uuid.uuid4()),
+                    "user_id": event.user_id,
+                    "widget_id": event.widget_id,
+                    "session_id": event.session_id,
+                    "new": True,
+                }
+            conversation["messages"] = conversation.get("messages", 0) + 2
+            conversation["response_time_ms"] = (
+                conversation.get("response_time_ms", 0) + event.response_time_ms
+            )
+
+            messages.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "conversation_id": conversation["id"],
+                    "role": MessageRole.USER,
+                    "content": event.user_message,
+                    "response_time_ms": None,
+                    "tokens_used": None,
+                    "context_documents": None,
+                }
+            )
+            messages.append(
+                {
+                    "id": str(uuid.uuid4()),
+                    "conversation_id": conversation["id"],
+                    "role": MessageRole.ASSISTANT,
+                    "content": event.assistant_response,
+                    "response_time_ms": event.response_time_ms,
+                    "tokens_used": event.tokens_used,
+                    "context_documents": event.context_documents,
+                }
+            )
+
+        # avg_response_time is the mean over exchanges (User + Assistant)
+        new_conversations = [
+            {
+                "id": c["id"],
+                "user_id": c["user_id"],
+                "widget_id": c["widget_id"],
+                "session_id": c["session_id"],
+                "message_count": c["messages"],
+                "avg_response_time": 2 * c["response_time_ms"] / c["messages"],
+            }
+            for c in conversations.values()
+            if c["new"]
+        ]
+        if new_conversations:
+            await db.execute(insert(Conversation), new_conversations)
+
+        await db.execute(insert(Message), messages)
+
+        updated_conversations = [
+            {
+                "b_id": c["id"],
+                "b_messages": c["messages"],
+                "b_response_time_ms": c["response_time_ms"],
+            }
+            for c in conversations.values()
+            if not c["new"] and "messages" in c
+        ]
+        if updated_conversations:
+            # Incremented in SQL from the row's current values, so flushes
+            # from other workers aren't overwritten
+            table = Conversation.__table__
+            message_count = func.coalesce(table.c.message_count, 0)
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    message_count=message_count + bindparam("b_messages"),
+                    avg_response_time=(
+                        func.coalesce(table.c.avg_response_time, 0.0) * message_count
+                        + 2 * bindparam("b_response_time_ms")
+                    )
+                    / (message_count + bindparam("b_messages")),
+                ),
+                updated_conversations,
+            )
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "running": self.running,
+        }
+
+
+# Global instance
+write_behind_queue = WriteBehindQueue()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Chat endpoint latency benchmark - reports p50/p95/p99 against a running server
+
+Run it against two builds (e.g. before/after a pipeline change) with the same
+arguments to compare. Uncached latency needs unique messages, so use
+--unique to append a random suffix to every question.
+
+    python benchmarks/chat_latency.py --requests 200 --concurrency 16 --unique
+
+--probe-health polls /health (served from an in-memory snapshot) while the
+load runs. Its latency approximates event-loop stall time on the server, so
+blocking I/O on the loop shows up as a high probe p99.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import aiohttp
+
+DEFAULT_MESSAGES = [
+    "What is your product?",
+    "What features do you offer?",
+    "How much does it cost?",
+    "Do you offer a free trial?",
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_benchmark(args) -> dict:
+    latencies = []
+    cached = 0
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+    url = f"{args.base_url}/api/v1/chat/chat"
+
+    async with aiohttp.ClientSession() as session:
+
+        async def one_request(i: int):
+            nonlocal cached, errors
+            message = DEFAULT_MESSAGES[i % len(DEFAULT_MESSAGES)]
+            if args.unique:
+                message = f"{message} ({uuid.uuid4().hex[:8]})"
+
+            payload = {
+                "api_key": args.api_key,
+                "message": message,
+                "session_id": f"bench_{i}",
+            }
+
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=payload) as response:
+                        body = await response.json()
+                        if response.status != 200 or body.get("error"):
+                            errors += 1
+                        elif body.get("cached"):
+                            cached += 1
+                except Exception:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe_health():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    async with session.get(f"{args.base_url}/health") as response:
+                        await response.read()
+                except Exception:
+                    pass
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(args.probe_interval)
+
+        probe_task = asyncio.create_task(probe_health()) if args.probe_health else None
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one_request(i) for i in range(args.requests)))
+        wall_time = time.perf_counter() - wall_start
+
+        done.set()
+        if probe_task:
+            await probe_task
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "cached": cached,
+        "throughput_rps": args.requests / wall_time if wall_time else 0.0,
+        "mean_ms": statistics.mean(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "probe_p50_ms": percentile(probe_latencies, 50),
+        "probe_p99_ms": percentile(probe_latencies, 99),
+        "probe_max_ms": max(probe_latencies) if probe_latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--api-key", default="test_key_123")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--unique", action="store_true", help="Defeat the response cache"
+    )
+    parser.add_argument(
+        "--probe-health",
+        action="store_true",
+        help="Measure /health latency under load (event-loop stall proxy)",
+    )
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+
+    print(f"\n📊 {result['requests']} requests @ concurrency {result['concurrency']}")
+    print(f"  throughput: {result['throughput_rps']:.1f} req/s")
+    print(f"  mean: {result['mean_ms']:.1f} ms")
+    print(f"  p50:  {result['p50_ms']:.1f} ms")
+    print(f"  p95:  {result['p95_ms']:.1f} ms")
+    print(f"  p99:  {result['p99_ms']:.1f} ms")
+    print(f"  cached: {result['cached']}  errors: {result['errors']}")
+
+    if args.probe_health:
+        print("\n⏱️  /health probe under load (event-loop stall proxy)")
+        print(f"  p50: {result['probe_p50_ms']:.1f} ms")
+        print(f"  p99: {result['probe_p99_ms']:.1f} ms")
+        print(f"  max: {result['probe_max_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
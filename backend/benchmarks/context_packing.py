@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Context packing benchmark - prompt tokens and LLM latency, before vs after
+
+Simulates retrieval over a help-center corpus: overlapping chunks
+(EMBEDDING_CHUNK_SIZE / EMBEDDING_CHUNK_OVERLAP) where the same passage
+also appears, lightly edited, on other pages. For each question it builds
+the prompt two ways:
+
+  before  top VECTOR_SEARCH_TOP_K chunks packed by characters into 4000
+          (the old MAX_CONTEXT_LENGTH)
+  after   MMR over CONTEXT_CANDIDATES chunks, packed into the model's
+          context_tokens budget by its tokenizer
+
+and reports prompt tokens, duplicated text in the context, and - with
+--ollama - end-to-end generate latency and Ollama's prompt_eval_count.
+
+    python benchmarks/context_packing.py
+    python benchmarks/context_packing.py --ollama http://localhost:11434 --runs 20
+
+Embeddings use EMBEDDING_MODEL when sentence-transformers is installed,
+otherwise a hashed bag-of-words stand-in (--synthetic forces it).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.context_builder import context_builder, mmr_select  # noqa: E402
+from app.services.llm_service import llm_service  # noqa: E402
+from app.services.ollama_pool import ollama_pool  # noqa: E402
+
+OLD_MAX_CONTEXT_CHARS = 4000
+
+WORDS = (
+    "account billing invoice plan upgrade downgrade password reset login "
+    "email verify widget embed script domain api key token limit quota "
+    "message conversation history export download team member invite role "
+    "admin owner permission refund trial cancel renew card payment tax "
+    "region language theme color position mobile desktop notification"
+).split()
+
+
+def make_corpus(seed: int = 0) -> list:
+    """Pages of sentences; a few passages (FAQ answers, policy blurbs) are
+    repeated, lightly edited, across several pages"""
+    rng = np.random.default_rng(seed)
+
+    def sentence():
+        words = rng.choice(WORDS, size=rng.integers(8, 16))
+        return " ".join(words).capitalize() + "."
+
+    pages = [" ".join(sentence() for _ in range(30)) for _ in range(20)]
+    for _ in range(4):
+        shared = " ".join(sentence() for _ in range(8))
+        for copy, page in enumerate(rng.choice(len(pages), size=5, replace=False)):
+            edited = shared.replace(" plan ", " subscription ", copy % 2)
+            at = int(rng.integers(len(pages[page])))
+            at = pages[page].find(". ", at) + 2 or len(pages[page])
+            pages[page] = pages[page][:at] + edited + " " + pages[page][at:]
+    return pages
+
+
+def split(text: str, size: int, overlap: int) -> list:
+    return [text[i : i + size] for i in range(0, len(text), size - overlap)]
+
+
+def load_embedder(synthetic: bool):
+    if not synthetic:
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(settings.EMBEDDING_MODEL)
+            return lambda texts: np.asarray(model.encode(texts), dtype=np.float32)
+        except ImportError:
+            print("⚠️  sentence-transformers not installed, using hashed embeddings")
+
+    def embed(texts):
+        vectors = np.zeros((len(texts), 512), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            for pair in zip(words, words[1:]):
+                vectors[row, zlib.crc32(" ".join(pair).encode()) % 512] += 1
+        return vectors
+
+    return embed
+
+
+def unit(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def duplicated_share(texts: list, n: int = 8) -> float:
+    """Share of word n-grams in the context already seen earlier in it"""
+    seen, total, repeated = set(), 0, 0
+    for text in texts:
+        words = text.split()
+        for i in range(len(words) - n + 1):
+            gram = tuple(words[i : i + n])
+            total += 1
+            repeated += gram in seen
+            seen.add(gram)
+    return repeated / total if total else 0.0
+
+
+def before(docs: list) -> list:
+    packed, length = [], 0
+    for content, _, _ in docs[: settings.VECTOR_SEARCH_TOP_K]:
+        text = f"Document: {content.strip()}"
+        if len(text) + length >= OLD_MAX_CONTEXT_CHARS:
+            break
+        packed.append(content.strip())
+        length += len(text)
+    return packed
+
+
+def after(docs: list, vectors: np.ndarray, model_config: dict) -> list:
+    scores = np.array([score for _, score, _ in docs], dtype=np.float32)
+    picked = mmr_select(
+        scores / scores.max(),
+        vectors,
+        settings.VECTOR_SEARCH_TOP_K,
+        settings.CONTEXT_MMR_LAMBDA,
+    )
+    return context_builder.pack(
+        [docs[i] for i in picked],
+        model_config["name"],
+        model_config["context_tokens"],
+    )
+
+
+def prompt_for(texts: list, question: str) -> str:
+    docs = [(text, 1.0, {}) for text in texts]
+    return llm_service.create_context_prompt(
+        "You are a helpful support assistant.", docs, question, context_tokens=10**6
+    )
+
+
+async def generate(prompt: str, model: str) -> tuple:
+    usage = {}
+    start = time.perf_counter()
+    async for _ in llm_service._stream_generate_async(
+        prompt, model=model, max_tokens=120, timeout=120, usage=usage
+    ):
+        pass
+    return (time.perf_counter() - start) * 1000, usage.get("prompt_eval_count")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--ollama", help="Ollama base URL to time generation")
+    parser.add_argument("--runs", type=int, default=10, help="timed prompts each way")
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    model_config = llm_service.model_cascade[0]
+    model = model_config["name"]
+    context_builder.tokens.preload([model])
+    embed = load_embedder(args.synthetic)
+    chunks = [
+        chunk
+        for page in make_corpus()
+        for chunk in split(
+            page, settings.EMBEDDING_CHUNK_SIZE, settings.EMBEDDING_CHUNK_OVERLAP
+        )
+    ]
+    chunk_vectors = unit(embed(chunks))
+
+    rng = np.random.default_rng(1)
+    results = {"before": [], "after": []}
+    for _ in range(args.questions):
+        # Question drawn from a random chunk, so it has real neighbours
+        source = chunks[rng.integers(len(chunks))].split()
+        start = rng.integers(max(1, len(source) - 12))
+        question = " ".join(source[start : start + 12]) + "?"
+        similarity = chunk_vectors @ unit(embed([question]))[0]
+        top = np.argsort(-similarity)[: settings.CONTEXT_CANDIDATES]
+        docs = [(chunks[i], float(similarity[i]), {}) for i in top]
+
+        for label, texts in (
+            ("before", before(docs)),
+            ("after", after(docs, chunk_vectors[top], model_config)),
+        ):
+            prompt = prompt_for(texts, question)
+            results[label].append(
+                (
+                    prompt,
+                    context_builder.tokens.count(prompt, model, remember=False),
+                    duplicated_share(texts),
+                    len(texts),
+                )
+            )
+
+    print(f"model {model}, {args.questions} questions")
+    for label, rows in results.items():
+        tokens = [row[1] for row in rows]
+        print(
+            f"  {label:<7} prompt tokens mean {statistics.mean(tokens):7.1f}  "
+            f"max {max(tokens):5d}  chunks {statistics.mean(r[3] for r in rows):.1f}  "
+            f"duplicated text {statistics.mean(r[2] for r in rows):.1%}"
+        )
+
+    if args.ollama:
+        ollama_pool.configure([args.ollama])
+        for label, rows in results.items():
+            timings = [await generate(row[0], model) for row in rows[: args.runs]]
+            latencies = [latency for latency, _ in timings]
+            counted = [count for _, count in timings if count is not None]
+            print(
+                f"  {label:<7} latency p50 {statistics.median(latencies):7.0f}ms  "
+                f"mean {statistics.mean(latencies):7.0f}ms  "
+                f"prompt_eval_count {statistics.mean(counted) if counted else 0:.0f}"
+            )
+        await llm_service.close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Query-embedding micro-batching benchmark - throughput and latency per client count
+
+Each client encodes --queries unique questions back to back. "direct" is
+the old path (one encode call per query on the 5-thread pool); "batched"
+goes through EmbeddingBatcher on the same pool.
+
+    python benchmarks/embedding_batcher.py --clients 1 8 32 128
+    python benchmarks/embedding_batcher.py --max-wait-ms 2 --max-batch-size 64
+
+Uses the real EMBEDDING_MODEL when sentence-transformers is installed;
+--synthetic (or a missing package) substitutes a small NumPy transformer
+stand-in with the same shape of cost: fixed per-call overhead plus
+matmuls that get cheaper per row as the batch grows.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+class SyntheticEncoder:
+    """Token embedding + a few dense layers, mean-pooled to 384 dims"""
+
+    def __init__(self, dim: int = 384, layers: int = 6, seq_len: int = 16):
+        rng = np.random.default_rng(0)
+        self.seq_len = seq_len
+        self.tokens = rng.standard_normal((30522, dim)).astype(np.float32)
+        self.layers = [
+            (
+                rng.standard_normal((dim, 4 * dim)).astype(np.float32) / dim**0.5,
+                rng.standard_normal((4 * dim, dim)).astype(np.float32) / dim**0.5,
+            )
+            for _ in range(layers)
+        ]
+
+    def encode(self, texts, convert_to_tensor=False):
+        ids = np.array(
+            [
+                [hash((text, i)) % len(self.tokens) for i in range(self.seq_len)]
+                for text in texts
+            ]
+        )
+        hidden = self.tokens[ids].reshape(-1, self.tokens.shape[1])
+        for up, down in self.layers:
+            hidden = hidden + np.maximum(hidden @ up, 0) @ down
+        return hidden.reshape(len(texts), self.seq_len, -1).mean(axis=1)
+
+
+def load_model(synthetic: bool):
+    if not synthetic:
+        try:
+            from sentence_transformers import SentenceTransformer
+
+            return SentenceTransformer(settings.EMBEDDING_MODEL)
+        except ImportError:
+            print("⚠️  sentence-transformers not installed, using synthetic encoder")
+    return SyntheticEncoder()
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run(mode: str, model, clients: int, args) -> dict:
+    executor = ThreadPoolExecutor(max_workers=5)
+
+    def encode(texts):
+        return np.asarray(model.encode(texts, convert_to_tensor=False))
+
+    batcher = EmbeddingBatcher(encode, executor, args.max_batch_size, args.max_wait_ms)
+    loop = asyncio.get_running_loop()
+    latencies = []
+
+    async def client(c: int):
+        for q in range(args.queries):
+            text = f"client {c} question {q}: how do I reset my password?"
+            start = time.perf_counter()
+            if mode == "batched":
+                await batcher.encode(text)
+            else:
+                await loop.run_in_executor(executor, encode, [text])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    return {
+        "mode": mode,
+        "clients": clients,
+        "qps": len(latencies) / elapsed,
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "avg_batch": (
+            batcher.stats["requests"] / batcher.stats["batches"]
+            if batcher.stats["batches"]
+            else 1.0
+        ),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--queries", type=int, default=20, help="per client")
+    parser.add_argument(
+        "--max-batch-size", type=int, default=settings.EMBEDDING_BATCH_MAX_SIZE
+    )
+    parser.add_argument(
+        "--max-wait-ms", type=float, default=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+    )
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    model = load_model(args.synthetic)
+    model.encode(["warm up"])
+
+    print(
+        f"{'mode':<8} {'clients':>7} {'qps':>8} {'mean':>8} {'p50':>8} "
+        f"{'p95':>8} {'p99':>8} {'batch':>6}"
+    )
+    for clients in args.clients:
+        for mode in ("direct", "batched"):
+            r = await run(mode, model, clients, args)
+            print(
+                f"{r['mode']:<8} {r['clients']:>7} {r['qps']:>8.0f} "
+                f"{r['mean_ms']:>6.1f}ms {r['p50_ms']:>6.1f}ms "
+                f"{r['p95_ms']:>6.1f}ms {r['p99_ms']:>6.1f}ms {r['avg_batch']:>6.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
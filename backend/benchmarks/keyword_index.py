@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+BM25 keyword index benchmark - query latency, build cost and index size
+
+Generates a synthetic corpus per --chunks size (Zipf-distributed
+vocabulary, ~120-word chunks, like split training documents), builds a
+KeywordIndex and reports query p50/p95/p99, build and incremental merge
+time, and index bytes against the raw text. "scan" is the old fallback:
+lowercase every chunk and str.count each query word.
+
+    python benchmarks/keyword_index.py --chunks 1000 100000
+    python benchmarks/keyword_index.py --chunks 100000 --queries 500 --no-scan
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.keyword_index import KeywordIndex  # noqa: E402
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def make_corpus(chunks: int, vocab: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    words = np.array([f"term{i}" for i in range(vocab)])
+    ranks = np.arange(1, vocab + 1)
+    weights = 1 / ranks**1.1
+    weights /= weights.sum()
+    lengths = rng.integers(60, 180, size=chunks)
+    tokens = rng.choice(vocab, size=int(lengths.sum()), p=weights)
+    corpus, start = {}, 0
+    for i, length in enumerate(lengths):
+        corpus[f"chunk{i}"] = " ".join(words[tokens[start : start + length]])
+        start += length
+    return corpus
+
+
+def make_queries(corpus: dict, count: int, seed: int = 1) -> list:
+    """3-5 words sampled from random chunks, so queries have real matches"""
+    rng = np.random.default_rng(seed)
+    texts = list(corpus.values())
+    queries = []
+    for _ in range(count):
+        words = texts[rng.integers(len(texts))].split()
+        queries.append(" ".join(rng.choice(words, size=rng.integers(3, 6))))
+    return queries
+
+
+def scan(corpus: dict, query: str, k: int) -> list:
+    words = query.lower().split()
+    results = []
+    for chunk_id, text in corpus.items():
+        lowered = text.lower()
+        score = sum(lowered.count(word) for word in words if word in lowered)
+        if score:
+            results.append((chunk_id, score))
+    results.sort(key=lambda r: r[1], reverse=True)
+    return results[:k]
+
+
+def timed(fn, queries: list) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    print(
+        f"  {label:<6} p50 {percentile(latencies, 50):8.3f}ms  "
+        f"p95 {percentile(latencies, 95):8.3f}ms  "
+        f"p99 {percentile(latencies, 99):8.3f}ms  "
+        f"mean {statistics.mean(latencies):8.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--vocab", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--no-scan", action="store_true")
+    args = parser.parse_args()
+
+    for chunks in args.chunks:
+        corpus = make_corpus(chunks, args.vocab)
+        queries = make_queries(corpus, args.queries)
+        text_bytes = sum(len(text.encode()) for text in corpus.values())
+
+        start = time.perf_counter()
+        index = KeywordIndex.build(corpus)
+        build_s = time.perf_counter() - start
+
+        extra = make_corpus(max(1, chunks // 100), args.vocab, seed=2)
+        extra = {f"new_{chunk_id}": text for chunk_id, text in extra.items()}
+        start = time.perf_counter()
+        index.merge(extra)
+        add_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index.merge(removed=list(corpus)[: max(1, chunks // 100)])
+        remove_s = time.perf_counter() - start
+
+        print(
+            f"{chunks} chunks, {len(index.terms)} terms: index "
+            f"{index.nbytes / 1e6:.1f} MB ({index.nbytes / text_bytes:.0%} of text), "
+            f"build {build_s:.2f}s, +1% {add_s:.2f}s, -1% {remove_s:.2f}s"
+        )
+        index.search(queries[0], args.k)
+        report("bm25", timed(lambda q: index.search(q, args.k), queries))
+        if not args.no_scan:
+            report("scan", timed(lambda q: scan(corpus, q, args.k), queries[:50]))
+
+
+if __name__ == "__main__":
+    main()
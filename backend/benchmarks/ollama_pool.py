@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Ollama pool benchmark - throughput and latency across several hosts
+
+Starts fake Ollama servers on localhost (``/api/tags`` and an
+``/api/generate`` that holds one of --slots GPU slots for a fixed
+generation time, then streams its answer as one NDJSON line; requests
+beyond the slots queue in the server) and
+drives llm_service._stream_generate_async with --concurrency clients
+through the pool, which lets --limit requests in flight per host:
+
+  scale      1 host vs --hosts hosts
+  slow host  one host 3x slower; power of two choices vs random choice
+  placement  one host lacks the model and must get none of its requests
+  ejection   one host starts failing mid-run, then recovers
+
+    python benchmarks/ollama_pool.py
+    python benchmarks/ollama_pool.py --hosts 4 --slots 2 --limit 4 --requests 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.llm_service import llm_service  # noqa: E402
+from app.services.ollama_pool import ollama_pool  # noqa: E402
+
+MODEL = "qwen:0.5b"
+BASE_PORT = 18500
+
+
+class FakeOllama:
+    def __init__(self, port: int, slots: int, generate_ms: float, models=(MODEL,)):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.slots = asyncio.Semaphore(slots)
+        self.generate_ms = generate_ms
+        self.models = list(models)
+        self.failing = False
+        self.served = Counter()
+        self.runner = None
+
+    async def tags(self, request):
+        return web.json_response({"models": [{"name": m} for m in self.models]})
+
+    async def generate(self, request):
+        body = await request.json()
+        self.served[body["model"]] += 1
+        if self.failing:
+            return web.Response(status=500, text="CUDA error: out of memory")
+        if body["model"] not in self.models:
+            return web.json_response({"error": "model not found"}, status=404)
+        async with self.slots:
+            await asyncio.sleep(self.generate_ms / 1000)
+        answer = {
+            "response": "Sure, here is the answer.",
+            "done": True,
+            "eval_count": 6,
+        }
+        return web.Response(
+            text=json.dumps(answer) + "\n", content_type="application/x-ndjson"
+        )
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_post("/api/generate", self.generate)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(pct / 100 * len(ordered))))]
+
+
+async def drive(requests: int, concurrency: int, during=None) -> dict:
+    """Send ``requests`` generations from ``concurrency`` clients"""
+    latencies, errors = [], 0
+    queue = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            try:
+                async for _ in llm_service._stream_generate_async(
+                    "Question?", model=MODEL, max_tokens=8, timeout=30
+                ):
+                    pass
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    clients = [asyncio.create_task(client()) for _ in range(concurrency)]
+    if during:
+        await during()
+    await asyncio.gather(*clients)
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "errors": errors,
+    }
+
+
+def report(label: str, result: dict, servers: list):
+    spread = " ".join(str(sum(server.served.values())) for server in servers)
+    print(
+        f"  {label:<22} {result['rps']:7.1f} req/s  p50 {result['p50']:6.0f}ms  "
+        f"p95 {result['p95']:6.0f}ms  p99 {result['p99']:6.0f}ms  "
+        f"errors {result['errors']:3d}  per host [{spread}]"
+    )
+
+
+async def run(servers: list, args, label: str, during=None, pick=None):
+    ollama_pool.configure([server.url for server in servers])
+    for host in ollama_pool.hosts:
+        host.max_concurrent = args.limit
+    ollama_pool.__dict__.pop("_pick", None)
+    if pick:
+        ollama_pool._pick = pick
+    for server in servers:
+        server.served.clear()
+    result = await drive(args.requests, args.concurrency, during)
+    report(label, result, servers)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=2, help="parallel per host")
+    parser.add_argument("--limit", type=int, default=4, help="pool in-flight cap")
+    parser.add_argument("--generate-ms", type=float, default=50)
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    servers = [
+        FakeOllama(BASE_PORT + i, args.slots, args.generate_ms)
+        for i in range(args.hosts)
+    ]
+    for server in servers:
+        await server.start()
+
+    print(
+        f"{args.requests} requests, {args.concurrency} clients, "
+        f"{args.slots} slots x {args.generate_ms:.0f}ms per host, "
+        f"pool limit {args.limit} per host"
+    )
+    print("scale")
+    await run(servers[:1], args, "1 host")
+    await run(servers, args, f"{args.hosts} hosts")
+
+    print("slow host (3x)")
+    servers[0].generate_ms = args.generate_ms * 3
+
+    def random_pick(model, exclude=()):
+        free = [
+            host
+            for host in ollama_pool._candidates(model, exclude)
+            if host.outstanding < host.max_concurrent
+        ]
+        return random.choice(free) if free else None
+
+    await run(servers, args, "random choice", pick=random_pick)
+    await run(servers, args, "power of two choices")
+    servers[0].generate_ms = args.generate_ms
+
+    print("placement")
+    servers[0].models = ["phi:latest"]
+    await run(servers, args, "host 0 lacks model")
+    servers[0].models = [MODEL]
+
+    settings.OLLAMA_HOST_EJECT_SECONDS = 1
+    print(
+        f"ejection (host 0 fails for 1s; ejected for 1s after "
+        f"{settings.OLLAMA_HOST_EJECT_FAILURES} errors)"
+    )
+
+    async def outage():
+        await asyncio.sleep(0.2)
+        servers[0].failing = True
+        await asyncio.sleep(1.0)
+        servers[0].failing = False
+
+    await run(servers, args, "host 0 outage", during=outage)
+    print(f"  host 0 after run: {ollama_pool.hosts[0].to_dict()['state']}")
+
+    await llm_service.close_session()
+    for server in servers:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
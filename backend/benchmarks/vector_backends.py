@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Vector backend benchmark - query latency and recall@k on synthetic embeddings
+
+Builds one namespace of clustered random vectors (so neighbours are not
+uniformly far apart, like real chunk embeddings), upserts it into each
+backend, then reports query p50/p95/p99 and recall@k against exact
+brute-force ground truth.
+
+    python benchmarks/vector_backends.py --vectors 20000 --dim 384 --queries 200
+    python benchmarks/vector_backends.py --backends local pinecone
+    python benchmarks/vector_backends.py --backends local hnsw --ef 16 64 256
+
+"local" is the exact NumPy scan; "hnsw" forces the local HNSW graph
+regardless of ANN_MIN_VECTORS and is measured once per --ef value;
+"int8" and "binary" scan quantized codes and rescore the best
+top-k x --rescore-factor candidates with the float vectors. "index MB
+per 1M" is what the first pass reads: the codes, or vectors plus graph.
+
+    python benchmarks/vector_backends.py --backends local int8 binary
+
+Pinecone needs PINECONE_API_KEY and an index whose dimension matches --dim;
+the benchmark namespace is deleted afterwards.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services.vector_backends import IndexOptions, create_backend  # noqa: E402
+from app.services.vector_backends.local_backend import (  # noqa: E402
+    LocalVectorBackend,
+    normalize_rows,
+    top_k_indices,
+)
+
+QUANTIZED = ("int8", "binary")
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def make_dataset(n: int, dim: int, queries: int, seed: int = 0):
+    """Clustered unit vectors plus queries drawn near the same centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+
+    assignment = rng.integers(0, len(centroids), n)
+    data = centroids[assignment] + 0.5 * rng.standard_normal((n, dim)).astype(
+        np.float32
+    )
+    query_assignment = rng.integers(0, len(centroids), queries)
+    query_vectors = centroids[query_assignment] + 0.5 * rng.standard_normal(
+        (queries, dim)
+    ).astype(np.float32)
+    return normalize_rows(data), normalize_rows(query_vectors)
+
+
+def ground_truth(data: np.ndarray, queries: np.ndarray, k: int) -> list:
+    return [set(top_k_indices(data @ q, k).tolist()) for q in queries]
+
+
+def wait_for_count(backend, namespace: str, expected: int, timeout: float = 120.0):
+    """Hosted indexes are eventually consistent; wait for the upsert to land"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if backend.namespace_stats(namespace)["total_vectors"] >= expected:
+            return
+        time.sleep(1.0)
+    print(f"  ⚠️  only partially indexed after {timeout:.0f}s; recall may be low")
+
+
+def measure(backend, namespace: str, queries, truth, k: int) -> dict:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        matches = backend.query(namespace, query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {int(vector_id) for vector_id, _, _ in matches})
+
+    return {
+        "qps": len(queries) / (sum(latencies) / 1000) if latencies else 0.0,
+        "mean_ms": statistics.mean(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "recall": hits / (len(queries) * k) if len(queries) else 0.0,
+    }
+
+
+def run_backend(name: str, backend, data, queries, truth, args) -> list:
+    namespace = f"bench_{uuid.uuid4().hex[:8]}"
+    ids = [str(i) for i in range(len(data))]
+    metadatas = [{"document_id": "bench", "chunk_index": i} for i in range(len(data))]
+
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(data), 1000):
+            backend.upsert(
+                namespace,
+                ids[i : i + 1000],
+                data[i : i + 1000],
+                metadatas[i : i + 1000],
+            )
+        if isinstance(backend, LocalVectorBackend):
+            quantization = name if name in QUANTIZED else None
+            backend.configure_namespace(
+                namespace, IndexOptions(ann_m=args.m, quantization=quantization)
+            )
+            # Seal and merge into one segment (building the graph for hnsw)
+            backend.compact(namespace)
+        ingest_s = time.perf_counter() - start
+
+        if name == "pinecone":
+            wait_for_count(backend, namespace, len(data))
+
+        open_ms = 0.0
+        index_mb = 0.0
+        if isinstance(backend, LocalVectorBackend):
+            stats = backend.namespace_stats(namespace)
+            index_mb = stats["index_bytes"] / stats["total_vectors"] * 1e6 / 2**20
+            # What a restarted worker pays: map the segment, answer one query
+            reopened = LocalVectorBackend(
+                root=backend.root,
+                ann_min_vectors=backend.ann_min_vectors,
+                maintenance_interval=3600,
+            )
+            start = time.perf_counter()
+            reopened.query(namespace, queries[0], args.top_k)
+            open_ms = (time.perf_counter() - start) * 1000
+            reopened.close()
+
+        results = []
+        for ef in args.ef if name == "hnsw" else [None]:
+            if ef is not None:
+                backend.configure_namespace(
+                    namespace, IndexOptions(ann_m=args.m, ann_ef_search=ef)
+                )
+            result = measure(backend, namespace, queries, truth, args.top_k)
+            result.update(
+                backend=name if ef is None else f"{name} (M={args.m}, ef={ef})",
+                ingest_s=ingest_s,
+                open_ms=open_ms,
+                index_mb=index_mb,
+            )
+            results.append(result)
+        return results
+    finally:
+        backend.delete_namespace(namespace)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=["local", "hnsw"],
+        choices=["local", "hnsw", *QUANTIZED, "pinecone"],
+    )
+    parser.add_argument("--m", type=int, default=16, help="HNSW links per node")
+    parser.add_argument(
+        "--ef", type=int, nargs="+", default=[16, 64, 256], help="HNSW beam widths"
+    )
+    parser.add_argument(
+        "--rescore-factor",
+        type=int,
+        default=settings.QUANTIZATION_RESCORE_FACTOR,
+        help="quantized candidates rescored per result",
+    )
+    args = parser.parse_args()
+    settings.QUANTIZATION_RESCORE_FACTOR = args.rescore_factor
+
+    print(f"Building {args.vectors} x {args.dim} dataset...")
+    data, queries = make_dataset(args.vectors, args.dim, args.queries)
+    truth = ground_truth(data, queries, args.top_k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        for name in args.backends:
+            if name == "local" or name in QUANTIZED:
+                backend = LocalVectorBackend(
+                    root=root, ann_min_vectors=2**62, maintenance_interval=3600
+                )
+            elif name == "hnsw":
+                backend = LocalVectorBackend(
+                    root=root, ann_min_vectors=0, maintenance_interval=3600
+                )
+            else:
+                backend = create_backend(name)
+            if not backend.is_ready():
+                print(f"⚠️  {name} backend not available, skipping")
+                continue
+            results.extend(run_backend(name, backend, data, queries, truth, args))
+
+    for result in results:
+        print(f"\n📊 {result['backend']}: {args.vectors} vectors, top-{args.top_k}")
+        print(f"  ingest: {result['ingest_s']:.2f} s (incl. index build)")
+        if result["open_ms"]:
+            print(f"  cold open + first query: {result['open_ms']:.1f} ms")
+        if result["index_mb"]:
+            print(f"  index MB per 1M: {result['index_mb']:.0f}")
+        print(f"  qps:    {result['qps']:.0f}")
+        print(f"  mean:   {result['mean_ms']:.2f} ms")
+        print(f"  p50:    {result['p50_ms']:.2f} ms")
+        print(f"  p95:    {result['p95_ms']:.2f} ms")
+        print(f"  p99:    {result['p99_ms']:.2f} ms")
+        print(f"  recall@{args.top_k}: {result['recall']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
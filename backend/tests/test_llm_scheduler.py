@@ -0,0 +1,147 @@
+"""
+LLM scheduler admission: queueing for a slot, shedding with
+LLMOverloadedError, and giving a shed request's usage back.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis.aioredis
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import LLMOverloadedError
+from app.services import usage_service as usage_module
+from app.services.llm_scheduler import LLMScheduler
+from app.services.ollama_pool import ollama_pool
+from app.services.usage_service import usage_service
+from app.services.write_behind import UsageCounterEvent
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """A scheduler in front of one host with a single slot"""
+    monkeypatch.setattr(settings, "OLLAMA_HOST_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(settings, "LLM_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "LLM_QUEUE_TIMEOUT", 0.2)
+    ollama_pool.configure(["http://ollama.test:11434"])
+    return LLMScheduler()
+
+
+@pytest.fixture
+def usage(monkeypatch):
+    """Usage service on an in-memory Redis; returns the queued DB events"""
+    monkeypatch.setattr(
+        usage_service,
+        "redis_client",
+        fakeredis.aioredis.FakeRedis(decode_responses=True),
+    )
+    queued = []
+
+    async def enqueue(event):
+        queued.append(event)
+
+    monkeypatch.setattr(usage_module.write_behind_queue, "enqueue", enqueue)
+    return queued
+
+
+TENANT = SimpleNamespace(is_subscription_active=True, subscription_plan="starter")
+
+
+async def wait_in_queue(scheduler, tenant: str) -> asyncio.Task:
+    async def wait():
+        async with scheduler.slot(tenant, "starter"):
+            pass
+
+    task = asyncio.create_task(wait())
+    await asyncio.sleep(0)  # let it queue
+    return task
+
+
+async def counters(charge) -> list:
+    return [await usage_service.redis_client.get(key) for key in charge.keys]
+
+
+@pytest.mark.asyncio
+async def test_queued_request_gets_the_slot_when_it_frees(scheduler):
+    async with scheduler.slot("a", "starter"):
+        waiter = await wait_in_queue(scheduler, "b")
+        assert scheduler.queue_depth == 1
+
+    await asyncio.wait_for(waiter, 1)
+    assert scheduler.in_flight == 0
+    assert scheduler.get_stats()["admitted"] == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_the_tenant_over_its_share(scheduler):
+    async with scheduler.slot("a", "starter"):
+        first = await wait_in_queue(scheduler, "a")
+        second = await wait_in_queue(scheduler, "a")
+
+        # "a" would only push out its own request
+        with pytest.raises(LLMOverloadedError) as shed:
+            scheduler.check_admission("a", "starter")
+        assert shed.value.retry_after >= 1
+
+        # "b" is admitted; "a"'s newest request makes room
+        scheduler.check_admission("b", "starter")
+        newcomer = await wait_in_queue(scheduler, "b")
+        with pytest.raises(LLMOverloadedError):
+            await second
+
+    await asyncio.wait_for(asyncio.gather(first, newcomer), 1)
+    stats = scheduler.get_stats()
+    assert stats["rejected_queue_full"] == 1
+    assert stats["rejected_pushed_out"] == 1
+
+
+@pytest.mark.asyncio
+async def test_waiting_longer_than_the_timeout_is_shed(scheduler):
+    async with scheduler.slot("a", "starter"):
+        with pytest.raises(LLMOverloadedError, match="No LLM capacity"):
+            async with scheduler.slot("b", "starter"):
+                pass
+        assert scheduler.queue_depth == 0
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_shed_request_is_refunded(scheduler, usage):
+    _, kept = await usage_service.charge_usage("u1", None, user=TENANT)
+    await usage_service.commit_usage(kept)
+
+    info, charge = await usage_service.charge_usage("u1", None, user=TENANT)
+    assert info["current_usage"] == 2
+    assert await counters(charge) == ["2", "2", "2"]
+
+    async with scheduler.slot("other", "starter"):
+        with pytest.raises(LLMOverloadedError):
+            async with scheduler.slot("u1", "starter"):
+                pass
+    await usage_service.refund_usage(charge)
+
+    assert await counters(charge) == ["1", "1", "1"]
+    # Only the admitted request reaches the persisted counters
+    assert usage == [UsageCounterEvent(user_id="u1", queries_used_today=1)]
+
+
+@pytest.mark.asyncio
+async def test_refund_targets_the_counters_that_were_charged(usage, monkeypatch):
+    _, charge = await usage_service.charge_usage("u1", None, user=TENANT)
+
+    # The minute rolls over while the request waits
+    monkeypatch.setattr(
+        usage_service, "get_rate_limit_key", lambda user_id: "rate_limit:u1:next"
+    )
+    await usage_service.charge_usage("u1", None, user=TENANT)
+    await usage_service.refund_usage(charge)
+
+    redis_client = usage_service.redis_client
+    assert await redis_client.get(charge.keys[1]) == "0"
+    assert await redis_client.get("rate_limit:u1:next") == "1"
+    assert await redis_client.get(charge.keys[0]) == "1"  # daily: one left
+
+    # Expired counters are not taken below zero
+    await redis_client.delete(*charge.keys)
+    await usage_service.refund_usage(charge)
+    assert await counters(charge) == [None, None, None]
@@ -0,0 +1,148 @@
+"""
+Ollama pool against local fake Ollama servers (benchmarks/ollama_pool.py):
+model placement, 404s, retry on another host, ejection and re-admission,
+and the wait for a free slot.
+"""
+import asyncio
+import socket
+
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.core.exceptions import LLMError
+from app.services.llm_service import llm_service
+from app.services.ollama_pool import ollama_pool
+from benchmarks.ollama_pool import MODEL, FakeOllama
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest_asyncio.fixture
+async def servers():
+    """Start fake servers; the pool is configured with them"""
+    started = []
+
+    async def start(*models_per_host, generate_ms: float = 5):
+        for models in models_per_host:
+            server = FakeOllama(free_port(), slots=4, generate_ms=generate_ms)
+            server.models = list(models)
+            await server.start()
+            started.append(server)
+        ollama_pool.configure([server.url for server in started])
+        return started
+
+    yield start
+
+    await llm_service.close_session()
+    for server in started:
+        await server.stop()
+
+
+async def generate() -> str:
+    tokens = [
+        token
+        async for token in llm_service._stream_generate_async(
+            "Question?", model=MODEL, max_tokens=8, timeout=5
+        )
+    ]
+    return "".join(tokens)
+
+
+def served(server: FakeOllama) -> int:
+    return sum(server.served.values())
+
+
+@pytest.mark.asyncio
+async def test_routes_only_to_hosts_listing_the_model(servers):
+    lacking, having = await servers(["phi:latest"], [MODEL])
+
+    for _ in range(20):
+        assert await generate()
+
+    assert served(lacking) == 0
+    assert served(having) == 20
+
+
+@pytest.mark.asyncio
+async def test_404_stops_routing_the_model_to_that_host(servers):
+    stale, fresh = await servers([MODEL], [MODEL])
+    await ollama_pool.refresh(await llm_service._get_session())
+    stale.models = []  # pulled out after /api/tags was read
+
+    for _ in range(50):
+        assert await generate()  # retried on the host that has it
+        if served(stale):
+            break
+
+    assert served(stale) == 1
+    assert not ollama_pool.hosts[0].has_model(MODEL)
+    for _ in range(10):
+        assert await generate()
+    assert served(stale) == 1
+
+
+@pytest.mark.asyncio
+async def test_5xx_is_retried_on_another_host(servers):
+    failing, healthy = await servers([MODEL], [MODEL])
+    failing.failing = True
+
+    for _ in range(50):
+        assert await generate()
+        if served(failing):
+            break
+
+    assert served(failing) == 1
+    assert ollama_pool.hosts[0].failures == 1
+
+
+@pytest.mark.asyncio
+async def test_failing_host_is_ejected_then_readmitted(servers, monkeypatch):
+    monkeypatch.setattr(settings, "OLLAMA_HOST_EJECT_FAILURES", 2)
+    monkeypatch.setattr(settings, "OLLAMA_HOST_EJECT_SECONDS", 1)
+    failing, healthy = await servers([MODEL], [MODEL])
+    host = ollama_pool.hosts[0]
+    failing.failing = True
+
+    for _ in range(100):
+        assert await generate()  # retried on the healthy host
+        if host.ejected:
+            break
+    assert host.ejected
+    assert host.to_dict()["state"] == "ejected"
+
+    # No traffic while ejected
+    attempts = served(failing)
+    for _ in range(10):
+        assert await generate()
+    assert served(failing) == attempts
+
+    # Back after the ejection period; one success re-admits
+    failing.failing = False
+    await asyncio.sleep(1.1)
+    for _ in range(50):
+        assert await generate()
+        if served(failing) > attempts:
+            break
+    assert served(failing) > attempts
+    assert not host.ejected and host.consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_waiting_for_a_slot_times_out(servers):
+    await servers([MODEL])
+    ollama_pool.hosts[0].max_concurrent = 1
+    session = await llm_service._get_session()
+
+    async with ollama_pool.acquire(MODEL, session, timeout=5):
+        with pytest.raises(LLMError, match="No Ollama host free"):
+            async with ollama_pool.acquire(MODEL, session, timeout=0.1):
+                pass
+
+    # The slot is free again once released
+    async with ollama_pool.acquire(MODEL, session, timeout=0.1) as host:
+        assert host.outstanding == 1